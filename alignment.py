@@ -0,0 +1,222 @@
+# alignment.py
+# 多接收机对比：按NMEA UTC时间（而非主机到达时间）对齐各串口的定位结果，输出相对基准串口的偏差
+import math
+import calendar
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+EARTH_RADIUS = 6378137.0  # WGS84长半轴（米）
+TICKS_PER_SECOND = 100  # 历元键精度：10ms
+
+
+class _PortWindow:
+    """单个串口的有界历元窗口"""
+
+    def __init__(self):
+        self.date = None  # 最近一次RMC给出的UTC日期 (年, 月, 日)
+        self.epochs = OrderedDict()  # 历元键 -> [纬度, 经度, 海拔]
+        self.last_key = None
+
+
+class EpochAligner:
+    """流式多串口对齐引擎
+
+    每个串口只保留最近 window_epochs 个历元；当所有活跃串口都已输出更新的历元
+    （该历元的RMC/GGA均已到齐），或该历元已落后最新历元超过窗口时长时，
+    即批量计算各串口相对基准串口的偏差，
+    结果写入固定容量的环形缓冲区，内存与会话时长无关。
+    """
+
+    def __init__(self, max_ports: int = 8, reference: int = 1, window_epochs: int = 50,
+                 window_seconds: float = 2.0, capacity: int = 36000):
+        self.max_ports = max_ports
+        self.reference = reference  # 基准串口序号（从1开始）
+        self.window_epochs = window_epochs
+        self.window_ticks = int(window_seconds * TICKS_PER_SECOND)
+        self.capacity = capacity
+        self.ports = {}  # 串口序号 -> _PortWindow
+        self.newest_key = None
+        self.final_key = None  # 最近一个已结算的历元键
+        self.dropped_epochs = 0  # 缺少基准串口而丢弃的历元数
+        self.late_fixes = 0  # 所属历元已结算后才到达的定位数
+        self._pending = []  # 待批量计算的历元 [(键, {串口: [纬度, 经度, 海拔]})]
+        self._init_buffers()
+
+    def _init_buffers(self):
+        n = self.max_ports
+        self.times = np.full(self.capacity, np.nan)  # UTC时间戳（秒）
+        self.d_east = np.full((self.capacity, n), np.nan)
+        self.d_north = np.full((self.capacity, n), np.nan)
+        self.d_up = np.full((self.capacity, n), np.nan)
+        self.count = 0  # 已写入的总历元数（环形缓冲区写指针 = count % capacity）
+
+    def reset(self, reference: int = None):
+        """清空所有窗口和结果（可同时切换基准串口）"""
+        if reference is not None:
+            self.reference = reference
+        self.ports = {}
+        self.newest_key = None
+        self.final_key = None
+        self.dropped_epochs = 0
+        self.late_fixes = 0
+        self._pending = []
+        self._init_buffers()
+
+    def set_reference(self, reference: int):
+        """切换基准串口（已计算的结果基于旧基准，故一并清空）"""
+        if reference != self.reference:
+            self.reset(reference)
+
+    @staticmethod
+    def _day_start(date):
+        return calendar.timegm((date[0], date[1], date[2], 0, 0, 0))
+
+    def _epoch_key(self, window: _PortWindow, utc: float):
+        """由当天UTC秒数和日期得到历元键；尚未收到RMC日期时使用主机UTC日期"""
+        if window.date is not None:
+            day_start = self._day_start(window.date)
+        else:
+            now = time.time()
+            day_start = now - now % 86400
+            # 处理跨零点：主机已过零点而语句仍属前一天（或反之）
+            seconds_of_day = now - day_start
+            if utc - seconds_of_day > 43200:
+                day_start -= 86400
+            elif seconds_of_day - utc > 43200:
+                day_start += 86400
+        return int(round((day_start + utc) * TICKS_PER_SECOND))
+
+    def add(self, port_index: int, result: dict):
+        """输入一条解析结果（NMEAParser.parse_gnrmc / parse_gngga 的返回值）"""
+        if port_index < 1 or port_index > self.max_ports:
+            return
+        window = self.ports.get(port_index)
+        if window is None:
+            window = self.ports[port_index] = _PortWindow()
+
+        if result.get('utc_date'):
+            window.date = result['utc_date']
+        utc = result.get('utc')
+        if utc is None or not result.get('valid'):
+            return
+
+        key = self._epoch_key(window, utc)
+        if self.final_key is not None and key <= self.final_key:
+            self.late_fixes += 1
+            return
+        entry = window.epochs.get(key)
+        if entry is None:
+            entry = window.epochs[key] = [np.nan, np.nan, np.nan]
+            while len(window.epochs) > self.window_epochs:
+                window.epochs.popitem(last=False)
+        entry[0] = result['latitude']
+        entry[1] = result['longitude']
+        if 'altitude' in result:
+            entry[2] = result['altitude']  # 仅GGA含海拔
+        if window.last_key is None or key > window.last_key:
+            window.last_key = key
+
+        if self.newest_key is None or key > self.newest_key:
+            self.newest_key = key
+        self._collect_ready()
+
+    def _active_ports(self):
+        """最近窗口时长内仍有数据的串口"""
+        return [p for p, w in self.ports.items()
+                if w.last_key is not None and self.newest_key - w.last_key <= self.window_ticks]
+
+    def _collect_ready(self):
+        """找出可以结算的历元（所有活跃串口都已越过该历元，或已超出窗口）"""
+        active = self._active_ports()
+        if not active:
+            return
+        deadline = self.newest_key - self.window_ticks
+        candidate_keys = set()
+        for port in active:
+            candidate_keys.update(self.ports[port].epochs.keys())
+
+        for key in sorted(candidate_keys):
+            # 键有序：某串口尚未越过该历元，则更晚的历元也一定未就绪
+            if key > deadline and any(self.ports[p].last_key <= key for p in active):
+                break
+            fixes = {}
+            for port, window in self.ports.items():
+                values = window.epochs.pop(key, None)
+                if values is not None:
+                    fixes[port] = values
+            self._pending.append((key, fixes))
+            self.final_key = key
+
+        if self._pending:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        """向量化计算一批历元相对基准串口的东/北/天偏差"""
+        batch = [(k, fixes) for k, fixes in self._pending if self.reference in fixes]
+        self.dropped_epochs += len(self._pending) - len(batch)
+        self._pending = []
+        if not batch:
+            return
+
+        n = self.max_ports
+        m = len(batch)
+        pos = np.full((m, n, 3), np.nan)
+        times = np.empty(m)
+        for row, (key, fixes) in enumerate(batch):
+            times[row] = key / TICKS_PER_SECOND
+            for port, values in fixes.items():
+                pos[row, port - 1] = values
+
+        ref = pos[:, self.reference - 1, :]
+        lat0 = np.radians(ref[:, 0])[:, None]
+        d_north = np.radians(pos[:, :, 0] - ref[:, None, 0]) * EARTH_RADIUS
+        d_east = np.radians(pos[:, :, 1] - ref[:, None, 1]) * EARTH_RADIUS * np.cos(lat0)
+        d_up = pos[:, :, 2] - ref[:, None, 2]
+
+        # 写入环形缓冲区
+        idx = (self.count + np.arange(m)) % self.capacity
+        self.times[idx] = times
+        self.d_east[idx] = d_east
+        self.d_north[idx] = d_north
+        self.d_up[idx] = d_up
+        self.count += m
+
+    def _ordered_slice(self):
+        """按时间顺序返回环形缓冲区中的有效下标"""
+        if self.count <= self.capacity:
+            return np.arange(self.count)
+        start = self.count % self.capacity
+        return np.concatenate((np.arange(start, self.capacity), np.arange(start)))
+
+    def series(self, port_index: int):
+        """返回 (UTC时间, 水平偏差, 垂直偏差) 三个数组（米），只含该串口有数据的历元"""
+        idx = self._ordered_slice()
+        col = port_index - 1
+        times = self.times[idx]
+        horizontal = np.hypot(self.d_east[idx, col], self.d_north[idx, col])
+        vertical = self.d_up[idx, col]
+        mask = ~np.isnan(horizontal)
+        return times[mask], horizontal[mask], vertical[mask]
+
+    def export_csv(self, filename: str):
+        """导出所有已对齐历元的偏差（每个串口 东/北/天/水平 四列）"""
+        idx = self._ordered_slice()
+        ports = sorted(p for p in self.ports if p != self.reference)
+        header = ['utc_time']
+        for port in ports:
+            header += [f'port{port}_east_m', f'port{port}_north_m', f'port{port}_up_m', f'port{port}_horizontal_m']
+
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(f"# reference=port{self.reference}\n")
+            f.write(','.join(header) + '\n')
+            for i in idx:
+                t = self.times[i]
+                row = [time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(t)) + f"{t % 1:.2f}"[1:] + 'Z']
+                for port in ports:
+                    e, n, u = self.d_east[i, port - 1], self.d_north[i, port - 1], self.d_up[i, port - 1]
+                    h = math.hypot(e, n)
+                    row += ['' if math.isnan(v) else f"{v:.4f}" for v in (e, n, u, h)]
+                f.write(','.join(row) + '\n')
+        return len(idx)
@@ -0,0 +1,275 @@
+# fanout_server.py
+# 本机数据转发服务：把每个串口收到的原始字节通过TCP（类似gpsd）和可选的UDP转发给多个客户端
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+
+
+class FanoutClient:
+    """单个TCP客户端：有界发送队列，满时丢弃最旧数据"""
+
+    def __init__(self, sock: socket.socket, addr, max_queue_bytes: int):
+        self.sock = sock
+        self.addr = addr
+        self.max_queue_bytes = max_queue_bytes
+        self.queue = deque()  # 各客户端共享同一个bytes对象，不复制
+        self.queued_bytes = 0
+        self.offset = 0  # 队首数据块已发送的字节数
+        self.connected_at = time.monotonic()
+        self.bytes_sent = 0
+        self.bytes_dropped = 0
+        self.chunks_dropped = 0
+        self._rate_bytes = 0
+        self._rate_time = self.connected_at
+        self.rate = 0.0  # 最近的发送速率（字节/秒）
+
+    def enqueue(self, data: bytes):
+        self.queue.append(data)
+        self.queued_bytes += len(data)
+        # 丢弃最旧数据，保证慢客户端不会拖住采集
+        # 队首若已发送一部分则保留，避免客户端收到半截数据块
+        while self.queued_bytes > self.max_queue_bytes and len(self.queue) > (2 if self.offset else 1):
+            if self.offset:
+                dropped = self.queue[1]
+                del self.queue[1]
+            else:
+                dropped = self.queue.popleft()
+            self.queued_bytes -= len(dropped)
+            self.bytes_dropped += len(dropped)
+            self.chunks_dropped += 1
+
+    def send_pending(self):
+        """尽量发送队列中的数据，返回False表示连接已断开"""
+        while self.queue:
+            head = self.queue[0]
+            try:
+                sent = self.sock.send(memoryview(head)[self.offset:])
+            except (BlockingIOError, InterruptedError):
+                return True
+            except OSError:
+                return False
+            self.bytes_sent += sent
+            self._rate_bytes += sent
+            self.offset += sent
+            if self.offset >= len(head):
+                self.queue.popleft()
+                self.queued_bytes -= len(head)
+                self.offset = 0
+            else:
+                return True
+        return True
+
+    def update_rate(self, now: float):
+        elapsed = now - self._rate_time
+        if elapsed >= 1.0:
+            self.rate = self._rate_bytes / elapsed
+            self._rate_bytes = 0
+            self._rate_time = now
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self.connected_at, 1e-6)
+        return {
+            'address': f"{self.addr[0]}:{self.addr[1]}",
+            'bytes_sent': self.bytes_sent,
+            'bytes_dropped': self.bytes_dropped,
+            'chunks_dropped': self.chunks_dropped,
+            'queued_bytes': self.queued_bytes,
+            'rate': self.rate,
+            'average_rate': self.bytes_sent / elapsed,
+        }
+
+
+class _Stream:
+    """一个串口对应的转发流"""
+
+    def __init__(self, key, listener: socket.socket, udp_target):
+        self.key = key
+        self.listener = listener
+        self.port = listener.getsockname()[1]
+        self.udp_target = udp_target
+        self.clients = {}  # socket -> FanoutClient
+        self.bytes_published = 0
+        self.udp_bytes_sent = 0
+        self.udp_errors = 0
+
+
+class FanoutServer:
+    """转发服务：每个串口一个TCP监听端口，publish()可在接收线程中直接调用"""
+
+    def __init__(self, host: str = '127.0.0.1', max_queue_bytes: int = 256 * 1024):
+        self.host = host
+        self.max_queue_bytes = max_queue_bytes  # 每个客户端的发送队列上限
+        self.streams = {}  # 键 -> _Stream
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, ('wakeup', None))
+        self._udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._udp_sock.setblocking(False)
+        self._thread = None
+        self._should_stop = False
+
+    def start(self):
+        if self._thread is None:
+            self._should_stop = False
+            self._thread = threading.Thread(target=self._run, name="FanoutServer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """停止服务并关闭所有连接"""
+        self._should_stop = True
+        self._wakeup()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            for key in list(self.streams):
+                self._close_stream(key)
+        self._selector.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+        self._udp_sock.close()
+
+    def _wakeup(self):
+        try:
+            self._wakeup_w.send(b'\0')
+        except OSError:
+            pass
+
+    def add_stream(self, key, tcp_port: int = 0, udp_target=None) -> int:
+        """为一个串口开启转发，返回实际监听的TCP端口（tcp_port=0时由系统分配）"""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, tcp_port))
+        listener.listen(16)
+        listener.setblocking(False)
+        stream = _Stream(key, listener, udp_target)
+        with self._lock:
+            if key in self.streams:
+                self._close_stream(key)
+            self.streams[key] = stream
+            self._selector.register(listener, selectors.EVENT_READ, ('accept', stream))
+        self._wakeup()
+        return stream.port
+
+    def remove_stream(self, key):
+        with self._lock:
+            self._close_stream(key)
+        self._wakeup()
+
+    def set_udp_target(self, key, udp_target):
+        """设置/取消某个串口的UDP转发目标 (主机, 端口)"""
+        with self._lock:
+            stream = self.streams.get(key)
+            if stream is not None:
+                stream.udp_target = udp_target
+
+    def _close_stream(self, key):
+        stream = self.streams.pop(key, None)
+        if stream is None:
+            return
+        for sock in list(stream.clients):
+            self._drop_client(stream, sock)
+        try:
+            self._selector.unregister(stream.listener)
+        except (KeyError, ValueError):
+            pass
+        stream.listener.close()
+
+    def _drop_client(self, stream: _Stream, sock: socket.socket):
+        stream.clients.pop(sock, None)
+        try:
+            self._selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        sock.close()
+
+    def publish(self, key, data: bytes):
+        """发布一块原始数据（线程安全，不阻塞：只入队，由服务线程发送）"""
+        if not data:
+            return
+        with self._lock:
+            stream = self.streams.get(key)
+            if stream is None:
+                return
+            stream.bytes_published += len(data)
+            for client in stream.clients.values():
+                client.enqueue(data)
+            if stream.udp_target is not None:
+                try:
+                    stream.udp_bytes_sent += self._udp_sock.sendto(data, stream.udp_target)
+                except OSError:
+                    stream.udp_errors += 1
+            has_clients = bool(stream.clients)
+        if has_clients:
+            self._wakeup()
+
+    def _run(self):
+        while not self._should_stop:
+            events = self._selector.select(timeout=0.5)
+            now = time.monotonic()
+            with self._lock:
+                for selector_key, mask in events:
+                    kind, stream = selector_key.data
+                    if kind == 'wakeup':
+                        try:
+                            while self._wakeup_r.recv(4096):
+                                pass
+                        except (BlockingIOError, InterruptedError):
+                            pass
+                    elif kind == 'accept':
+                        self._accept(stream)
+                    elif kind == 'client':
+                        # 客户端发来的数据直接丢弃，只用于检测断开
+                        sock = selector_key.fileobj
+                        if mask & selectors.EVENT_READ:
+                            try:
+                                if not sock.recv(4096):
+                                    self._drop_client(stream, sock)
+                                    continue
+                            except (BlockingIOError, InterruptedError):
+                                pass
+                            except OSError:
+                                self._drop_client(stream, sock)
+                                continue
+
+                # 发送各客户端积压的数据，按需关注可写事件
+                for stream in list(self.streams.values()):
+                    for sock, client in list(stream.clients.items()):
+                        if not client.send_pending():
+                            self._drop_client(stream, sock)
+                            continue
+                        client.update_rate(now)
+                        events_mask = selectors.EVENT_READ
+                        if client.queue:
+                            events_mask |= selectors.EVENT_WRITE
+                        self._selector.modify(sock, events_mask, ('client', stream))
+
+    def _accept(self, stream: _Stream):
+        try:
+            sock, addr = stream.listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stream.clients[sock] = FanoutClient(sock, addr, self.max_queue_bytes)
+        self._selector.register(sock, selectors.EVENT_READ, ('client', stream))
+
+    def stats(self) -> dict:
+        """各转发流及其客户端的统计 {键: {...}}"""
+        with self._lock:
+            return {
+                key: {
+                    'tcp_port': stream.port,
+                    'udp_target': stream.udp_target,
+                    'bytes_published': stream.bytes_published,
+                    'udp_bytes_sent': stream.udp_bytes_sent,
+                    'udp_errors': stream.udp_errors,
+                    'clients': [client.stats() for client in stream.clients.values()],
+                }
+                for key, stream in self.streams.items()
+            }
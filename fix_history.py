@@ -0,0 +1,212 @@
+# fix_history.py
+# 磁盘持久化的定位历史：按串口分目录，追加写入定长记录的分段文件，并维护稀疏时间索引
+import os
+import struct
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from input_sources import safe_port_name
+
+# 记录格式：时间戳(秒) 纬度 经度 速度 航向 卫星数 海拔
+RECORD = struct.Struct('<3d4f')
+FIELDS = ('time', 'lat', 'lon', 'speed', 'course', 'satellites', 'altitude')
+RECORD_DTYPE = np.dtype([(name, '<f8' if i < 3 else '<f4') for i, name in enumerate(FIELDS)])
+INDEX_ENTRY = struct.Struct('<dQ')  # (时间戳, 段内记录序号)
+
+
+class _Segment:
+    """单个分段文件及其稀疏索引"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path[:-4] + '.idx'
+        self.index_times = []  # 稀疏索引：时间戳
+        self.index_records = []  # 稀疏索引：对应记录序号
+        self.count = 0
+        self.t_first = None
+        self.t_last = None
+
+    def load(self):
+        """从磁盘恢复索引和首尾时间"""
+        self.count = os.path.getsize(self.path) // RECORD.size
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+            usable = len(data) - len(data) % INDEX_ENTRY.size
+            for t, record_no in INDEX_ENTRY.iter_unpack(data[:usable]):
+                if record_no < self.count:
+                    self.index_times.append(t)
+                    self.index_records.append(record_no)
+        if self.count:
+            with open(self.path, 'rb') as f:
+                self.t_first = RECORD.unpack(f.read(RECORD.size))[0]
+                f.seek((self.count - 1) * RECORD.size)
+                self.t_last = RECORD.unpack(f.read(RECORD.size))[0]
+
+    def record_bounds(self, t0: float, t1: float):
+        """用稀疏索引估算 [t0, t1] 对应的记录区间（保守，可能多读一个索引间隔）"""
+        i = bisect_right(self.index_times, t0) - 1
+        start = self.index_records[i] if i >= 0 else 0
+        j = bisect_right(self.index_times, t1)
+        end = self.index_records[j] if j < len(self.index_records) else self.count
+        return start, end
+
+
+class FixHistory:
+    """按串口存储全部定位结果，支持按时间窗口惰性查询"""
+
+    def __init__(self, root_dir: str, segment_records: int = 1000000, index_interval: int = 256,
+                 flush_records: int = 256):
+        self.root_dir = root_dir
+        self.segment_records = segment_records  # 每段最多记录数（约40MB）
+        self.index_interval = index_interval  # 每隔多少条记录写一个索引项
+        self.flush_records = flush_records  # 缓冲多少条记录后落盘
+        self.segments = {}  # 串口 -> [_Segment]
+        self.pending = {}  # 串口 -> 未落盘的记录字节
+        self.pending_times = {}  # 串口 -> 未落盘记录的时间戳
+        os.makedirs(root_dir, exist_ok=True)
+        self._load_existing()
+
+    @staticmethod
+    def _port_dir_name(port: str):
+        return safe_port_name(port)
+
+    def _load_existing(self):
+        """加载已有的分段（支持重新打开之前的会话）"""
+        for name in sorted(os.listdir(self.root_dir)):
+            port_dir = os.path.join(self.root_dir, name)
+            if not os.path.isdir(port_dir):
+                continue
+            segments = []
+            for filename in sorted(os.listdir(port_dir)):
+                if filename.endswith('.bin'):
+                    segment = _Segment(os.path.join(port_dir, filename))
+                    segment.load()
+                    segments.append(segment)
+            if segments:
+                self.segments[name] = segments
+
+    def ports(self):
+        return sorted(set(self.segments) | set(self.pending))
+
+    def append(self, port: str, t: float, lat: float, lon: float, speed: float, course: float,
+               satellites: float, altitude: float):
+        """追加一条定位记录（时间戳需单调不减）"""
+        key = self._port_dir_name(port)
+        buffer = self.pending.setdefault(key, bytearray())
+        buffer += RECORD.pack(t, lat, lon, speed, course, satellites, altitude)
+        self.pending_times.setdefault(key, []).append(t)
+        if len(self.pending_times[key]) >= self.flush_records:
+            self._flush_port(key)
+
+    def _new_segment(self, key: str):
+        port_dir = os.path.join(self.root_dir, key)
+        os.makedirs(port_dir, exist_ok=True)
+        segments = self.segments.setdefault(key, [])
+        segment = _Segment(os.path.join(port_dir, f"seg_{len(segments):06d}.bin"))
+        segments.append(segment)
+        return segment
+
+    def _flush_port(self, key: str):
+        buffer = self.pending.get(key)
+        times = self.pending_times.get(key)
+        if not times:
+            return
+
+        offset = 0
+        while offset < len(times):
+            segments = self.segments.get(key)
+            segment = segments[-1] if segments else None
+            if segment is None or segment.count >= self.segment_records:
+                segment = self._new_segment(key)
+
+            n = min(len(times) - offset, self.segment_records - segment.count)
+            index_data = bytearray()
+            for i in range(offset, offset + n):
+                record_no = segment.count + i - offset
+                if record_no % self.index_interval == 0:
+                    segment.index_times.append(times[i])
+                    segment.index_records.append(record_no)
+                    index_data += INDEX_ENTRY.pack(times[i], record_no)
+
+            with open(segment.path, 'ab') as f:
+                f.write(buffer[offset * RECORD.size:(offset + n) * RECORD.size])
+            if index_data:
+                with open(segment.index_path, 'ab') as f:
+                    f.write(index_data)
+
+            if segment.t_first is None:
+                segment.t_first = times[offset]
+            segment.t_last = times[offset + n - 1]
+            segment.count += n
+            offset += n
+
+        self.pending[key] = bytearray()
+        self.pending_times[key] = []
+
+    def flush(self):
+        """将所有缓冲记录落盘"""
+        for key in list(self.pending):
+            self._flush_port(key)
+
+    def time_range(self, port: str):
+        """返回该串口历史的 (最早时间, 最晚时间)，无数据时返回None"""
+        key = self._port_dir_name(port)
+        segments = [s for s in self.segments.get(key, []) if s.count]
+        times = self.pending_times.get(key) or []
+        if not segments and not times:
+            return None
+        t_first = segments[0].t_first if segments else times[0]
+        t_last = times[-1] if times else segments[-1].t_last
+        return t_first, t_last
+
+    def count(self, port: str, t0: float, t1: float):
+        """根据稀疏索引估算时间窗口内的记录数（不读数据文件）"""
+        key = self._port_dir_name(port)
+        total = 0
+        for segment in self.segments.get(key, []):
+            if segment.count and segment.t_last >= t0 and segment.t_first <= t1:
+                start, end = segment.record_bounds(t0, t1)
+                total += end - start
+        times = self.pending_times.get(key) or []
+        total += bisect_right(times, t1) - bisect_left(times, t0)
+        return total
+
+    def query(self, port: str, t0: float, t1: float, stride: int = 1):
+        """读取 [t0, t1] 内的记录，每stride条取一条；只读取与窗口重叠的分段
+
+        分段文件按内存映射访问，二分定位窗口边界后只取步长上的记录，缩小视图时不会读出整个窗口。
+        """
+        key = self._port_dir_name(port)
+        stride = max(1, int(stride))
+        parts = []
+        phase = 0  # 窗口内已跳过的记录数（跨分段保持抽取步长连续）
+
+        for segment in self.segments.get(key, []):
+            if not segment.count or segment.t_last < t0 or segment.t_first > t1:
+                continue
+            records = np.memmap(segment.path, dtype=RECORD_DTYPE, mode='r', shape=(segment.count,))
+            start, end = segment.record_bounds(t0, t1)
+            times = records['time']
+            lo = bisect_left(times, t0, start, end)
+            hi = bisect_right(times, t1, lo, end)
+            first = lo + (-phase) % stride
+            if first < hi:
+                parts.append(np.array(records[first:hi:stride]))
+            phase += hi - lo
+            del records, times  # 释放映射（分段仍在追加写入）
+
+        # 追加尚未落盘的记录
+        times = self.pending_times.get(key) or []
+        lo, hi = bisect_left(times, t0), bisect_right(times, t1)
+        first = lo + (-phase) % stride
+        if first < hi:
+            pending = np.frombuffer(self.pending[key], dtype=RECORD_DTYPE, count=len(times))
+            parts.append(np.array(pending[first:hi:stride]))
+
+        records = np.concatenate(parts) if parts else np.empty(0, dtype=RECORD_DTYPE)
+        return {name: records[name].astype(float).tolist() for name in FIELDS}
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,242 @@
+# fix_stats.py
+# 定位质量增量统计：每个定位结果O(1)更新（Welford滑动矩 + P²分位数），按串口计算均值位置、CEP、2DRMS等
+import math
+from track_view import EARTH_RADIUS, local_distance_m
+
+
+class P2Quantile:
+    """P²算法流式估计分位数（Jain & Chlamtac），固定5个标记，不保存样本"""
+
+    def __init__(self, p: float):
+        self.p = p
+        self.initial = []  # 前5个样本
+        self.q = None  # 标记高度
+        self.n = None  # 标记位置
+        self.np = None  # 期望位置
+        self.dn = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def add(self, x: float):
+        if self.q is None:
+            self.initial.append(x)
+            if len(self.initial) == 5:
+                self.initial.sort()
+                self.q = list(self.initial)
+                self.n = [0, 1, 2, 3, 4]
+                p = self.p
+                self.np = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+            return
+
+        q, n = self.q, self.n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = max(q[4], x)
+            k = 3
+        else:
+            k = 0
+            while k < 3 and x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+
+        # 调整中间3个标记
+        for i in (1, 2, 3):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = self._parabolic(i, d)
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = candidate
+                n[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self.q, self.n
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        """当前分位数估计，样本不足时返回None"""
+        if self.q is not None:
+            return self.q[2]
+        if not self.initial:
+            return None
+        data = sorted(self.initial)
+        return data[min(len(data) - 1, int(round(self.p * (len(data) - 1))))]
+
+
+class RunningMoments:
+    """Welford算法：流式均值和方差"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class PortStats:
+    """单个串口的定位质量统计（从复位开始累计）"""
+
+    HDOP_BIN = 0.5  # HDOP直方图分箱宽度
+    HDOP_BINS = 20  # 最后一箱包含 >= 10
+
+    def __init__(self):
+        self.reference = None  # 参考位置 (lat, lon)；None时以当前均值为参考
+        self.reset()
+
+    def reset(self):
+        self.lat = RunningMoments()
+        self.lon = RunningMoments()
+        self.alt = RunningMoments()
+        self.cep50 = P2Quantile(0.5)
+        self.cep95 = P2Quantile(0.95)
+        self.hdop = RunningMoments()
+        self.hdop_hist = [0] * self.HDOP_BINS
+        self.sat_hist = {}  # 卫星数 -> 次数
+        self.quality_hist = {}  # GGA定位质量 -> 次数
+        self.epochs = 0  # 收到的定位历元数（以GGA为准，没有GGA时用RMC）
+        self.valid_epochs = 0
+        self.epoch_type = None
+        self.start_time = None  # 复位后收到第一条语句的时间（接收时间）
+        self.first_fix_time = None
+        self.last_time = None
+
+    def add(self, result: dict):
+        """输入一条解析结果（NMEAParser.parse_gngga/parse_gnrmc的输出）"""
+        rx_time = result.get('rx_time')
+        if rx_time is not None:
+            if self.start_time is None:
+                self.start_time = rx_time
+            self.last_time = rx_time
+
+        kind = result.get('type')
+        # 可用率按一种语句计数：有GGA时只数GGA，避免同一历元被数两次
+        if self.epoch_type is None or (kind == 'GNGGA' and self.epoch_type != 'GNGGA'):
+            if self.epoch_type is not None:
+                # 改为以GGA计数，丢弃此前按RMC累计的样本
+                self.epochs = self.valid_epochs = 0
+                self.lat = RunningMoments()
+                self.lon = RunningMoments()
+                self.cep50 = P2Quantile(0.5)
+                self.cep95 = P2Quantile(0.95)
+            self.epoch_type = kind
+        if kind == self.epoch_type:
+            self.epochs += 1
+            if result.get('valid'):
+                self.valid_epochs += 1
+
+        if not result.get('valid'):
+            return
+        if self.first_fix_time is None and rx_time is not None:
+            self.first_fix_time = rx_time
+
+        if kind != self.epoch_type:
+            return  # 位置只取计数用的语句，避免RMC和GGA重复计入
+        lat, lon = result['latitude'], result['longitude']
+        self.lat.add(lat)
+        self.lon.add(lon)
+
+        ref_lat, ref_lon = self.reference or (self.lat.mean, self.lon.mean)
+        error = local_distance_m(ref_lat, ref_lon, lat, lon)
+        self.cep50.add(error)
+        self.cep95.add(error)
+
+        if kind == 'GNGGA':
+            self.alt.add(result['altitude'])
+            hdop = result['hdop']
+            self.hdop.add(hdop)
+            self.hdop_hist[min(self.HDOP_BINS - 1, int(hdop / self.HDOP_BIN))] += 1
+            satellites = result['satellites']
+            self.sat_hist[satellites] = self.sat_hist.get(satellites, 0) + 1
+            quality = result['quality']
+            self.quality_hist[quality] = self.quality_hist.get(quality, 0) + 1
+
+    @property
+    def ttff(self):
+        """首次定位时间（秒）：复位后第一条语句到第一个有效定位"""
+        if self.first_fix_time is None or self.start_time is None:
+            return None
+        return self.first_fix_time - self.start_time
+
+    @property
+    def drms2(self) -> float:
+        """2DRMS（米）：2倍水平方向标准差的均方根"""
+        k = math.pi / 180.0 * EARTH_RADIUS
+        std_n = self.lat.std * k
+        std_e = self.lon.std * k * math.cos(math.radians(self.lat.mean))
+        return 2 * math.sqrt(std_n ** 2 + std_e ** 2)
+
+    def summary(self) -> dict:
+        """当前统计结果（界面显示用）"""
+        count = self.lat.count
+        sat_total = sum(self.sat_hist.values())
+        return {
+            'count': count,
+            'availability': self.valid_epochs / self.epochs * 100 if self.epochs else None,
+            'ttff': self.ttff,
+            'mean_lat': self.lat.mean if count else None,
+            'mean_lon': self.lon.mean if count else None,
+            'mean_alt': self.alt.mean if self.alt.count else None,
+            'std_alt': self.alt.std if self.alt.count > 1 else None,
+            'cep50': self.cep50.value(),
+            'cep95': self.cep95.value(),
+            'drms2': self.drms2 if count > 1 else None,
+            'hdop_mean': self.hdop.mean if self.hdop.count else None,
+            'hdop_max_bin': self._hdop_mode(),
+            'sat_mean': sum(k * v for k, v in self.sat_hist.items()) / sat_total if sat_total else None,
+            'sat_min': min(self.sat_hist) if self.sat_hist else None,
+            'sat_max': max(self.sat_hist) if self.sat_hist else None,
+            'quality': dict(sorted(self.quality_hist.items())),
+            'duration': (self.last_time - self.start_time) if self.start_time is not None else None,
+        }
+
+    def _hdop_mode(self):
+        """HDOP最多的分箱（区间字符串）"""
+        if not any(self.hdop_hist):
+            return None
+        i = max(range(self.HDOP_BINS), key=self.hdop_hist.__getitem__)
+        low = i * self.HDOP_BIN
+        return f"{low:.1f}+" if i == self.HDOP_BINS - 1 else f"{low:.1f}-{low + self.HDOP_BIN:.1f}"
+
+
+class FixStatistics:
+    """所有串口的定位统计；add()可直接作为串口控件的fix_callbacks回调"""
+
+    def __init__(self, max_ports: int = 8):
+        self.ports = {i: PortStats() for i in range(1, max_ports + 1)}
+
+    def add(self, port_index: int, result: dict):
+        stats = self.ports.get(port_index)
+        if stats is not None:
+            stats.add(result)
+
+    def reset(self, port_index: int = None):
+        """复位统计窗口（不指定串口时全部复位）"""
+        for index, stats in self.ports.items():
+            if port_index is None or index == port_index:
+                stats.reset()
+
+    def set_reference(self, port_index: int, reference):
+        """设置参考位置 (lat, lon)（已知坐标点），None表示以均值为参考；CEP从此时重新统计"""
+        stats = self.ports[port_index]
+        stats.reference = reference
+        stats.cep50 = P2Quantile(0.5)
+        stats.cep95 = P2Quantile(0.95)
@@ -0,0 +1,400 @@
+# geofence.py
+# 电子围栏与告警规则：围栏按网格建立空间索引（每个定位只检查所在格子内的围栏），
+# 规则在每个解析结果上评估（失锁、超速、卫星数不足、离开走廊/进入禁区），告警经去抖后记录
+import csv
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from track_view import EARTH_RADIUS
+
+METERS_PER_DEG = EARTH_RADIUS * math.pi / 180.0
+
+MODE_STAY_IN = 'stay_in'  # 进入后不得离开（走廊、作业区），离开时告警
+MODE_KEEP_OUT = 'keep_out'  # 不得进入（禁区），进入时告警
+
+
+class PolygonFence:
+    """多边形围栏；rings为 [外环, 内环...]，每个环是 [(lat, lon), ...]"""
+
+    def __init__(self, name: str, rings, mode: str = MODE_STAY_IN, group: str = None, ports=None):
+        self.name = name
+        self.rings = [[(float(lat), float(lon)) for lat, lon in ring] for ring in rings]
+        self.mode = mode
+        self.group = group or name  # 同组围栏视为一个区域（离开全部才算离开）
+        self.ports = set(ports) if ports else None  # 只对这些串口生效，None表示全部
+        lats = [p[0] for p in self.rings[0]]
+        lons = [p[1] for p in self.rings[0]]
+        self.bbox = (min(lats), min(lons), max(lats), max(lons))
+
+    def index_boxes(self):
+        """参与索引的 (编号, 外包框)；多边形整体一个"""
+        return [(None, self.bbox)]
+
+    def contains(self, lat: float, lon: float, part=None) -> bool:
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        inside = False
+        for ring in self.rings:
+            # 射线法；内环（洞）再翻转一次
+            if _point_in_ring(lat, lon, ring):
+                inside = not inside
+        return inside
+
+
+class CorridorFence:
+    """走廊围栏：折线两侧half_width_m米以内；每段单独索引，长路线也只检查附近的几段"""
+
+    def __init__(self, name: str, line, half_width_m: float, mode: str = MODE_STAY_IN,
+                 group: str = None, ports=None):
+        self.name = name
+        self.line = [(float(lat), float(lon)) for lat, lon in line]
+        self.half_width_m = half_width_m
+        self.mode = mode
+        self.group = group or name
+        self.ports = set(ports) if ports else None
+        # 每段预先算好局部平面坐标系（以段起点纬度做经度缩放）
+        self.segments = []
+        for (lat1, lon1), (lat2, lon2) in zip(self.line, self.line[1:] or self.line):
+            cos_lat = math.cos(math.radians(lat1))
+            dx = (lon2 - lon1) * cos_lat * METERS_PER_DEG
+            dy = (lat2 - lat1) * METERS_PER_DEG
+            self.segments.append((lat1, lon1, cos_lat, dx, dy, dx * dx + dy * dy))
+        lats = [p[0] for p in self.line]
+        lons = [p[1] for p in self.line]
+        self.bbox = self._expand((min(lats), min(lons), max(lats), max(lons)))
+
+    def _expand(self, box):
+        min_lat, min_lon, max_lat, max_lon = box
+        dlat = self.half_width_m / METERS_PER_DEG
+        dlon = dlat / max(0.01, math.cos(math.radians(max(abs(min_lat), abs(max_lat)))))
+        return min_lat - dlat, min_lon - dlon, max_lat + dlat, max_lon + dlon
+
+    def index_boxes(self):
+        boxes = []
+        for i, ((lat1, lon1), (lat2, lon2)) in enumerate(zip(self.line, self.line[1:] or self.line)):
+            boxes.append((i, self._expand((min(lat1, lat2), min(lon1, lon2), max(lat1, lat2), max(lon1, lon2)))))
+        return boxes
+
+    def segment_distance(self, i: int, lat: float, lon: float) -> float:
+        lat1, lon1, cos_lat, dx, dy, length2 = self.segments[i]
+        px = (lon - lon1) * cos_lat * METERS_PER_DEG
+        py = (lat - lat1) * METERS_PER_DEG
+        t = 0.0 if length2 == 0.0 else max(0.0, min(1.0, (px * dx + py * dy) / length2))
+        return math.hypot(px - t * dx, py - t * dy)
+
+    def contains(self, lat: float, lon: float, part=None) -> bool:
+        parts = range(len(self.segments)) if part is None else (part,)
+        return any(self.segment_distance(i, lat, lon) <= self.half_width_m for i in parts)
+
+
+def _point_in_ring(lat: float, lon: float, ring) -> bool:
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        lat_i, lon_i = ring[i]
+        lat_j, lon_j = ring[j]
+        if (lat_i > lat) != (lat_j > lat):
+            cross = lon_i + (lat - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+            if lon < cross:
+                inside = not inside
+        j = i
+    return inside
+
+
+class FenceIndex:
+    """均匀网格空间索引：格子 -> [(围栏, 段编号)]；覆盖格子过多的围栏放入"大围栏"列表逐个按外包框检查"""
+
+    def __init__(self, cell_deg: float = 0.01, max_cells_per_box: int = 4096):
+        self.cell_deg = cell_deg  # 格子大小（度），0.01度约1公里
+        self.max_cells_per_box = max_cells_per_box
+        self.cells = {}
+        self.large = []  # [(围栏, 段编号, 外包框)]
+        self.fences = []
+
+    def _cell(self, lat: float, lon: float):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def add(self, fence):
+        self.fences.append(fence)
+        for part, (min_lat, min_lon, max_lat, max_lon) in fence.index_boxes():
+            x0, y0 = self._cell(min_lat, min_lon)
+            x1, y1 = self._cell(max_lat, max_lon)
+            if (x1 - x0 + 1) * (y1 - y0 + 1) > self.max_cells_per_box:
+                self.large.append((fence, part, (min_lat, min_lon, max_lat, max_lon)))
+                continue
+            entry = (fence, part)
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    self.cells.setdefault((x, y), []).append(entry)
+
+    def clear(self):
+        self.cells = {}
+        self.large = []
+        self.fences = []
+
+    def containing(self, lat: float, lon: float, port_index: int = None) -> set:
+        """包含该点的围栏集合"""
+        found = set()
+        candidates = self.cells.get(self._cell(lat, lon), ())
+        for fence, part in candidates:
+            if fence in found or (fence.ports is not None and port_index not in fence.ports):
+                continue
+            if fence.contains(lat, lon, part):
+                found.add(fence)
+        for fence, part, (min_lat, min_lon, max_lat, max_lon) in self.large:
+            if fence in found or not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+                continue
+            if (fence.ports is None or port_index in fence.ports) and fence.contains(lat, lon, part):
+                found.add(fence)
+        return found
+
+    def __len__(self):
+        return len(self.fences)
+
+
+def load_geojson(path: str, default_width_m: float = 20.0) -> list:
+    """从GeoJSON读取围栏：Polygon/MultiPolygon为多边形，LineString/MultiLineString为走廊
+
+    properties: name 名称、mode 为 stay_in/keep_out、group 分组、width_m 走廊半宽（米）、ports 串口列表
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    features = data.get('features', [data]) if data.get('type') == 'FeatureCollection' else [data]
+    fences = []
+    for n, feature in enumerate(features):
+        geometry = (feature.get('geometry') if feature.get('type') == 'Feature' else feature) or {}
+        props = feature.get('properties') or {}
+        name = str(props.get('name') or f"{os.path.basename(path)}#{n + 1}")
+        mode = props.get('mode', MODE_STAY_IN)
+        group = props.get('group')
+        ports = props.get('ports')
+        kind = geometry.get('type')
+        coords = geometry.get('coordinates') or []
+
+        def to_lat_lon(points):
+            return [(p[1], p[0]) for p in points]  # GeoJSON坐标顺序为 [经度, 纬度]
+
+        if kind == 'Polygon':
+            fences.append(PolygonFence(name, [to_lat_lon(r) for r in coords], mode, group, ports))
+        elif kind == 'MultiPolygon':
+            for k, polygon in enumerate(coords):
+                fences.append(PolygonFence(f"{name}.{k + 1}", [to_lat_lon(r) for r in polygon], mode,
+                                           group or name, ports))
+        elif kind in ('LineString', 'MultiLineString'):
+            width = float(props.get('width_m', default_width_m))
+            lines = [coords] if kind == 'LineString' else coords
+            for k, line in enumerate(lines):
+                fences.append(CorridorFence(name if len(lines) == 1 else f"{name}.{k + 1}",
+                                            to_lat_lon(line), width, mode, group or name, ports))
+    return fences
+
+
+@dataclass
+class Alert:
+    """一条告警事件"""
+    time: float  # 接收时间（墙上时间，秒）
+    port: int
+    rule: str
+    message: str
+    raised: bool  # True为触发，False为恢复
+
+
+class AlertState:
+    """单个 (串口, 规则) 的去抖状态：条件持续debounce_s秒才触发，持续clear_s秒不满足才恢复"""
+
+    def __init__(self):
+        self.active = False
+        self.pending_since = None
+        self.clear_since = None
+        self.detail = ""
+
+
+@dataclass
+class RuleConfig:
+    """告警规则参数"""
+    fix_lost: bool = True  # 失锁（GGA定位质量为0或RMC状态为V）
+    speed_limit_kmh: float = 0.0  # 超速，0表示不检查
+    min_satellites: int = 0  # 卫星数不足，0表示不检查
+    fences: bool = True  # 离开走廊/作业区、进入禁区
+    debounce_s: float = 2.0
+    clear_s: float = 2.0
+
+
+class AlertEngine:
+    """在每个解析结果上评估告警规则；evaluate()可直接作为串口控件的fix_callbacks回调"""
+
+    def __init__(self, config: RuleConfig = None, index: FenceIndex = None, log_path: str = None,
+                 max_alerts: int = 1000):
+        self.config = config or RuleConfig()
+        self.index = index or FenceIndex()
+        self.log_path = log_path  # 告警CSV日志，None表示不记录
+        self.alerts = deque(maxlen=max_alerts)  # 最近的告警事件
+        self.alert_count = 0  # 累计告警事件数（界面据此增量显示）
+        self.listeners = []  # listener(Alert)
+        self.states = {}  # (串口, 规则键) -> AlertState
+        self.inside = {}  # 串口 -> 当前所在的围栏分组 {分组: 模式}
+        self.watch = {}  # 串口 -> 已离开但告警尚未结束的分组（只有这些分组在区域外时需要评估）
+        self.group_modes = {}  # 分组 -> 模式
+        self.position_types = {}  # 串口 -> 用于围栏判断的语句类型
+        self._lock = threading.Lock()
+
+        # 评估耗时统计
+        self.evaluations = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def set_fences(self, fences):
+        """替换全部围栏（重置围栏相关状态）"""
+        self.index.clear()
+        for fence in fences:
+            self.index.add(fence)
+        self.group_modes = {fence.group: fence.mode for fence in fences}
+        self.inside.clear()
+        self.watch.clear()
+        for key in [key for key in self.states if key[1].startswith('fence:')]:
+            del self.states[key]
+
+    def evaluate(self, port_index: int, result: dict):
+        start = time.perf_counter()
+        now = result.get('rx_time') or time.time()
+        config = self.config
+        kind = result.get('type')
+        conditions = {}  # 规则键 -> (条件是否成立, 说明)；本条语句不涉及的规则不出现
+
+        if config.fix_lost:
+            # 解析错误的语句不参与判断
+            if kind == 'GNGGA' and 'quality' in result:
+                conditions['fix_lost'] = (result['quality'] == 0, "GGA定位质量为0")
+            elif kind == 'GNRMC' and (result.get('valid') or result.get('status') == '无效数据'):
+                conditions['fix_lost'] = (not result['valid'], "RMC状态为V")
+        if result.get('valid'):
+            if config.speed_limit_kmh and kind == 'GNRMC':
+                speed = result['speed']
+                conditions['speed'] = (speed > config.speed_limit_kmh,
+                                       f"速度 {speed:.1f} km/h 超过 {config.speed_limit_kmh:g} km/h")
+            if config.min_satellites and kind == 'GNGGA':
+                satellites = result['satellites']
+                conditions['satellites'] = (satellites < config.min_satellites,
+                                            f"卫星数 {satellites} 少于 {config.min_satellites}")
+            # 围栏只用一种语句的位置判断（有GGA时用GGA），避免同一历元查两次
+            position_type = self.position_types.get(port_index)
+            if position_type is None or (kind == 'GNGGA' and position_type != 'GNGGA'):
+                position_type = self.position_types[port_index] = kind
+            if config.fences and len(self.index) and kind == position_type:
+                conditions.update(self._fence_conditions(port_index, result['latitude'], result['longitude']))
+
+        for key, (active, detail) in conditions.items():
+            self._update(port_index, key, active, detail, now)
+        watch = self.watch.get(port_index)
+        if watch:
+            # 告警已结束（或从未触发）的分组不再跟踪
+            for group in [g for g in watch if not self._live(port_index, f"fence:{g}")]:
+                watch.discard(group)
+
+        elapsed = time.perf_counter() - start
+        self.evaluations += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    add = evaluate
+
+    def _fence_conditions(self, port_index: int, lat: float, lon: float) -> dict:
+        fences = self.index.containing(lat, lon, port_index)
+        groups = {fence.group: fence.mode for fence in fences}
+        previous = self.inside.get(port_index, {})
+        self.inside[port_index] = groups
+        watch = self.watch.setdefault(port_index, set())
+        watch.update(group for group in previous if group not in groups)
+
+        # 所在的分组：禁区条件成立、作业区条件不成立；刚离开或告警未结束的分组：反之
+        conditions = {}
+        for group, mode in groups.items():
+            conditions[f"fence:{group}"] = self._fence_condition(group, mode, True)
+        for group in watch:
+            if group not in groups:
+                conditions[f"fence:{group}"] = self._fence_condition(group, self.group_modes.get(group), False)
+        return conditions
+
+    @staticmethod
+    def _fence_condition(group: str, mode: str, inside: bool):
+        if mode == MODE_KEEP_OUT:
+            return inside, f"进入禁区 {group}"
+        return not inside, f"离开区域 {group}"
+
+    def _live(self, port_index: int, key: str) -> bool:
+        state = self.states.get((port_index, key))
+        return state is not None and (state.active or state.pending_since is not None)
+
+    def _update(self, port_index: int, key: str, condition: bool, detail: str, now: float):
+        state = self.states.get((port_index, key))
+        if state is None:
+            if not condition:
+                return
+            state = self.states[(port_index, key)] = AlertState()
+        config = self.config
+        if condition:
+            state.clear_since = None
+            state.detail = detail
+            if state.active:
+                return
+            if state.pending_since is None:
+                state.pending_since = now
+            if now - state.pending_since >= config.debounce_s:
+                state.active = True
+                state.pending_since = None
+                self._emit(Alert(now, port_index, key, detail, True))
+        else:
+            state.pending_since = None
+            if not state.active:
+                return
+            if state.clear_since is None:
+                state.clear_since = now
+            if now - state.clear_since >= config.clear_s:
+                state.active = False
+                state.clear_since = None
+                self._emit(Alert(now, port_index, key, f"恢复: {state.detail}", False))
+
+    def _emit(self, alert: Alert):
+        self.alerts.append(alert)
+        self.alert_count += 1
+        if self.log_path:
+            try:
+                with self._lock:
+                    new_file = not os.path.exists(self.log_path)
+                    if new_file:
+                        os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+                    with open(self.log_path, 'a', newline='', encoding='utf-8-sig' if new_file else 'utf-8') as f:
+                        writer = csv.writer(f)
+                        if new_file:
+                            writer.writerow(["时间", "串口", "规则", "事件", "说明"])
+                        writer.writerow([time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(alert.time)),
+                                         alert.port, alert.rule, "触发" if alert.raised else "恢复", alert.message])
+            except OSError as e:
+                print(f"告警日志写入失败: {str(e)}")
+        for listener in self.listeners:
+            try:
+                listener(alert)
+            except Exception as e:
+                print(f"告警回调错误: {str(e)}")
+
+    def active_alerts(self) -> list:
+        """当前处于触发状态的 (串口, 规则键, 说明)"""
+        return [(port, key, state.detail) for (port, key), state in sorted(self.states.items()) if state.active]
+
+    def reset(self):
+        self.states.clear()
+        self.inside.clear()
+        self.watch.clear()
+        self.position_types.clear()
+        self.alerts.clear()
+
+    def stats_text(self) -> str:
+        average = self.total_time / self.evaluations * 1e6 if self.evaluations else 0.0
+        return (f"围栏 {len(self.index)} 个，评估 {self.evaluations} 次，"
+                f"平均 {average:.0f} µs，最长 {self.max_time * 1e6:.0f} µs")
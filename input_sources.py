@@ -0,0 +1,235 @@
+# input_sources.py
+# 可插拔的数据源：本地串口/伪终端、pyserial URL（socket://、loop://、rfc2217:// 等）、普通文件和FIFO
+import array
+import os
+import re
+import stat
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import serial
+
+try:
+    import fcntl
+    import termios
+except ImportError:  # Windows下没有FIFO，不需要
+    fcntl = termios = None
+
+# Linux读取串口驱动收发计数（struct serial_icounter_struct）的ioctl
+TIOCGICOUNT = 0x545D
+
+# pyserial serial_for_url 支持的协议
+SERIAL_URL_SCHEMES = ('socket', 'loop', 'rfc2217', 'spy', 'hwgrep', 'alt', 'cp2110')
+
+
+class SourceEOF(Exception):
+    """数据源已读完（文件回放结束），不需要重连"""
+
+
+def is_source_url(port: str) -> bool:
+    """是否为URL形式的数据源"""
+    return '://' in port
+
+
+def safe_port_name(port: str) -> str:
+    """把串口名/URL转换成可用于文件名的字符串"""
+    name = port.split('://', 1)[-1] if is_source_url(port) else port
+    scheme = port.split('://', 1)[0] + '_' if is_source_url(port) else ''
+    return re.sub(r'[^0-9A-Za-z._-]+', '_', scheme + name).strip('_') or 'port'
+
+
+def source_exists(port: str) -> bool:
+    """URL或文件系统中存在的路径（伪终端、FIFO、回放文件）不需要出现在枚举列表里"""
+    return is_source_url(port) or os.path.exists(port)
+
+
+class SourceStats:
+    """数据源吞吐统计"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.bytes_read = 0
+        self.reads = 0
+        self.rate = 0.0  # 最近1秒以上窗口的速率（字节/秒）
+        self._window_bytes = 0
+        self._window_start = self.started
+
+    def update(self, n: int):
+        self.bytes_read += n
+        self.reads += 1
+        self._window_bytes += n
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self.rate = self._window_bytes / (now - self._window_start)
+            self._window_bytes = 0
+            self._window_start = now
+
+    @property
+    def average_rate(self) -> float:
+        return self.bytes_read / max(time.monotonic() - self.started, 1e-6)
+
+
+class FileSource:
+    """普通文件/FIFO数据源（接口与serial.Serial的读取部分一致）
+
+    file://路径?rate=字节每秒&loop=1&follow=1
+      rate   按指定速率回放（默认不限速；可填波特率/10模拟串口）
+      loop   读到结尾后从头重放
+      follow 读到结尾后等待追加（类似tail -f）
+    """
+
+    def __init__(self, path: str, rate: float = 0, loop: bool = False, follow: bool = False):
+        self.port = path
+        self.rate = rate
+        self.loop = loop
+        self.follow = follow
+        self.fd = os.open(path, os.O_RDONLY | getattr(os, 'O_NONBLOCK', 0))
+        self.is_fifo = stat.S_ISFIFO(os.fstat(self.fd).st_mode)
+        self.is_open = True
+        self._position = 0
+        self._start = time.monotonic()
+
+    def _allowance(self) -> int:
+        """按回放速率当前允许读取的字节数"""
+        if not self.rate:
+            return 1 << 30
+        return max(0, int((time.monotonic() - self._start) * self.rate) - self._position)
+
+    @property
+    def in_waiting(self) -> int:
+        if not self.is_open:
+            raise serial.SerialException("数据源已关闭")
+        if self.is_fifo:
+            # 非阻塞打开的FIFO在写端关闭后仍可等待新的写端，无需重开
+            buf = array.array('i', [0])
+            fcntl.ioctl(self.fd, termios.FIONREAD, buf)
+            available = buf[0]
+        else:
+            available = os.fstat(self.fd).st_size - os.lseek(self.fd, 0, os.SEEK_CUR)
+            if available <= 0:
+                if self.loop:
+                    os.lseek(self.fd, 0, os.SEEK_SET)
+                    available = os.fstat(self.fd).st_size
+                elif not self.follow:
+                    raise SourceEOF(f"文件已读完: {self.port}")
+        return min(available, self._allowance())
+
+    def read(self, size: int = 1) -> bytes:
+        try:
+            data = os.read(self.fd, min(size, self._allowance()))
+        except BlockingIOError:
+            return b''
+        self._position += len(data)
+        return data
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            os.close(self.fd)
+
+
+class InputSource:
+    """统一封装各种数据源，附带吞吐统计和重连语义"""
+
+    def __init__(self, handle, kind: str, reconnectable: bool):
+        self.handle = handle
+        self.kind = kind  # 'serial' / 'url:<协议>' / 'file' / 'fifo'
+        self.reconnectable = reconnectable  # 断开后是否值得重连
+        self.stats = SourceStats()
+        # socket:// 的in_waiting只反映"是否可读"（0或1），改为非阻塞读取并给出读取上限
+        self.readable_hint = 4096 if kind == 'url:socket' else 0
+        if self.readable_hint:
+            handle.timeout = 0
+        self._icount_supported = kind == 'serial' and fcntl is not None and sys.platform.startswith('linux')
+
+    def read(self, size: int = 1) -> bytes:
+        data = self.handle.read(size)
+        if data:
+            self.stats.update(len(data))
+        return data
+
+    @property
+    def in_waiting(self) -> int:
+        available = self.handle.in_waiting
+        if self.readable_hint and available:
+            return self.readable_hint
+        return available
+
+    @property
+    def is_open(self) -> bool:
+        return self.handle.is_open
+
+    def overrun_count(self):
+        """驱动统计的接收溢出次数（UART硬件溢出 + 驱动缓冲区溢出），不支持时（伪终端、非Linux）返回None"""
+        if not self._icount_supported:
+            return None
+        counters = array.array('i', [0] * 20)
+        try:
+            fcntl.ioctl(self.handle.fileno(), TIOCGICOUNT, counters)
+        except (OSError, ValueError, AttributeError):
+            self._icount_supported = False
+            return None
+        # 字段顺序: cts dsr rng dcd rx tx frame overrun parity brk buf_overrun
+        return counters[7] + counters[10]
+
+    def describe(self) -> str:
+        """数据源类型和吞吐量的简要说明"""
+        return (f"{self.kind}，{self.stats.rate / 1024:.1f} KB/s"
+                f"（平均 {self.stats.average_rate / 1024:.1f} KB/s，共 {self.stats.bytes_read // 1024} KB）")
+
+    def close(self):
+        self.handle.close()
+
+    def __getattr__(self, name):
+        # 其余属性（port、baudrate等）透传给底层对象
+        return getattr(self.handle, name)
+
+
+def open_source(config) -> InputSource:
+    """按SerialConfig打开数据源；config.port可以是设备名、伪终端路径、文件路径或URL"""
+    port = config.port
+
+    if is_source_url(port):
+        parts = urlsplit(port)
+        scheme = parts.scheme.lower()
+        if scheme == 'file':
+            options = parse_qs(parts.query)
+            path = parts.netloc + parts.path
+            handle = FileSource(
+                path,
+                rate=float(options.get('rate', ['0'])[0]),
+                loop=options.get('loop', ['0'])[0] == '1',
+                follow=options.get('follow', ['0'])[0] == '1',
+            )
+            return InputSource(handle, 'fifo' if handle.is_fifo else 'file',
+                               reconnectable=handle.is_fifo or handle.follow)
+        if scheme in SERIAL_URL_SCHEMES:
+            handle = serial.serial_for_url(
+                port,
+                baudrate=config.baudrate,
+                bytesize=config.bytesize,
+                parity=config.parity,
+                stopbits=config.stopbits,
+                timeout=config.timeout
+            )
+            # loop:// 只存在于进程内，断开后重连没有意义
+            return InputSource(handle, f'url:{scheme}', reconnectable=scheme != 'loop')
+        raise ValueError(f"不支持的数据源: {port}")
+
+    # 普通文件或FIFO直接按文件读取；字符设备（含伪终端）按串口打开
+    if os.path.exists(port):
+        mode = os.stat(port).st_mode
+        if stat.S_ISREG(mode) or stat.S_ISFIFO(mode):
+            handle = FileSource(port)
+            return InputSource(handle, 'fifo' if handle.is_fifo else 'file', reconnectable=handle.is_fifo)
+
+    handle = serial.Serial(
+        port=port,
+        baudrate=config.baudrate,
+        bytesize=config.bytesize,
+        parity=config.parity,
+        stopbits=config.stopbits,
+        timeout=config.timeout
+    )
+    return InputSource(handle, 'serial', reconnectable=True)
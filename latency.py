@@ -0,0 +1,231 @@
+# latency.py
+# 输出延迟测量：把每个历元的NMEA UTC时间与主机接收时间配对，流式稳健估计各串口的延迟、抖动和主机时钟偏差
+#   延迟样本 d = 主机接收时间 - 历元UTC时间；取每个历元最先到达的RMC/GGA
+#   接收时间来自会话时钟锚点（单调时钟推进），会话中系统校时不会造成跳变，漂移反映主机晶振相对GNSS时间的快慢
+import bisect
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+MAD_SCALE = 1.4826  # 正态分布下 MAD -> 标准差
+
+
+class RobustWindow:
+    """滑动窗口中位数/MAD（有序列表维护，窗口内插入删除为O(N)，N为几百时足够快）"""
+
+    def __init__(self, size: int = 300):
+        self.size = size
+        self.values = deque()
+        self.sorted = []
+
+    def add(self, value: float):
+        self.values.append(value)
+        bisect.insort(self.sorted, value)
+        if len(self.values) > self.size:
+            old = self.values.popleft()
+            del self.sorted[bisect.bisect_left(self.sorted, old)]
+
+    def clear(self):
+        self.values.clear()
+        self.sorted = []
+
+    def __len__(self):
+        return len(self.sorted)
+
+    def median(self) -> float:
+        s = self.sorted
+        n = len(s)
+        mid = n // 2
+        return s[mid] if n % 2 else (s[mid - 1] + s[mid]) / 2
+
+    def mad(self, median: float) -> float:
+        return float(np.median(np.abs(np.asarray(self.sorted) - median)))
+
+    def quantile(self, p: float) -> float:
+        s = self.sorted
+        return s[min(len(s) - 1, int(p * (len(s) - 1)))]
+
+
+class PortLatency:
+    """单个串口的延迟估计：Hampel判别剔除离群样本，连续离群视为电平跳变（如接收机重启）后重新建窗"""
+
+    def __init__(self, window: int = 300, threshold: float = 3.0, min_samples: int = 10,
+                 mad_floor: float = 0.0005, shift_count: int = 8, floor_quantile: float = 0.05,
+                 capacity: int = 36000):
+        self.window = RobustWindow(window)
+        self.threshold = threshold  # 偏离中位数超过 threshold*σ（σ=1.4826*MAD）判为离群
+        self.min_samples = min_samples  # 样本不足时全部接受
+        self.mad_floor = mad_floor  # MAD下限（秒）：读取间隔造成的量化，避免MAD为0时误剔除
+        self.shift_count = shift_count
+        self.floor_quantile = floor_quantile
+        self.capacity = capacity
+        self.reset()
+
+    def reset(self):
+        self.window.clear()
+        self.last_utc = None
+        self.samples = 0
+        self.outliers = 0
+        self.shifts = 0  # 电平跳变次数
+        self.level_start = 0  # 最近一次电平跳变后的第一个样本序号（漂移只在同一电平内拟合）
+        self._run = []  # 连续的离群样本 (接收时间, 延迟)
+        self.rx_times = np.full(self.capacity, np.nan)
+        self.delays = np.full(self.capacity, np.nan)  # 被接受的延迟样本（秒）
+        self.floors = np.full(self.capacity, np.nan)  # 当时的时钟偏差估计（秒）
+        self.rejected = np.zeros(self.capacity, dtype=bool)
+        self.count = 0  # 已写入的总样本数（环形缓冲区写指针 = count % capacity）
+
+    def add(self, rx_time: float, utc: float):
+        """输入一个历元：主机接收时间（墙上时间，秒）和UTC当天秒数；同一历元只取第一条"""
+        if utc == self.last_utc:
+            return
+        self.last_utc = utc
+        # 不依赖RMC日期：按当天秒数取模，结果落在 ±12小时内
+        delay = (rx_time % 86400 - utc + 43200) % 86400 - 43200
+        self.samples += 1
+
+        window = self.window
+        outlier = False
+        if len(window) >= self.min_samples:
+            median = window.median()
+            sigma = MAD_SCALE * max(window.mad(median), self.mad_floor)
+            outlier = abs(delay - median) > self.threshold * sigma
+
+        if outlier:
+            self.outliers += 1
+            self._run.append((rx_time, delay))
+            if len(self._run) >= self.shift_count:
+                # 连续离群：认为延迟已整体变化，用这些样本重新建窗
+                self.shifts += 1
+                self.level_start = self.count - len(self._run) + 1
+                window.clear()
+                for _, d in self._run:
+                    window.add(d)
+                for k in range(1, len(self._run)):
+                    self.rejected[(self.count - k) % self.capacity] = False  # 已记录的几条改为接受
+                self._run = []
+                self._record(rx_time, delay, False)
+                return
+            self._record(rx_time, delay, True)
+            return
+        self._run = []
+        window.add(delay)
+        self._record(rx_time, delay, False)
+
+    def _record(self, rx_time: float, delay: float, rejected: bool):
+        i = self.count % self.capacity
+        self.rx_times[i] = rx_time
+        self.delays[i] = delay
+        self.floors[i] = self.window.quantile(self.floor_quantile) if len(self.window) else np.nan
+        self.rejected[i] = rejected
+        self.count += 1
+
+    def _ordered_slice(self, first: int = 0):
+        """按时间顺序返回环形缓冲区中样本序号 >= first 的下标"""
+        first = max(first, self.count - self.capacity, 0)
+        return np.arange(first, self.count) % self.capacity
+
+    def series(self, kind: str = 'delay', first: int = 0):
+        """返回 (接收时间, 值) 两个数组（毫秒）；kind为'delay'（被接受的延迟样本）或'offset'（时钟偏差估计）"""
+        idx = self._ordered_slice(first)
+        mask = ~self.rejected[idx]
+        times = self.rx_times[idx][mask]
+        values = (self.delays if kind == 'delay' else self.floors)[idx][mask]
+        return times, values * 1000
+
+    def drift_ppm(self, min_span: float = 60.0):
+        """当前电平内时钟偏差估计随时间的斜率（ppm）；时间跨度不足min_span秒时返回None"""
+        times, floors = self.series('offset', self.level_start + self.min_samples)
+        mask = ~np.isnan(floors)
+        times, floors = times[mask], floors[mask]
+        if len(times) < 2 or times[-1] - times[0] < min_span:
+            return None
+        slope = np.polyfit(times - times[0], floors / 1000, 1)[0]
+        return float(slope * 1e6)
+
+    def summary(self) -> dict:
+        window = self.window
+        if not len(window):
+            return {'samples': self.samples, 'outliers': self.outliers, 'shifts': self.shifts,
+                    'latency': None, 'jitter': None, 'offset': None, 'drift_ppm': None}
+        median = window.median()
+        return {
+            'samples': self.samples,
+            'outliers': self.outliers,
+            'shifts': self.shifts,
+            'latency': median,  # 中位数（秒），含主机时钟偏差
+            'jitter': MAD_SCALE * window.mad(median),  # 稳健标准差（秒）
+            'offset': window.quantile(self.floor_quantile),  # 延迟下沿（秒）：主机时钟偏差 + 接收机最小输出延迟
+            'drift_ppm': self.drift_ppm(),
+        }
+
+
+class LatencyMonitor:
+    """所有串口的延迟测量；add()可直接作为串口控件的fix_callbacks回调，未启用时直接返回"""
+
+    def __init__(self, max_ports: int = 8, **kwargs):
+        self.enabled = False
+        self.ports = {i: PortLatency(**kwargs) for i in range(1, max_ports + 1)}
+
+    def set_enabled(self, enabled: bool):
+        """开启测量时清空旧样本"""
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+    def add(self, port_index: int, result: dict):
+        if not self.enabled:
+            return
+        port = self.ports.get(port_index)
+        utc, rx_time = result.get('utc'), result.get('rx_time')
+        if port is None or utc is None or rx_time is None:
+            return
+        port.add(rx_time, utc)
+
+    def reset(self, port_index: int = None):
+        for index, port in self.ports.items():
+            if port_index is None or index == port_index:
+                port.reset()
+
+    def summary_text(self, port_indexes=None) -> str:
+        """各串口估计结果的一行摘要（毫秒）"""
+        parts = []
+        for index, port in self.ports.items():
+            if port_indexes is not None and index not in port_indexes:
+                continue
+            s = port.summary()
+            if s['latency'] is None:
+                continue
+            text = (f"串口{index}: 延迟 {s['latency'] * 1000:.1f} 抖动 {s['jitter'] * 1000:.1f} "
+                    f"偏差 {s['offset'] * 1000:.1f} ms")
+            if s['drift_ppm'] is not None:
+                text += f" 漂移 {s['drift_ppm']:+.1f} ppm"
+            if s['outliers']:
+                text += f" 离群 {s['outliers']}"
+            parts.append(text)
+        return "  ".join(parts)
+
+    def export_csv(self, filename: str) -> int:
+        """导出所有样本（含被剔除的离群样本）及各串口估计结果"""
+        rows = 0
+        with open(filename, 'w', encoding='utf-8') as f:
+            for index, port in self.ports.items():
+                s = port.summary()
+                if s['latency'] is None:
+                    continue
+                drift = '' if s['drift_ppm'] is None else f"{s['drift_ppm']:.3f}"
+                f.write(f"# port{index} samples={s['samples']} outliers={s['outliers']} shifts={s['shifts']} "
+                        f"latency_ms={s['latency'] * 1000:.3f} jitter_ms={s['jitter'] * 1000:.3f} "
+                        f"offset_ms={s['offset'] * 1000:.3f} drift_ppm={drift}\n")
+            f.write("port,rx_time,delay_ms,offset_ms,rejected\n")
+            for index, port in self.ports.items():
+                for i in port._ordered_slice():
+                    t = port.rx_times[i]
+                    stamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(t)) + f"{t % 1:.3f}"[1:] + 'Z'
+                    floor = port.floors[i]
+                    f.write(f"{index},{stamp},{port.delays[i] * 1000:.3f},"
+                            f"{'' if math.isnan(floor) else f'{floor * 1000:.3f}'},{int(port.rejected[i])}\n")
+                    rows += 1
+        return rows
@@ -0,0 +1,329 @@
+# log_index.py
+# 日志侧车索引：按固定间隔记录 (接收时间, NMEA UTC, 字节偏移)，按时间直接定位到日志中的位置
+#   写入时由LogWriter维护；已有日志可用 python log_index.py build 日志文件... 一次扫描补建
+#   查询：python log_index.py lookup 日志文件 --utc "2026-10-19 14:32:05" [--to "2026-10-19 14:33:00"]
+import argparse
+import calendar
+import gzip
+import math
+import os
+import re
+import struct
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+MAGIC = b'NMEAIDX1'
+ENTRY = struct.Struct('<ddQ')  # (接收时间, UTC时间, 行首字节偏移)，时间为Unix秒，未知时为NaN
+NAN = float('nan')
+
+# 带UTC时间字段的语句类型及其字段序号（与SentenceFilter一致）
+TIME_FIELDS = {b'RMC': 1, b'GGA': 1, b'GNS': 1, b'GST': 1, b'ZDA': 1, b'GBS': 1, b'GLL': 5}
+# 日志行首的接收时间戳前缀（开启"日志时间戳"时写入）
+RX_PREFIX = re.compile(rb'^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6})\] ')
+
+
+def index_path(log_path: str) -> str:
+    """日志对应的索引文件路径（压缩前后共用同一个索引）"""
+    if log_path.endswith('.gz'):
+        log_path = log_path[:-3]
+    return log_path + '.idx'
+
+
+def open_log(log_path: str):
+    """以二进制方式打开日志（支持gzip压缩的分段）"""
+    if log_path.endswith('.gz'):
+        return gzip.open(log_path, 'rb')
+    return open(log_path, 'rb')
+
+
+def parse_rx_prefix(line: bytes):
+    """解析行首接收时间戳，返回 (Unix秒, 前缀长度)；没有前缀时返回 (None, 0)"""
+    match = RX_PREFIX.match(line)
+    if match is None:
+        return None, 0
+    stamp = datetime.strptime(match.group(1).decode(), '%Y-%m-%d %H:%M:%S.%f')
+    return stamp.timestamp(), match.end()
+
+
+class UtcTracker:
+    """从语句中提取UTC：RMC/ZDA提供日期，其余语句只有时刻，按最近日期补全并处理跨天"""
+
+    def __init__(self, seed_utc: float = None):
+        """seed_utc：从日志中间开始扫描时，之前最近一次出现的UTC（取自索引项），用作日期锚点"""
+        self.day_start = None  # 当前日期0点的Unix秒
+        self.last_tod = None
+        self.utc = None  # 最近一条语句的UTC（Unix秒）
+        if seed_utc is not None and not math.isnan(seed_utc):
+            self.day_start = seed_utc // 86400 * 86400
+            self.last_tod = seed_utc - self.day_start
+            self.utc = seed_utc
+
+    def feed(self, line: bytes):
+        """解析一行，返回该行的UTC（无时间字段时返回None）"""
+        start = line.find(b'$')
+        if start < 0 or len(line) < start + 7:
+            return None
+        kind = line[start + 3:start + 6]
+        field = TIME_FIELDS.get(kind)
+        if field is None:
+            return None
+        parts = line[start:].split(b',')
+        if len(parts) <= field:
+            return None
+        time_str = parts[field]
+        try:
+            if len(time_str) < 6:
+                return None
+            tod = int(time_str[0:2]) * 3600 + int(time_str[2:4]) * 60 + float(time_str[4:])
+        except ValueError:
+            return None
+
+        date = None
+        try:
+            if kind == b'RMC' and len(parts) > 9 and len(parts[9]) >= 6:
+                d = parts[9]
+                date = (2000 + int(d[4:6]), int(d[2:4]), int(d[0:2]))
+            elif kind == b'ZDA' and len(parts) > 4 and parts[4]:
+                date = (int(parts[4]), int(parts[3]), int(parts[2]))
+        except ValueError:
+            date = None
+        if date is not None:
+            try:
+                self.day_start = calendar.timegm((date[0], date[1], date[2], 0, 0, 0))
+            except (ValueError, OverflowError):
+                pass
+        elif self.day_start is not None and self.last_tod is not None and tod < self.last_tod - 43200:
+            # 只有时刻的语句跨过了0点
+            self.day_start += 86400
+        self.last_tod = tod
+        if self.day_start is None:
+            return None
+        self.utc = self.day_start + tod
+        return self.utc
+
+
+class SegmentIndexer:
+    """为一个日志分段增量生成索引：每隔interval_s秒接收时间或interval_bytes字节记一个行首偏移"""
+
+    def __init__(self, path: str, interval_s: float = 1.0, interval_bytes: int = 256 * 1024):
+        self.path = path
+        self.interval_s = interval_s
+        self.interval_bytes = interval_bytes
+        self.offset = 0  # 已输入的字节数
+        self.partial = b''  # 未结束的半行
+        self.entries = bytearray()  # 尚未写入文件的索引项
+        self.entry_count = 0
+        self.utc = UtcTracker()
+        self._last_key = None
+        self._last_offset = None
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+
+    def feed(self, data: bytes, rx_time: float):
+        """按写入顺序输入日志字节；rx_time为这些数据的接收时间"""
+        data_start = self.offset - len(self.partial)
+        data = self.partial + data
+        self.offset += len(data) - len(self.partial)
+        pos = 0
+        while True:
+            end = data.find(b'\n', pos)
+            if end < 0:
+                break
+            self.feed_line(data_start + pos, data[pos:end + 1], rx_time)
+            pos = end + 1
+        self.partial = data[pos:]
+
+    def feed_line(self, offset: int, line: bytes, rx_time):
+        """处理一整行；行首带时间戳前缀时以前缀时间为准"""
+        prefix_time, prefix_len = parse_rx_prefix(line)
+        if prefix_time is not None:
+            rx_time = prefix_time
+        # 没有接收时间（无前缀的旧日志）时按UTC计算间隔
+        utc = self.utc.utc
+        key = rx_time if rx_time is not None else utc
+        if (self._last_offset is None
+                or (key is not None and self._last_key is not None and key - self._last_key >= self.interval_s)
+                or offset - self._last_offset >= self.interval_bytes):
+            # 记录的UTC是本行之前最近一次出现的UTC（保守下界），从该偏移向后扫描不会漏掉任何时刻
+            self.entries += ENTRY.pack(NAN if rx_time is None else rx_time, NAN if utc is None else utc, offset)
+            self.entry_count += 1
+            self._last_key = key
+            self._last_offset = offset
+        self.utc.feed(line[prefix_len:])
+
+    def flush(self):
+        if self.entries:
+            self._file.write(self.entries)
+            self._file.flush()
+            self.entries = bytearray()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class LogIndex:
+    """已加载的索引"""
+
+    def __init__(self, rx_times: list, utc_times: list, offsets: list):
+        self.rx_times = rx_times
+        self.utc_times = utc_times
+        self.offsets = offsets
+        # 按键查询时跳过该键未知的索引项
+        self._keys = {}
+
+    @classmethod
+    def load(cls, log_path: str):
+        """读取日志的索引，不存在时返回None"""
+        path = index_path(log_path)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(MAGIC):
+            return None
+        body = data[len(MAGIC):]
+        body = body[:len(body) - len(body) % ENTRY.size]
+        rx_times, utc_times, offsets = [], [], []
+        for rx_time, utc, offset in ENTRY.iter_unpack(body):
+            rx_times.append(rx_time)
+            utc_times.append(utc)
+            offsets.append(offset)
+        return cls(rx_times, utc_times, offsets)
+
+    def _series(self, by: str):
+        if by not in self._keys:
+            times = self.utc_times if by == 'utc' else self.rx_times
+            valid = [(t, o) for t, o in zip(times, self.offsets) if not math.isnan(t)]
+            self._keys[by] = ([t for t, _ in valid], [o for _, o in valid])
+        return self._keys[by]
+
+    def utc_before(self, offset: int):
+        """offset处（含）之前最近一个索引项记录的UTC，用作从该处扫描时的日期锚点；没有时返回None"""
+        times, offsets = self._series('utc')
+        i = bisect_right(offsets, offset) - 1
+        return times[i] if i >= 0 else None
+
+    def seek_range(self, t0: float, t1: float, by: str = 'utc'):
+        """返回覆盖 [t0, t1] 的字节区间 (起始偏移, 结束偏移或None)（二分查找）"""
+        times, offsets = self._series(by)
+        if not times:
+            return 0, None
+        # 键<t0的最后一项之前的数据时间都早于t0
+        i = bisect_left(times, t0) - 1
+        start = offsets[i] if i >= 0 else 0
+        # 键>t1的第一项之后的数据时间都晚于t1（utc键是该行之前最近一次UTC，同样成立）
+        j = bisect_right(times, t1)
+        end = offsets[j] if j < len(offsets) else None
+        return start, end
+
+
+def build_index(log_path: str, interval_s: float = 1.0, interval_bytes: int = 256 * 1024) -> int:
+    """为已有日志一次流式扫描生成索引，返回索引项数"""
+    indexer = SegmentIndexer(index_path(log_path), interval_s, interval_bytes)
+    offset = 0
+    with open_log(log_path) as f:
+        for line in f:
+            indexer.feed_line(offset, line, None)
+            offset += len(line)
+            if len(indexer.entries) >= 65536:
+                indexer.flush()
+    indexer.close()
+    return indexer.entry_count
+
+
+def read_range(log_path: str, t0: float, t1: float, by: str = 'utc'):
+    """逐行返回时间在 [t0, t1] 内的日志行（bytes）；没有索引时先补建"""
+    index = LogIndex.load(log_path)
+    if index is None:
+        build_index(log_path)
+        index = LogIndex.load(log_path)
+    start, end = index.seek_range(t0, t1, by)
+
+    # 从索引项记录的UTC接续日期，否则该处到第一条RMC/ZDA之间只有时刻的GGA等语句没有日期而被跳过
+    utc = UtcTracker(index.utc_before(start))
+    current = None  # 当前行所属的时间（无时间字段的行沿用上一行）
+    with open_log(log_path) as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            prefix_time, prefix_len = parse_rx_prefix(line)
+            if by == 'rx':
+                if prefix_time is not None:
+                    current = prefix_time
+            else:
+                line_utc = utc.feed(line[prefix_len:])
+                if line_utc is not None:
+                    current = line_utc
+            if current is None:
+                # 时间未知（无前缀的日志按接收时间查询）时只能按索引区间返回
+                if by == 'rx' and prefix_time is None:
+                    yield line
+                continue
+            if current > t1:
+                break
+            if current >= t0:
+                yield line
+
+
+def _parse_time(text: str) -> float:
+    """命令行时间参数：Unix秒或 'YYYY-mm-dd HH:MM:SS[.ffffff]'（UTC查询按UTC解释，接收时间按本地时间解释）"""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"无法解析时间: {text}")
+
+
+def _to_seconds(value, by: str) -> float:
+    if isinstance(value, datetime):
+        if by == 'utc':
+            return calendar.timegm(value.timetuple()) + value.microsecond / 1e6
+        return value.timestamp()
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="日志时间索引：补建索引、按时间定位日志内容")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="为已有日志生成索引")
+    build.add_argument('logs', nargs='+')
+    build.add_argument('--interval', type=float, default=1.0, help="索引间隔（秒）")
+
+    lookup = sub.add_parser('lookup', help="输出指定时间范围内的日志行")
+    lookup.add_argument('log')
+    group = lookup.add_mutually_exclusive_group(required=True)
+    group.add_argument('--utc', type=_parse_time, help="NMEA UTC时间")
+    group.add_argument('--rx', type=_parse_time, help="接收时间（本地时间）")
+    lookup.add_argument('--to', type=_parse_time, help="结束时间（默认起始时间后1秒）")
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        for log_path in args.logs:
+            start = time.perf_counter()
+            count = build_index(log_path, args.interval)
+            print(f"{log_path}: {count} 个索引项，耗时 {time.perf_counter() - start:.2f}s")
+        return 0
+
+    by = 'utc' if args.utc is not None else 'rx'
+    t0 = _to_seconds(args.utc if by == 'utc' else args.rx, by)
+    t1 = _to_seconds(args.to, by) if args.to is not None else t0 + 1
+    out = sys.stdout.buffer
+    for line in read_range(args.log, t0, t1, by):
+        out.write(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
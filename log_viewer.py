@@ -0,0 +1,631 @@
+# log_viewer.py
+# 大日志查看器：内存映射日志文件，后台线程建立稀疏行偏移索引，视图只渲染可见行
+#   支持跳转到行号/时间（使用log_index侧车索引）和流式子串查找，多GB文件界面不卡顿
+#   python log_viewer.py [日志文件]
+import calendar
+import gzip
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import QFont
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                             QLineEdit, QPushButton, QComboBox, QCheckBox, QTableView, QHeaderView, QFileDialog,
+                             QAbstractItemView)
+
+from log_index import LogIndex, UtcTracker, build_index, index_path, parse_rx_prefix
+
+BLOCK_LINES = 64  # 稀疏索引间隔：每64行记一个行首偏移（内存约为逐行索引的1/64）
+SCAN_BYTES = 8 * 1024 * 1024  # 建索引每次处理的字节数
+SEARCH_BYTES = 1024 * 1024  # 查找每次处理的字节数（bytes.find不释放GIL，分小块避免界面卡顿）
+MAX_LINE_CHARS = 2000  # 单行显示上限（乱码等超长行截断）
+
+
+class LogFile:
+    """内存映射的日志文件及其稀疏行索引（索引由后台线程增量建立，界面线程只读已索引部分）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data_path = path  # 压缩分段解压后的临时文件
+        self._temp_dir = None
+        self._file = None
+        self.mm = None
+        self.size = 0
+        self._sparse = np.zeros(1024, dtype=np.int64)  # 第 k*BLOCK_LINES 行的行首偏移
+        self._sparse_len = 0
+        self.line_count = 0  # 已索引的完整行数
+        self.indexed_end = 0  # 已索引到的字节位置（最后一个换行之后）
+        self.complete = False
+        self._cache = OrderedDict()  # 块号 -> 该块各行文本
+
+    def prepare(self, stop_event: threading.Event = None):
+        """压缩分段先流式解压到临时文件，再建立内存映射"""
+        if self.path.endswith('.gz') and self._temp_dir is None:
+            self._temp_dir = tempfile.mkdtemp(prefix='log_viewer_')
+            target = os.path.join(self._temp_dir, os.path.basename(self.path)[:-3])
+            with gzip.open(self.path, 'rb') as src, open(target, 'wb') as dst:
+                while stop_event is None or not stop_event.is_set():
+                    block = src.read(1024 * 1024)
+                    if not block:
+                        break
+                    dst.write(block)
+            self.data_path = target
+        self.remap()
+
+    def remap(self) -> bool:
+        """（重新）映射文件；文件变大时返回True，索引从已索引位置继续"""
+        size = os.path.getsize(self.data_path)
+        if self.mm is not None and size == self.size:
+            return False
+        self._unmap()
+        self._file = open(self.data_path, 'rb')
+        self.size = size
+        if size:
+            self.mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if not self._sparse_len:
+                self._append_starts(np.zeros(1, dtype=np.int64))
+        self.complete = False
+        self._cache.pop(self._sparse_len - 1, None)  # 最后一块可能变长
+        return True
+
+    def _unmap(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        self._unmap()
+        self._cache.clear()
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+    def _append_starts(self, starts):
+        needed = self._sparse_len + len(starts)
+        if needed > len(self._sparse):
+            grown = np.zeros(max(needed, len(self._sparse) * 2), dtype=np.int64)
+            grown[:self._sparse_len] = self._sparse[:self._sparse_len]
+            self._sparse = grown  # 界面线程持有的旧数组在已索引范围内仍然有效
+        self._sparse[self._sparse_len:needed] = starts
+        self._sparse_len = needed
+
+    def _starts(self):
+        """已索引的块起始偏移；先读长度再读数组，与索引线程的扩容顺序配合，不会读到未写入的项"""
+        count = self._sparse_len
+        return self._sparse[:count]
+
+    def index_step(self) -> bool:
+        """索引下一段数据，返回是否还有未索引的数据"""
+        if self.mm is None or self.indexed_end >= self.size:
+            self.complete = True
+            return False
+        start = self.indexed_end
+        end = min(self.size, start + SCAN_BYTES)
+        block = np.frombuffer(self.mm[start:end], dtype=np.uint8)
+        newlines = np.flatnonzero(block == 10)
+        if len(newlines):
+            # 新行的行首（换行之后）及其行号，只保留整块边界上的行
+            first_line = self.line_count + 1
+            line_numbers = np.arange(first_line, first_line + len(newlines))
+            keep = line_numbers % BLOCK_LINES == 0
+            starts = newlines[keep].astype(np.int64) + start + 1
+            if len(starts):
+                self._append_starts(starts)
+            self.line_count += len(newlines)
+            self.indexed_end = start + int(newlines[-1]) + 1
+        if end == self.size:
+            self.complete = True
+            return False
+        if not len(newlines):
+            # 整段没有换行（乱码）：把整段算作未结束的行继续向后找
+            self.indexed_end = end
+        return True
+
+    @property
+    def row_count(self) -> int:
+        """可显示的行数（索引完成时包括没有换行结尾的最后一行）"""
+        if self.complete and self.indexed_end < self.size:
+            return self.line_count + 1
+        return self.line_count
+
+    def _block_end(self, starts, block: int) -> int:
+        if block + 1 < len(starts):
+            return int(starts[block + 1])
+        return self.size if self.complete else self.indexed_end
+
+    def block_lines(self, block: int) -> list:
+        """第block块（BLOCK_LINES行）的文本，最近访问的块缓存在内存中"""
+        lines = self._cache.get(block)
+        if lines is not None:
+            self._cache.move_to_end(block)
+            return lines
+        starts = self._starts()
+        data = self.mm[int(starts[block]):self._block_end(starts, block)]
+        lines = [line.rstrip(b'\r')[:MAX_LINE_CHARS * 4].decode('utf-8', errors='replace')[:MAX_LINE_CHARS]
+                 for line in data.split(b'\n')[:BLOCK_LINES]]
+        if block + 1 < len(starts) or self.complete:
+            self._cache[block] = lines
+            while len(self._cache) > 512:
+                self._cache.popitem(last=False)
+        return lines
+
+    def line(self, row: int) -> str:
+        lines = self.block_lines(row // BLOCK_LINES)
+        i = row % BLOCK_LINES
+        return lines[i] if i < len(lines) else ""
+
+    def offset_to_line(self, offset: int) -> int:
+        """字节偏移所在的行号（只在已索引范围内有效）"""
+        starts = self._starts()
+        block = max(int(np.searchsorted(starts, offset, side='right')) - 1, 0)
+        return block * BLOCK_LINES + self.mm[int(starts[block]):offset].count(b'\n')
+
+
+class LineIndexer(QThread):
+    """后台建立行索引；缺少时间侧车索引的旧日志随后补建"""
+
+    progress = pyqtSignal(int, int)  # 已索引行数, 已索引字节
+    indexed = pyqtSignal()
+    time_index_ready = pyqtSignal(bool)
+    failed = pyqtSignal(str)
+
+    def __init__(self, log_file: LogFile, build_time_index: bool = True, parent=None):
+        super().__init__(parent)
+        self.log_file = log_file
+        self.build_time_index = build_time_index
+        self._stop = threading.Event()
+
+    def stop(self, timeout_ms: int = 2000):
+        self._stop.set()
+        self.wait(timeout_ms)
+
+    def run(self):
+        log_file = self.log_file
+        try:
+            if log_file.mm is None:
+                log_file.prepare(self._stop)
+            last_emit = 0.0
+            while not self._stop.is_set() and log_file.index_step():
+                now = time.monotonic()
+                if now - last_emit >= 0.1:
+                    last_emit = now
+                    self.progress.emit(log_file.line_count, log_file.indexed_end)
+            if self._stop.is_set():
+                return
+            self.progress.emit(log_file.line_count, log_file.indexed_end)
+            self.indexed.emit()
+
+            if self.build_time_index:
+                if not os.path.exists(index_path(log_file.path)):
+                    build_index(log_file.path)
+                self.time_index_ready.emit(os.path.exists(index_path(log_file.path)))
+        except (OSError, ValueError) as e:
+            self.failed.emit(str(e))
+
+
+class SearchWorker(QThread):
+    """流式子串查找：按块扫描映射的文件，不整体读入；匹配行号分批发出（每行只报一次）"""
+
+    found = pyqtSignal(list)
+    progress = pyqtSignal(int)  # 已查找字节
+    done = pyqtSignal(int, bool)  # 匹配行数, 是否因达到上限而提前结束
+
+    def __init__(self, log_file: LogFile, text: str, ignore_case: bool = False,
+                 max_matches: int = 100000, parent=None):
+        super().__init__(parent)
+        self.log_file = log_file
+        needle = text.encode('utf-8')
+        self.needle = needle.lower() if ignore_case else needle
+        self.ignore_case = ignore_case
+        self.max_matches = max_matches
+        self._stop = threading.Event()
+
+    def stop(self, timeout_ms: int = 2000):
+        self._stop.set()
+        self.wait(timeout_ms)
+
+    def run(self):
+        log_file, needle = self.log_file, self.needle
+        overlap = len(needle) - 1
+        pos = 0
+        matches = 0
+        last_line = -1
+        last_emit = 0.0
+        batch = []
+        while not self._stop.is_set():
+            # 只查找已建立行索引的部分，索引未完成时等待
+            limit = log_file.size if log_file.complete else log_file.indexed_end
+            if pos >= limit:
+                if log_file.complete:
+                    break
+                time.sleep(0.05)
+                continue
+            end = min(limit, pos + SEARCH_BYTES)
+            block = log_file.mm[pos:min(log_file.size, end + overlap)]
+            if self.ignore_case:
+                block = block.lower()
+            i = block.find(needle)
+            while i >= 0 and pos + i < end:
+                line = log_file.offset_to_line(pos + i)
+                if line != last_line:
+                    batch.append(line)
+                    last_line = line
+                    matches += 1
+                    if matches >= self.max_matches:
+                        self.found.emit(batch)
+                        self.done.emit(matches, True)
+                        return
+                # 同一行的其余匹配跳过
+                next_newline = block.find(b'\n', i)
+                i = block.find(needle, next_newline + 1 if next_newline >= 0 else len(block))
+            pos = end
+            now = time.monotonic()
+            if batch and now - last_emit >= 0.1:
+                last_emit = now
+                self.found.emit(batch)
+                batch = []
+            self.progress.emit(pos)
+        if batch:
+            self.found.emit(batch)
+        if not self._stop.is_set():
+            self.done.emit(matches, False)
+
+
+class LogLineModel(QAbstractListModel):
+    """虚拟化行模型：行数随后台索引增长，data()只取视图请求的可见行"""
+
+    def __init__(self, log_file: LogFile, parent=None):
+        super().__init__(parent)
+        self.log_file = log_file
+        self.rows = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid() and index.row() < self.rows:
+            return self.log_file.line(index.row())
+        return None
+
+    def sync_rows(self):
+        """同步已索引的行数（界面线程调用）"""
+        rows = self.log_file.row_count
+        if rows > self.rows:
+            self.beginInsertRows(QModelIndex(), self.rows, rows - 1)
+            self.rows = rows
+            self.endInsertRows()
+        elif rows < self.rows:
+            self.beginResetModel()
+            self.rows = rows
+            self.endResetModel()
+
+
+def parse_time_text(text: str, by: str):
+    """'YYYY-mm-dd HH:MM:SS[.ffffff]' 转Unix秒（UTC按UTC解释，接收时间按本地时间解释），无法解析时返回None"""
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S'):
+        try:
+            value = datetime.strptime(text.strip(), fmt)
+        except ValueError:
+            continue
+        if by == 'utc':
+            return calendar.timegm(value.timetuple()) + value.microsecond / 1e6
+        return value.timestamp()
+    return None
+
+
+class LogViewerWindow(QMainWindow):
+    """日志查看窗口"""
+
+    def __init__(self, path: str = None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("日志查看")
+        self.resize(1000, 700)
+        self.log_file = None
+        self.model = None
+        self.indexer = None
+        self.search_worker = None
+        self.time_index = None
+        self.matches = []  # 查找结果行号（升序）
+        self.match_pos = -1
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+
+        nav_layout = QHBoxLayout()
+        self.open_btn = QPushButton("打开")
+        self.open_btn.clicked.connect(self.choose_file)
+        nav_layout.addWidget(self.open_btn)
+
+        self.reload_btn = QPushButton("刷新")
+        self.reload_btn.setToolTip("文件仍在写入时，加载新写入的内容")
+        self.reload_btn.clicked.connect(self.reload)
+        nav_layout.addWidget(self.reload_btn)
+
+        nav_layout.addWidget(QLabel("行号"))
+        self.line_edit = QLineEdit()
+        self.line_edit.setFixedWidth(100)
+        self.line_edit.returnPressed.connect(self.goto_line)
+        nav_layout.addWidget(self.line_edit)
+
+        nav_layout.addWidget(QLabel("时间"))
+        self.time_edit = QLineEdit()
+        self.time_edit.setPlaceholderText("YYYY-mm-dd HH:MM:SS")
+        self.time_edit.setFixedWidth(190)
+        self.time_edit.returnPressed.connect(self.goto_time)
+        nav_layout.addWidget(self.time_edit)
+        self.time_kind_combo = QComboBox()
+        self.time_kind_combo.addItems(["UTC", "接收时间"])
+        nav_layout.addWidget(self.time_kind_combo)
+        self.time_btn = QPushButton("跳转")
+        self.time_btn.clicked.connect(self.goto_time)
+        nav_layout.addWidget(self.time_btn)
+        nav_layout.addStretch()
+        layout.addLayout(nav_layout)
+
+        search_layout = QHBoxLayout()
+        search_layout.addWidget(QLabel("查找"))
+        self.search_edit = QLineEdit()
+        self.search_edit.returnPressed.connect(self.start_search)
+        search_layout.addWidget(self.search_edit)
+        self.case_check = QCheckBox("忽略大小写")
+        search_layout.addWidget(self.case_check)
+        self.search_btn = QPushButton("查找")
+        self.search_btn.clicked.connect(self.start_search)
+        search_layout.addWidget(self.search_btn)
+        self.prev_btn = QPushButton("上一个")
+        self.prev_btn.clicked.connect(lambda: self.goto_match(-1))
+        search_layout.addWidget(self.prev_btn)
+        self.next_btn = QPushButton("下一个")
+        self.next_btn.clicked.connect(lambda: self.goto_match(1))
+        search_layout.addWidget(self.next_btn)
+        self.search_label = QLabel("")
+        search_layout.addWidget(self.search_label)
+        layout.addLayout(search_layout)
+
+        # 单列表格、固定行高：行数增长和滚动不逐行测量，只绘制可见行（QListView插入行时会重排全部行）
+        self.view = QTableView()
+        font = QFont("Consolas", 9)
+        font.setStyleHint(QFont.Monospace)
+        self.view.setFont(font)
+        self.view.horizontalHeader().hide()
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.view.verticalHeader().hide()
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(self.view.fontMetrics().height() + 4)
+        self.view.setShowGrid(False)
+        self.view.setWordWrap(False)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.view)
+
+        if path:
+            self.open_file(path)
+
+    def choose_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "打开日志", "serial_logs", "日志文件 (*.txt *.txt.gz *.gz);;All Files (*)")
+        if file_path:
+            self.open_file(file_path)
+
+    def open_file(self, path: str):
+        """打开日志：立即显示已索引的部分，索引在后台继续"""
+        self.close_file()
+        self.log_file = LogFile(path)
+        self.model = LogLineModel(self.log_file, self)
+        self.view.setModel(self.model)
+        self.time_index = None
+        self.setWindowTitle(f"日志查看 - {os.path.basename(path)}")
+        self.statusBar().showMessage("正在解压..." if path.endswith('.gz') else "正在建立行索引...")
+        self.start_indexer()
+
+    def start_indexer(self):
+        self.indexer = LineIndexer(self.log_file, parent=self)
+        self.indexer.progress.connect(self.on_index_progress)
+        self.indexer.indexed.connect(self.on_indexed)
+        self.indexer.time_index_ready.connect(self.on_time_index_ready)
+        self.indexer.failed.connect(self.on_index_failed)
+        self.indexer.start()
+
+    def close_file(self):
+        self.stop_search()
+        if self.indexer is not None:
+            self.indexer.stop()
+            self.indexer = None
+        if self.log_file is not None:
+            self.view.setModel(None)
+            self.model = None
+            self.log_file.close()
+            self.log_file = None
+        self.matches = []
+        self.match_pos = -1
+        self.search_label.setText("")
+
+    def reload(self):
+        """文件变大时继续索引新增部分"""
+        if self.log_file is None or (self.indexer is not None and self.indexer.isRunning()):
+            return
+        self.stop_search()  # 重新映射期间查找线程不能访问旧的映射
+        try:
+            grown = self.log_file.remap()
+        except (OSError, ValueError) as e:
+            self.statusBar().showMessage(f"刷新失败: {str(e)}")
+            return
+        if grown:
+            self.model.sync_rows()
+            self.start_indexer()
+
+    def _from_current(self, worker) -> bool:
+        """信号来自当前的后台线程（已停止线程的排队信号在关闭文件后仍可能送达，忽略）"""
+        return worker is not None and self.sender() is worker
+
+    def on_index_progress(self, lines: int, indexed_bytes: int):
+        if not self._from_current(self.indexer):
+            return
+        self.model.sync_rows()
+        size = self.log_file.size or 1
+        self.statusBar().showMessage(
+            f"已索引 {lines} 行，{indexed_bytes / size * 100:.0f}%（{self.log_file.size / 1048576:.1f} MB）")
+
+    def on_indexed(self):
+        if not self._from_current(self.indexer):
+            return
+        self.model.sync_rows()
+        self.statusBar().showMessage(f"共 {self.model.rows} 行，{self.log_file.size / 1048576:.1f} MB")
+
+    def on_time_index_ready(self, ok: bool):
+        if not self._from_current(self.indexer):
+            return
+        self.time_index = LogIndex.load(self.log_file.path) if ok else None
+        if self.time_index is not None and not self.time_edit.text():
+            # 以日志开头的UTC时间作为输入提示
+            utc = next((t for t in self.time_index.utc_times if t == t), None)
+            if utc is not None:
+                self.time_edit.setText(time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(utc)))
+
+    def on_index_failed(self, message: str):
+        if not self._from_current(self.indexer):
+            return
+        self.statusBar().showMessage(f"无法读取日志: {message}")
+
+    def scroll_to_row(self, row: int):
+        index = self.model.index(row)
+        self.view.scrollTo(index, QAbstractItemView.PositionAtTop)
+        self.view.setCurrentIndex(index)
+
+    def goto_line(self):
+        """跳转到行号（从1开始）"""
+        if self.model is None:
+            return
+        try:
+            row = int(self.line_edit.text()) - 1
+        except ValueError:
+            return
+        if row >= self.model.rows:
+            self.statusBar().showMessage(f"第{row + 1}行尚未索引（已索引 {self.model.rows} 行）")
+            return
+        self.scroll_to_row(max(row, 0))
+
+    def goto_time(self):
+        """按侧车时间索引定位，再在索引项之间逐行找到第一条不早于该时间的行"""
+        if self.model is None:
+            return
+        by = 'utc' if self.time_kind_combo.currentIndex() == 0 else 'rx'
+        target = parse_time_text(self.time_edit.text(), by)
+        if target is None:
+            self.statusBar().showMessage("时间格式: YYYY-mm-dd HH:MM:SS")
+            return
+        if self.time_index is None:
+            self.statusBar().showMessage("时间索引尚未就绪")
+            return
+        start, end = self.time_index.seek_range(target, target, by)
+        log_file = self.log_file
+        limit = log_file.size if log_file.complete else log_file.indexed_end
+        if start >= limit:
+            self.statusBar().showMessage("该时间所在位置尚未索引")
+            return
+        row = log_file.offset_to_line(start)
+        end = min(limit, end if end is not None else limit)
+        found = self._scan_time(row, start, end, target, by)
+        self.scroll_to_row(min(found, self.model.rows - 1))
+
+    def _scan_time(self, row: int, start: int, end: int, target: float, by: str) -> int:
+        """从start逐行扫描到end，返回第一条时间不早于target的行号（两个索引项之间，数据量有限）"""
+        utc = UtcTracker(self.time_index.utc_before(start))  # 接续索引项的日期，GGA等只有时刻的语句也能定位
+        offset = start
+        mm = self.log_file.mm
+        while offset < end:
+            next_newline = mm.find(b'\n', offset, end)
+            line_end = end if next_newline < 0 else next_newline + 1
+            line = mm[offset:line_end]
+            prefix_time, prefix_len = parse_rx_prefix(line)
+            current = prefix_time if by == 'rx' else utc.feed(line[prefix_len:])
+            if current is not None and current >= target:
+                return row
+            offset = line_end
+            row += 1
+        return row
+
+    def start_search(self):
+        text = self.search_edit.text()
+        if self.log_file is None or not text:
+            return
+        self.stop_search()
+        self.matches = []
+        self.match_pos = -1
+        self.search_label.setText("查找中...")
+        self.search_worker = SearchWorker(self.log_file, text, self.case_check.isChecked(), parent=self)
+        self.search_worker.found.connect(self.on_search_found)
+        self.search_worker.progress.connect(self.on_search_progress)
+        self.search_worker.done.connect(self.on_search_done)
+        self.search_worker.start()
+
+    def stop_search(self):
+        if self.search_worker is not None:
+            self.search_worker.stop()
+            self.search_worker = None
+
+    def on_search_found(self, lines: list):
+        if not self._from_current(self.search_worker):
+            return
+        first = not self.matches
+        self.matches.extend(lines)
+        if first:
+            # 第一个结果：从当前行之后的第一个匹配开始
+            current = self.view.currentIndex().row()
+            self.match_pos = bisect_left(self.matches, current + 1) if current >= 0 else 0
+            self.match_pos = min(self.match_pos, len(self.matches) - 1)
+            self.scroll_to_row(self.matches[self.match_pos])
+        self.update_search_label()
+
+    def on_search_progress(self, searched: int):
+        if self._from_current(self.search_worker):
+            size = self.log_file.size or 1
+            self.search_label.setText(f"{len(self.matches)} 个匹配，已查找 {searched / size * 100:.0f}%")
+
+    def on_search_done(self, count: int, truncated: bool):
+        if not self._from_current(self.search_worker):
+            return
+        self.search_label.setText(f"{count} 个匹配" + ("（已达上限）" if truncated else ""))
+        self.search_worker = None
+        self.update_search_label()
+
+    def update_search_label(self):
+        if self.matches and self.search_worker is None:
+            self.search_label.setText(f"{self.match_pos + 1}/{len(self.matches)}")
+
+    def goto_match(self, step: int):
+        if not self.matches:
+            return
+        self.match_pos = (self.match_pos + step) % len(self.matches)
+        self.scroll_to_row(self.matches[self.match_pos])
+        self.update_search_label()
+
+    def closeEvent(self, event):
+        self.close_file()
+        event.accept()
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+    app = QApplication.instance() or QApplication(argv)
+    window = LogViewerWindow(argv[1] if len(argv) > 1 else None)
+    window.show()
+    return app.exec_()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
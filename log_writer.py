@@ -0,0 +1,495 @@
+# log_writer.py
+# 后台日志写入：接收线程只入队不阻塞，写入线程负责加时间戳、按大小/时间切分；
+# 维护线程负责压缩已关闭的分段、按总大小/保存天数清理，并在磁盘空间不足时保护写入
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+from log_index import SegmentIndexer, index_path
+
+_STOP = object()
+
+
+class RotationPolicy:
+    """日志切分策略：达到大小或时长任一条件即切换到新分段"""
+
+    def __init__(self, max_bytes: int = 500 * 1024 * 1024, interval_s: float = 3600):
+        self.max_bytes = max_bytes  # 单个分段最大字节数，0表示不按大小切分
+        self.interval_s = interval_s  # 单个分段最长时长（秒），0表示不按时间切分
+
+    def should_rotate(self, size: int, opened_at: float, now: float) -> bool:
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        return bool(self.interval_s) and now - opened_at >= self.interval_s
+
+
+class RetentionPolicy:
+    """日志保留策略"""
+
+    def __init__(self, max_total_bytes: int = 0, max_age_days: float = 0, compress: bool = True,
+                 min_free_bytes: int = 512 * 1024 * 1024, prune_on_low_space: bool = True):
+        self.max_total_bytes = max_total_bytes  # 日志目录总大小上限，0表示不限
+        self.max_age_days = max_age_days  # 最长保存天数，0表示不限
+        self.compress = compress  # 是否gzip压缩已关闭的分段
+        self.min_free_bytes = min_free_bytes  # 磁盘剩余空间低于该值时暂停写入
+        self.prune_on_low_space = prune_on_low_space  # 空间不足时先删除最旧的已关闭日志
+
+
+class LogMaintenance:
+    """日志目录维护（所有串口共享）：后台压缩、清理、磁盘空间检查"""
+
+    LOG_SUFFIXES = ('.txt', '.txt.gz')
+
+    def __init__(self, log_dir: str, retention: RetentionPolicy = None, check_interval: float = 60.0):
+        self.log_dir = log_dir
+        self.retention = retention or RetentionPolicy()
+        self.check_interval = check_interval  # 定期执行保留策略的间隔（秒）
+        self._active = set()  # 正在写入的文件（不压缩、不删除）
+        self._lock = threading.Lock()
+        self._tasks = queue.SimpleQueue()
+        self._thread = None
+        self._stopping = threading.Event()  # 退出时放弃排队中的任务和进行中的压缩
+
+        # 统计
+        self.compressed_files = 0
+        self.compressed_saved_bytes = 0  # 压缩节省的字节数
+        self.deleted_files = 0
+        self.deleted_bytes = 0
+        self.total_log_bytes = 0  # 最近一次检查时的日志总量
+        self.last_error = None
+        os.makedirs(log_dir, exist_ok=True)
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="LogMaintenance", daemon=True)
+            self._thread.start()
+            # 压缩上次运行遗留的未压缩分段
+            self._tasks.put(('scan', None))
+
+    def stop(self, timeout: float = 5.0) -> bool:
+        """停止维护线程：放弃排队中的任务，进行中的压缩在下一个数据块处中止（原文件保留，下次启动时重新压缩）"""
+        if self._thread is None:
+            return True
+        self._stopping.set()
+        self._tasks.put((_STOP, None))
+        self._thread.join(timeout)
+        finished = not self._thread.is_alive()
+        self._thread = None
+        return finished
+
+    def register_active(self, path: str):
+        with self._lock:
+            self._active.add(os.path.abspath(path))
+
+    def segment_closed(self, path: str):
+        """分段已关闭：取消占用并安排压缩和保留检查"""
+        with self._lock:
+            self._active.discard(os.path.abspath(path))
+        self._tasks.put(('compress', path))
+
+    def request_space(self):
+        """写入线程发现空间不足时调用：立即执行一次清理"""
+        self._tasks.put(('space', None))
+
+    def free_bytes(self) -> int:
+        try:
+            return shutil.disk_usage(self.log_dir).free
+        except OSError:
+            return -1
+
+    def _run(self):
+        while True:
+            try:
+                task, arg = self._tasks.get(timeout=self.check_interval)
+            except queue.Empty:
+                task, arg = 'retention', None
+            if task is _STOP or self._stopping.is_set():
+                break
+            try:
+                if task == 'compress':
+                    if self.retention.compress:
+                        self._compress(arg)
+                    self._apply_retention()
+                elif task == 'scan':
+                    if self.retention.compress:
+                        for path in self._closed_files():
+                            if path.endswith('.txt'):
+                                self._compress(path)
+                    self._apply_retention()
+                elif task == 'space':
+                    self._apply_retention(low_space=True)
+                else:
+                    self._apply_retention()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"日志维护出错: {str(e)}")
+
+    def _is_active(self, path: str) -> bool:
+        with self._lock:
+            return os.path.abspath(path) in self._active
+
+    def _closed_files(self) -> list:
+        """已关闭的日志文件，按修改时间从旧到新排序"""
+        files = []
+        try:
+            entries = list(os.scandir(self.log_dir))
+        except OSError:
+            return files
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(self.LOG_SUFFIXES) and not self._is_active(entry.path):
+                try:
+                    files.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass
+        return [path for _, path in sorted(files)]
+
+    def _compress(self, path: str):
+        """gzip压缩一个已关闭的分段（先写临时文件，成功后替换原文件，保留修改时间）"""
+        if not path.endswith('.txt') or self._is_active(path) or not os.path.exists(path):
+            return
+        target = path + '.gz'
+        tmp = target + '.tmp'
+        try:
+            stat = os.stat(path)
+            with open(path, 'rb') as src, gzip.open(tmp, 'wb', compresslevel=6) as dst:
+                while not self._stopping.is_set():
+                    block = src.read(1024 * 1024)
+                    if not block:
+                        break
+                    dst.write(block)
+            if self._stopping.is_set():
+                os.remove(tmp)
+                return
+            os.utime(tmp, (stat.st_atime, stat.st_mtime))
+            os.replace(tmp, target)
+            os.remove(path)
+            self.compressed_files += 1
+            self.compressed_saved_bytes += stat.st_size - os.path.getsize(target)
+        except OSError as e:
+            # 空间不足等情况下保留原文件
+            self.last_error = f"压缩失败 {os.path.basename(path)}: {str(e)}"
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _delete(self, path: str):
+        """删除日志及其侧车索引"""
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.deleted_files += 1
+            self.deleted_bytes += size
+        except OSError as e:
+            self.last_error = f"删除失败 {os.path.basename(path)}: {str(e)}"
+            return
+        sidecar = index_path(path)
+        if os.path.exists(sidecar) and not os.path.exists(sidecar[:-4]) and not os.path.exists(sidecar[:-4] + '.gz'):
+            try:
+                self.deleted_bytes += os.path.getsize(sidecar)
+                os.remove(sidecar)
+            except OSError:
+                pass
+
+    def _apply_retention(self, low_space: bool = False):
+        """按保存天数、总大小清理最旧的已关闭日志；空间不足时继续清理直到恢复"""
+        policy = self.retention
+        closed = self._closed_files()
+
+        if policy.max_age_days:
+            cutoff = time.time() - policy.max_age_days * 86400
+            for path in list(closed):
+                try:
+                    expired = os.path.getmtime(path) < cutoff
+                except OSError:
+                    expired = False
+                if expired:
+                    self._delete(path)
+                    closed.remove(path)
+
+        if policy.max_total_bytes:
+            total = self.total_bytes()
+            while closed and total > policy.max_total_bytes:
+                path = closed.pop(0)
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    size = 0
+                self._delete(path)
+                total -= size
+
+        if low_space and policy.prune_on_low_space:
+            while closed and 0 <= self.free_bytes() < policy.min_free_bytes:
+                self._delete(closed.pop(0))
+
+        self.total_log_bytes = self.total_bytes()
+
+    def total_bytes(self) -> int:
+        """日志目录下全部日志文件（含正在写入的）总字节数"""
+        total = 0
+        try:
+            for entry in os.scandir(self.log_dir):
+                if entry.is_file() and entry.name.endswith(self.LOG_SUFFIXES):
+                    total += entry.stat().st_size
+        except OSError:
+            pass
+        return total
+
+    def stats_text(self) -> str:
+        free = self.free_bytes()
+        lines = [
+            f"日志目录: {os.path.abspath(self.log_dir)}",
+            f"日志总量: {self.total_log_bytes / 1048576:.1f} MB，磁盘剩余: {free / 1073741824:.1f} GB",
+            f"已压缩: {self.compressed_files} 个（节省 {self.compressed_saved_bytes / 1048576:.1f} MB）",
+            f"已清理: {self.deleted_files} 个（{self.deleted_bytes / 1048576:.1f} MB）",
+        ]
+        if self.last_error:
+            lines.append(f"最近错误: {self.last_error}")
+        return "\n".join(lines)
+
+
+class LogWriter:
+    """单个串口的后台日志写入器：write()线程安全且不阻塞，文件IO和切分都在写入线程完成"""
+
+    STATE_OK = 'ok'
+    STATE_DISK_LOW = 'disk_low'  # 空间不足，暂停写入（丢弃的数据计入dropped_bytes）
+    STATE_ERROR = 'error'
+
+    def __init__(self, log_dir: str, base_name: str, rotation: RotationPolicy = None,
+                 maintenance: LogMaintenance = None, timestamps: bool = False,
+                 flush_interval: float = 0.5, flush_bytes: int = 8192, disk_check_interval: float = 2.0,
+                 index_interval: float = 1.0):
+        self.log_dir = log_dir
+        self.base_name = base_name  # 分段文件名前缀（串口名_波特率）
+        self.rotation = rotation or RotationPolicy()
+        self.maintenance = maintenance
+        self.timestamps = timestamps  # 每行行首加接收时间戳（可在运行中切换）
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.disk_check_interval = disk_check_interval
+        self.index_interval = index_interval  # 侧车时间索引间隔（秒），0表示不生成索引
+        self._indexer = None
+        self.min_free_bytes = maintenance.retention.min_free_bytes if maintenance else 0
+
+        self._queue = queue.SimpleQueue()
+        self._pending_lock = threading.Lock()
+        self.pending_bytes = 0  # 已入队未写入的字符数
+        self._file = None
+        self._opened_at = 0.0
+        self._at_line_start = True
+        self._last_disk_check = 0.0
+
+        # 状态与统计（写入线程更新，界面线程只读）
+        self.state = self.STATE_OK
+        self.error = None
+        self.current_path = None
+        self.segment_bytes = 0  # 当前分段已写入字节数
+        self.bytes_written = 0  # 所有分段累计写入字节数
+        self.dropped_bytes = 0  # 空间不足/出错时丢弃的字节数
+        self.segments = 0
+
+        os.makedirs(log_dir, exist_ok=True)
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name=f"LogWriter-{base_name}", daemon=True)
+        self._thread.start()
+
+    def write(self, text: str, wall_time: float):
+        """写入一块数据（任意线程调用，只入队）"""
+        if not text:
+            return
+        with self._pending_lock:
+            self.pending_bytes += len(text)
+        self._queue.put((text, wall_time))
+
+    def write_chunk(self, chunk):
+        """接收线程数据块回调（RxChunk）"""
+        self.write(chunk.text, chunk.wall_time)
+
+    def close(self, timeout: float = 5.0) -> bool:
+        """写完队列中剩余数据后关闭，返回是否在超时前完成"""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _segment_path(self) -> str:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.log_dir, f"{self.base_name}_{timestamp}.txt")
+        n = 1
+        while os.path.exists(path) or os.path.exists(path + '.gz'):
+            # 同一秒内多次切分
+            path = os.path.join(self.log_dir, f"{self.base_name}_{timestamp}_{n}.txt")
+            n += 1
+        return path
+
+    def _open_segment(self):
+        path = self._segment_path()
+        if self.maintenance is not None:
+            self.maintenance.register_active(path)
+        try:
+            self._file = open(path, 'ab')
+        except OSError as e:
+            if self.maintenance is not None:
+                self.maintenance.segment_closed(path)
+            self._set_error(f"无法创建日志文件: {str(e)}")
+            return
+        self.current_path = path
+        self.segment_bytes = 0
+        self._opened_at = time.monotonic()
+        self.segments += 1
+        if self.index_interval:
+            try:
+                self._indexer = SegmentIndexer(index_path(path), self.index_interval)
+            except OSError as e:
+                print(f"无法创建日志索引: {str(e)}")
+                self._indexer = None
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        try:
+            self._file.close()
+        except OSError as e:
+            self._set_error(f"关闭日志文件出错: {str(e)}")
+        self._file = None
+        if self._indexer is not None:
+            self._indexer.close()
+            self._indexer = None
+        if not self.segment_bytes and self.current_path:
+            # 空分段不保留
+            for path in (self.current_path, index_path(self.current_path)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        if self.maintenance is not None and self.current_path:
+            self.maintenance.segment_closed(self.current_path)
+
+    def _set_error(self, message: str):
+        self.state = self.STATE_ERROR
+        self.error = message
+        print(message)
+
+    def _timestamp_lines(self, data: str, wall_time: float) -> str:
+        """在每行行首加上接收时间戳（行首所在数据块的到达时间）"""
+        stamp = f"[{datetime.fromtimestamp(wall_time).strftime('%Y-%m-%d %H:%M:%S.%f')}] "
+        lines = data.split('\n')
+        output = []
+        for i, line in enumerate(lines):
+            if i > 0:
+                output.append('\n')
+                self._at_line_start = True
+            if line:
+                if self._at_line_start:
+                    output.append(stamp)
+                    self._at_line_start = False
+                output.append(line)
+        return ''.join(output)
+
+    def _check_disk(self, now: float):
+        """定期检查磁盘剩余空间，不足时暂停写入并请求清理，恢复后继续"""
+        if not self.min_free_bytes or now - self._last_disk_check < self.disk_check_interval:
+            return
+        self._last_disk_check = now
+        try:
+            free = shutil.disk_usage(self.log_dir).free
+        except OSError:
+            return
+        if self.state == self.STATE_OK and free < self.min_free_bytes:
+            self.state = self.STATE_DISK_LOW
+            print(f"磁盘剩余空间不足（{free // 1048576} MB），暂停写入日志: {self.base_name}")
+            if self.maintenance is not None:
+                self.maintenance.request_space()
+        elif self.state == self.STATE_DISK_LOW:
+            # 留出回差，避免在阈值附近反复启停
+            if free >= self.min_free_bytes + 64 * 1024 * 1024:
+                self.state = self.STATE_OK
+                print(f"磁盘空间已恢复，继续写入日志: {self.base_name}")
+            elif self.maintenance is not None:
+                self.maintenance.request_space()
+
+    def _flush(self, buffer: list):
+        """写入缓冲的 (字节, 接收时间) 并同步更新索引"""
+        if not buffer:
+            return
+        pieces = list(buffer)
+        data = b''.join(piece for piece, _ in pieces)
+        buffer.clear()
+        if self.state != self.STATE_OK or self._file is None:
+            self.dropped_bytes += len(data)
+            return
+        try:
+            self._file.write(data)
+            self._file.flush()
+        except OSError as e:
+            self.dropped_bytes += len(data)
+            self._set_error(f"写入文件时出错: {str(e)}")
+            return
+        self.segment_bytes += len(data)
+        self.bytes_written += len(data)
+        if self._indexer is not None:
+            try:
+                for piece, wall_time in pieces:
+                    self._indexer.feed(piece, wall_time)
+                self._indexer.flush()
+            except OSError as e:
+                print(f"写入日志索引出错: {str(e)}")
+                self._indexer = None
+
+    def _maybe_rotate(self, now: float):
+        """切分只影响写入线程，接收线程继续入队；尽量在行尾切分，避免一行跨两个分段"""
+        if (self._file is not None and self.segment_bytes
+                and (self._at_line_start or self.segment_bytes >= self.rotation.max_bytes + 65536)
+                and self.rotation.should_rotate(self.segment_bytes, self._opened_at, now)):
+            self._close_segment()
+            self._open_segment()
+
+    def _run(self):
+        buffer = []
+        buffered = 0
+        last_flush = time.monotonic()
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            # 一次取完队列中已有的数据，减少写入次数
+            items = []
+            while item is not None:
+                if item is _STOP:
+                    stopping = True
+                    break
+                items.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            now = time.monotonic()
+            self._check_disk(now)
+            for text, wall_time in items:
+                with self._pending_lock:
+                    self.pending_bytes -= len(text)
+                if self.timestamps:
+                    text = self._timestamp_lines(text, wall_time)
+                elif text:
+                    self._at_line_start = text.endswith('\n')
+                data = text.encode('utf-8')
+                buffer.append((data, wall_time))
+                buffered += len(data)
+                if buffered >= self.flush_bytes and self._at_line_start:
+                    self._flush(buffer)
+                    buffered = 0
+                    last_flush = now
+                    self._maybe_rotate(now)
+
+            if buffered and (now - last_flush >= self.flush_interval or stopping):
+                self._flush(buffer)
+                buffered = 0
+                last_flush = now
+            self._maybe_rotate(now)
+
+        self._close_segment()
@@ -3,12 +3,28 @@ import serial,qdarkstyle
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                              QComboBox, QPushButton, QGroupBox, QScrollArea, QFileDialog,
                              QMessageBox, QGridLayout, QSizePolicy, QCheckBox, QTableWidget,
-                             QTableWidgetItem, QHeaderView, QFrame, QTextEdit)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
+                             QTableWidgetItem, QHeaderView, QFrame, QTextEdit, QScrollBar, QSpinBox)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QEvent
 from PyQt5.QtGui import QFont
-from serial_receiver import SerialReceiver, SerialConfig
+from serial_receiver import SerialReceiver, SerialConfig, RxChunk, DisplayGovernor, ClockAnchor
+from track_view import PortTrack, export_tracks_html
+from fix_history import FixHistory
+from alignment import EpochAligner
+from fix_stats import FixStatistics
+from latency import LatencyMonitor
+from geofence import AlertEngine, load_geojson
+from port_registry import PortRegistry
+from fanout_server import FanoutServer
+from input_sources import safe_port_name, source_exists
+from log_writer import LogWriter, LogMaintenance, RotationPolicy, RetentionPolicy
+from ui_scheduler import RefreshScheduler
+from log_viewer import LogViewerWindow
+from shutdown import ShutdownCoordinator
+from memory_budget import (MemoryBudget, TextBuffer, PRIORITY_HISTORY, PRIORITY_LIVE, str_bytes,
+                           float_list_bytes)
 import sys
 import os
+from collections import deque
 from datetime import datetime
 import pyqtgraph as pg  # 新增绘图库导入
 from PyQt5.QtGui import QIcon  # 新增图标类导入
@@ -19,24 +35,43 @@ class SerialPortWidget(QWidget):
     # 新增：连接状态变化信号定义
     connection_state_changed = pyqtSignal()
 
-    def __init__(self, port_index: int, parent=None):
+    # 语句订阅预设：名称 -> (语句类型, 显示频率Hz)
+    FILTER_PRESETS = {
+        '全部语句': ((), 0),
+        'RMC+GGA': (('RMC', 'GGA'), 0),
+        'RMC+GGA 5Hz': (('RMC', 'GGA'), 5),
+        'RMC+GGA 1Hz': (('RMC', 'GGA'), 1),
+    }
+
+    def __init__(self, port_index: int, port_registry: PortRegistry = None, parent=None):
         super().__init__(parent)
         self.port_index = port_index
+        self.port_registry = port_registry  # 共享的串口注册表（缓存枚举结果）
         self.serial_receiver = None
+        self.state_tooltip = ""  # 串口标识的状态提示（不含告警）
+        self.shed_level = 0  # 界面过载保护级别（0为正常，见DisplayGovernor）
         self.is_receiving = True
-        self.max_display_length = 200000
-        self.max_buffer_length = 500000
-        self.data_buffer = ""
-        self.parsed_data_buffer = ""
+        self.max_display_length = 200000  # 详情窗口最多显示的原始字符数
+        # 原始数据和解析结果不设固定上限，保留多少由全局内存预算决定（超出时从最旧的数据裁剪）
+        self.data_buffer = TextBuffer()
+        # 解析结果以紧凑形式保存 (原始语句, 解析结果字典)，文本报告只在详情窗口需要时生成
+        self.parsed_results = deque()
+        self.parsed_bytes = 0  # 解析结果占用的字节数（增量统计）
+        self.latest_gga = {}  # 最近一条有效GGA
+        self.latest_rmc = {}  # 最近一条有效RMC
 
         # 文件保存相关
         self.log_dir = "serial_logs"
-        self.current_log_file = None
-        self.max_file_size = 500 * 1024 * 1024  # 500MB
+        self.log_writer = None  # 后台日志写入器（接收线程直接入队）
+        self.log_maintenance = None  # 日志目录维护（由主窗口注入，负责压缩/清理）
+        self.log_rotation = RotationPolicy(max_bytes=500 * 1024 * 1024, interval_s=3600)  # 500MB或1小时切分
+        self.log_error_reported = None
         self.auto_save_enabled = True  # 默认开启自动保存
-        self.bytes_written = 0
-        self.file_write_buffer = ""
-        self.file_write_threshold = 8192  # 8KB
+        self.log_timestamps = False  # 日志每行前加接收时间戳
+
+        # 最近一条已解析语句的到达时间（墙上时间，秒），作为绘图时间轴
+        self.latest_rx_time = None
+        self.plotted_rx_time = None
 
         # 初始化 data_values 属性（替换QTextEdit为QLabel）
         self.data_values = {
@@ -89,6 +124,32 @@ class SerialPortWidget(QWidget):
         }
         self.max_plot_points = 1000  # 最多保存1000个点
 
+        # 轨迹数据（抽稀折线 + 网格点，内存有界）
+        self.track = PortTrack()
+
+        # 磁盘定位历史（由主窗口注入，断开连接后仍可回看）
+        self.fix_history = None
+        self.history_port = None  # 写入历史所用的串口名（断开后保留，用于回看）
+        self.history_epoch = None  # 正在合并的历元 [UTC, 到达时间, RMC, GGA]，凑齐或换历元时写入历史
+        self.history_written_utc = None
+        self.clock_anchor = None  # 会话时钟锚点（由主窗口注入，所有接收线程共用）
+
+        # 解析结果回调列表：callback(串口序号, 解析结果字典)
+        self.fix_callbacks = []
+
+        # 内存预算统计结果（由主窗口定时更新）
+        self.memory_bytes = 0
+
+        # 界面刷新调度器（由主窗口注入）；未注入时立即刷新
+        self.refresh_scheduler = None
+        self.refresh_tasks = {'labels': self.apply_display, 'size': self.update_size_label}
+        self.pending_display = {}  # 待刷新到标签上的显示数据
+
+        # 本机转发服务（由主窗口开启后注入）
+        self.fanout_server = None
+        self.fanout_base_port = 10110  # NMEA over TCP 常用端口，串口n使用 10110+n-1
+        self.fanout_udp = False
+
         # 关键修复：初始化 last_display_data
         self.last_display_data = {}  # 新增
 
@@ -108,6 +169,9 @@ class SerialPortWidget(QWidget):
         # 串口选择（原120→100）
         self.port_combo = QComboBox()
         self.port_combo.setFixedWidth(100)
+        # 可直接输入伪终端/文件路径或URL（socket://主机:端口、loop://、file://路径?rate=11520）
+        self.port_combo.setEditable(True)
+        self.port_combo.lineEdit().setPlaceholderText("串口/URL")
         self.refresh_ports()
         # 新增：绑定选择变化事件并初始化工具提示
         self.port_combo.currentTextChanged.connect(self.update_port_tooltip)
@@ -176,18 +240,58 @@ class SerialPortWidget(QWidget):
         self.details_btn.clicked.connect(self.show_port_details)
         layout.addWidget(self.details_btn, 0, 14)
 
+        # 语句订阅规则（在接收线程中过滤/抽稀，日志仍保存全部原始数据）
+        self.filter_combo = QComboBox()
+        self.filter_combo.setFixedWidth(110)
+        for name in self.FILTER_PRESETS:
+            self.filter_combo.addItem(name)
+        self.filter_combo.setToolTip("界面只接收所选语句（日志不受影响）")
+        self.filter_combo.currentTextChanged.connect(self.change_sentence_filter)
+        layout.addWidget(self.filter_combo, 0, 15)
+
+        # 界面过载保护级别（正常时不显示；日志始终完整）
+        self.overload_label = QLabel("")
+        self.overload_label.setFixedWidth(36)
+        self.overload_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.overload_label, 0, 16)
+
         self.setLayout(layout)
 
-        # 设置定时器更新UI
+        # 设置定时器采样最新定位（标签刷新由刷新调度器合并执行）
         self.update_timer = QTimer()
         self.update_timer.timeout.connect(self.update_display)
         self.update_timer.start(100)  # 100ms更新一次
 
+    def attach_scheduler(self, scheduler: RefreshScheduler):
+        """把本串口的界面刷新任务登记到调度器（以本控件的可见性为准）"""
+        self.refresh_scheduler = scheduler
+        for name, callback in self.refresh_tasks.items():
+            scheduler.register((self.port_index, name), callback, self)
+
+    def request_refresh(self, name: str):
+        """标记界面需要刷新"""
+        if self.refresh_scheduler is not None:
+            self.refresh_scheduler.mark_dirty((self.port_index, name))
+        else:
+            self.refresh_tasks[name]()
+
+    def available_ports(self) -> list:
+        """可用串口列表：优先使用注册表缓存，避免在界面线程枚举"""
+        if self.port_registry is not None:
+            return self.port_registry.ports()
+        return SerialReceiver.get_available_ports()
+
+    def on_ports_changed(self, ports: list, added: list, removed: list):
+        """注册表推送的热插拔事件（已连接时不改动下拉框，断开后再同步）"""
+        if self.port_combo.isEnabled():
+            self.refresh_ports()
+
     def refresh_ports(self):
         """刷新可用串口列表（显示COM3，工具提示显示完整描述）"""
         current_port = self.port_combo.currentText()
+        self.port_combo.blockSignals(True)
         self.port_combo.clear()
-        ports = SerialReceiver.get_available_ports()  # 现在获取(设备名, 描述)列表
+        ports = self.available_ports()  # 现在获取(设备名, 描述)列表
         
         for device, description in ports:
             self.port_combo.addItem(device)  # 下拉列表显示设备名（如COM3）
@@ -196,58 +300,28 @@ class SerialPortWidget(QWidget):
         
         if current_port in [device for device, _ in ports]:
             self.port_combo.setCurrentText(current_port)
+        elif current_port and source_exists(current_port):
+            self.port_combo.setEditText(current_port)  # 保留手动输入的路径/URL
+        self.port_combo.blockSignals(False)
         self.update_port_tooltip()  # 初始设置工具提示
 
     def update_display(self):
-        """更新数据显示（增加强制更新逻辑）"""
-        if not self.parsed_data_buffer:
+        """采样最新定位：写入绘图/历史/轨迹数据，并请求刷新标签（增加强制更新逻辑）"""
+        gga = self.latest_gga
+        rmc = self.latest_rmc
+        if not gga and not rmc:
             return
 
-        # 解析最新数据
-        lines = self.parsed_data_buffer.split('\n')
-        latest_gga = {}
-        latest_rmc = {}
-
-        for line in lines:
-            if "解析: [GNGGA]" in line and "无效" not in line:
-                latest_gga = {}
-            elif "解析: [GNRMC]" in line and "无效" not in line:
-                latest_rmc = {}
-            elif "时间:" in line:
-                # 修复：合并split后的剩余部分获取完整时间
-                time = ":".join(line.split(":")[1:]).strip()  # 原错误行修改
-                if latest_gga:
-                    latest_gga["time"] = time
-                elif latest_rmc:
-                    latest_rmc["time"] = time
-            elif "位置:" in line:
-                pos_parts = line.split(":")[1].strip().split(", ")
-                lat = pos_parts[0].split("°")[0]
-                lon = pos_parts[1].split("°")[0]
-                if latest_gga:
-                    latest_gga["lat"] = lat
-                    latest_gga["lon"] = lon
-                elif latest_rmc:
-                    latest_rmc["lat"] = lat
-                    latest_rmc["lon"] = lon
-            elif "卫星数:" in line:
-                latest_gga["satellites"] = line.split(":")[1].strip()
-            elif "海拔:" in line:
-                latest_gga["altitude"] = line.split(":")[1].strip().split(" ")[0]
-            elif "速度:" in line:
-                latest_rmc["speed"] = line.split(":")[1].strip().split(" ")[0]
-            elif "航向:" in line:
-                latest_rmc["course"] = line.split(":")[1].strip().split("°")[0]
-
-        # 计算新的显示数据
+        # 直接使用最近的有效解析结果（RMC优先提供时间/位置，GGA提供卫星数/海拔）
+        position = rmc or gga
         new_display_data = {
-            'time': latest_rmc.get("time", latest_gga.get("time", "-")),
-            'lat': latest_rmc.get("lat", latest_gga.get("lat", "-")),
-            'lon': latest_rmc.get("lon", latest_gga.get("lon", "-")),
-            'speed': latest_rmc.get("speed", "-"),
-            'course': latest_rmc.get("course", "-"),
-            'satellites': latest_gga.get("satellites", "-"),
-            'altitude': latest_gga.get("altitude", "-")
+            'time': position['time'],
+            'lat': f"{position['latitude']:.6f}",
+            'lon': f"{position['longitude']:.6f}",
+            'speed': f"{rmc['speed']:.2f}" if rmc else "-",
+            'course': f"{rmc['course']:.1f}" if rmc else "-",
+            'satellites': str(gga['satellites']) if gga else "-",
+            'altitude': f"{gga['altitude']:.1f}" if gga else "-"
         }
 
         # 记录上一次显示的数据（新增时间戳）
@@ -258,122 +332,279 @@ class SerialPortWidget(QWidget):
         # 关键修改：即使数据未变化，每5秒强制更新
         force_update = (current_time - self.last_update_time) > 5
 
-        if new_display_data != self.last_display_data or force_update:
-            # 记录当前时间戳（秒数）
-            current_time = datetime.now().timestamp()
-            self.plot_data['time'].append(current_time)
+        # 绘图时间使用语句的实际到达时间；到达时间未推进（仅强制刷新）时只刷新标签
+        rx_time = self.latest_rx_time
+        new_fix = rx_time is not None and rx_time != self.plotted_rx_time
 
-            # 尝试转换并添加参数值（处理无效数据时填充NaN）
-            try:
-                self.plot_data['lat'].append(float(new_display_data['lat']))
-                self.plot_data['lon'].append(float(new_display_data['lon']))
-                self.plot_data['speed'].append(float(new_display_data['speed']))
-                self.plot_data['course'].append(float(new_display_data['course']))
-                self.plot_data['satellites'].append(float(new_display_data['satellites']))
-                self.plot_data['altitude'].append(float(new_display_data['altitude']))
-            except ValueError:
-                for key in ['lat', 'lon', 'speed', 'course', 'satellites', 'altitude']:
-                    self.plot_data[key].append(float('nan'))
-
-            # 关键修复：同步截断所有数组
-            current_length = len(self.plot_data['time'])
-            if current_length > self.max_plot_points:
-                # 计算需要截断的起始位置（保留最后max_plot_points个数据）
-                truncate_start = current_length - self.max_plot_points
-                for key in self.plot_data:
-                    # 对每个数组执行同步截断
-                    self.plot_data[key] = self.plot_data[key][truncate_start:]
-
-            # 更新显示标签
-            for key in new_display_data:
-                self.data_values[key].setText(new_display_data[key])
+        if new_display_data != self.last_display_data or force_update:
+            if new_fix:
+                # 记录语句到达时间戳（秒数）
+                self.plot_data['time'].append(rx_time)
+                self.plotted_rx_time = rx_time
+
+                # 尝试转换并添加参数值（处理无效数据时填充NaN）
+                # 先全部转换再追加，避免部分字段转换失败导致各数组长度不一致
+                param_keys = ['lat', 'lon', 'speed', 'course', 'satellites', 'altitude']
+                if rmc and gga:
+                    values = [position['latitude'], position['longitude'], rmc['speed'], rmc['course'],
+                              float(gga['satellites']), gga['altitude']]
+                else:
+                    values = [float('nan')] * len(param_keys)
+                for key, value in zip(param_keys, values):
+                    self.plot_data[key].append(value)
+
+                # 追加到轨迹（与绘图数据解耦，只需要经纬度）
+                self.track.add(position['latitude'], position['longitude'], rx_time)
+
+                # 关键修复：同步截断所有数组
+                current_length = len(self.plot_data['time'])
+                if current_length > self.max_plot_points:
+                    # 计算需要截断的起始位置（保留最后max_plot_points个数据）
+                    truncate_start = current_length - self.max_plot_points
+                    for key in self.plot_data:
+                        # 对每个数组执行同步截断
+                        self.plot_data[key] = self.plot_data[key][truncate_start:]
+
+            # 请求更新显示标签
+            self.pending_display = new_display_data
+            self.request_refresh('labels')
             self.last_display_data = new_display_data.copy()
             self.last_update_time = current_time  # 更新时间戳
 
-    def on_data_received(self, data: str):
-        """处理接收到的数据"""
-        if not self.is_receiving:
-            return
+    def apply_display(self):
+        """把待显示数据写到标签上（只更新文本变化的标签）"""
+        for key, text in self.pending_display.items():
+            label = self.data_values[key]
+            if label.text() != text:
+                label.setText(text)
 
+    def update_size_label(self):
+        """更新数据量显示和工具提示"""
+        writer = self.log_writer
         # 增加逻辑判断，只有按下连接按钮且自动保存开启时才统计数据量
-        if self.serial_receiver and self.serial_receiver.is_connected and self.auto_save_enabled:
+        if self.serial_receiver and self.serial_receiver.is_connected and self.auto_save_enabled and writer:
             # 计算KB和字节数
-            kb = self.bytes_written // 1024
-            bytes_total = self.bytes_written
-            # 更新显示文本和工具提示（优化：仅内容变化时更新）
-            self.data_size_label.setText(f"{kb} KB")
-            new_tooltip = f"已记录：{kb} KB（{bytes_total} 字节）"
-            if self.data_size_label.toolTip() != new_tooltip:  # 关键修改
-                self.data_size_label.setToolTip(new_tooltip)
+            kb = writer.bytes_written // 1024
+            bytes_total = writer.bytes_written
+            new_text = f"{kb} KB"
+            new_tooltip = (f"已记录：{kb} KB（{bytes_total} 字节）\n"
+                           f"分段：{writer.segments} 个，当前 {writer.segment_bytes // 1024} KB\n"
+                           f"内存：{self.memory_bytes // 1024} KB")
+            if writer.dropped_bytes:
+                new_tooltip += f"\n未写入：{writer.dropped_bytes // 1024} KB"
+            self.update_log_status(writer)
         else:
-            # 若不满足条件，重置数据量显示和工具提示（同样优化）
-            self.data_size_label.setText("0KB")
+            # 若不满足条件，重置数据量显示和工具提示
+            new_text = "0KB"
             new_tooltip = "已记录：0 KB（0 字节）"
-            if self.data_size_label.toolTip() != new_tooltip:  # 关键修改
-                self.data_size_label.setToolTip(new_tooltip)
-
-        # 写入文件
-        if self.auto_save_enabled and self.current_log_file and self.serial_receiver and self.serial_receiver.is_connected:
-            self.file_write_buffer += data
-            if len(self.file_write_buffer) >= self.file_write_threshold:
-                try:
-                    self.current_log_file.write(self.file_write_buffer)
-                    self.current_log_file.flush()
-                    self.bytes_written += len(self.file_write_buffer.encode('utf-8'))
-                    self.file_write_buffer = ""
-
-                    if self.bytes_written >= self.max_file_size:
-                        self.create_new_log_file(self.serial_receiver.config.port)
-                except Exception as e:
-                    print(f"写入文件时出错: {str(e)}")
-                    QMessageBox.critical(self, "错误", f"写入文件时出错: {str(e)}")
-                    self.auto_save_enabled = False
-                    if self.current_log_file:
-                        self.current_log_file.close()
-                        self.current_log_file = None
-
-        # 更新数据缓冲区
-        self.data_buffer += data
-        if len(self.data_buffer) > self.max_buffer_length:
-            self.data_buffer = self.data_buffer[-self.max_buffer_length:]
-
-        # 解析数据
-        if self.serial_receiver:
-            parsed_data = self.serial_receiver.parse_nmea_data(data)
-            if parsed_data:
-                self.parsed_data_buffer += parsed_data + '\n'
-                if len(self.parsed_data_buffer) > self.max_display_length:
-                    self.parsed_data_buffer = self.parsed_data_buffer[-self.max_display_length:]
+        # 优化：仅内容变化时更新
+        if self.data_size_label.text() != new_text:
+            self.data_size_label.setText(new_text)
+        if self.data_size_label.toolTip() != new_tooltip:  # 关键修改
+            self.data_size_label.setToolTip(new_tooltip)
+
+    def update_log_status(self, writer: LogWriter):
+        """显示当前日志分段；写入出错时提示一次并关闭自动保存"""
+        name = os.path.basename(writer.current_path) if writer.current_path else "未保存"
+        if writer.state == LogWriter.STATE_DISK_LOW:
+            name += "（磁盘空间不足，暂停写入）"
+        if self.filename_label.text() != name:
+            self.filename_label.setText(name)
+        if writer.state == LogWriter.STATE_ERROR and self.log_error_reported != writer.error:
+            self.log_error_reported = writer.error
+            QMessageBox.critical(self, "错误", writer.error)
+            self.auto_save_check.setChecked(False)
+
+    def on_data_received(self, chunk: RxChunk):
+        """处理接收到的数据块（更新原始数据缓冲区；日志已在接收线程中入队）"""
+        self.ack_display()
+        if not self.is_receiving:
+            return
+        data = chunk.text
+
+        # 数据量显示由刷新调度器合并更新
+        self.request_refresh('size')
+
+        # 更新数据缓冲区（大小由内存预算裁剪）
+        self.data_buffer.append(data)
+
+    def display_text(self) -> str:
+        """详情窗口显示的原始数据（缓冲区末尾max_display_length个字符）"""
+        return self.data_buffer.tail(self.max_display_length)
+
+    def register_memory(self, budget: MemoryBudget):
+        """向全局内存预算登记本串口的各类缓冲区"""
+        budget.register(self.port_index, '原始数据', lambda: self.data_buffer.nbytes,
+                        self.data_buffer.trim, PRIORITY_LIVE)
+        budget.register(self.port_index, '解析结果', lambda: self.parsed_bytes,
+                        self.trim_parsed_results, PRIORITY_HISTORY)
+        # 绘图数据是实时曲线的显示窗口（max_plot_points个点），完整序列在磁盘历史中，这里只在预算很紧时裁剪
+        budget.register(self.port_index, '绘图数据',
+                        lambda: sum(float_list_bytes(values) for values in self.plot_data.values()),
+                        self.trim_plot_data, PRIORITY_HISTORY)
+        # 待写日志的数据不可裁剪，只统计
+        budget.register(self.port_index, '待写日志', lambda: self.log_writer.pending_bytes if self.log_writer else 0)
+        # 轨迹自身有界，只统计（每个顶点约一个三元组 + 每个网格约一个列表）
+        budget.register(self.port_index, '轨迹',
+                        lambda: len(self.track.simplifier.points) * 136 + len(self.track.grid.cells) * 200)
+
+    @staticmethod
+    def _value_bytes(value) -> int:
+        """解析结果中一个值独占的字节数（布尔、None和小整数是共享对象，不计）"""
+        if value is None or value is True or value is False or (type(value) is int and -5 <= value <= 256):
+            return 0
+        return sys.getsizeof(value)
+
+    @staticmethod
+    def _parsed_result_bytes(entry) -> int:
+        """一条解析结果的实际字节数：元组 + 原始语句 + 字典及其各个值（键和类型名是共享的常量字符串，不计）"""
+        valid_line, result = entry
+        size = sys.getsizeof(entry) + str_bytes(valid_line) + sys.getsizeof(result)
+        for key, value in result.items():
+            if key != 'type':
+                size += SerialPortWidget._value_bytes(value)
+        return size
+
+    def add_parsed_results(self, results: list):
+        self.parsed_results.extend(results)
+        self.parsed_bytes += sum(map(self._parsed_result_bytes, results))
+
+    def clear_parsed_results(self):
+        self.parsed_results.clear()
+        self.parsed_bytes = 0
+
+    def trim_parsed_results(self, nbytes: int) -> int:
+        """丢弃最旧的解析结果"""
+        freed = 0
+        while self.parsed_results and freed < nbytes:
+            freed += self._parsed_result_bytes(self.parsed_results.popleft())
+        self.parsed_bytes = max(0, self.parsed_bytes - freed)
+        return freed
+
+    def trim_plot_data(self, nbytes: int) -> int:
+        """同步丢弃最旧的绘图点（磁盘历史仍保留全部数据）"""
+        count = len(self.plot_data['time'])
+        if not count:
+            return 0
+        per_point = len(self.plot_data) * (8 + 24)  # 每个点在各数组中占一个指针 + 一个float
+        drop = min(count, nbytes // per_point + 1)
+        for key in self.plot_data:
+            self.plot_data[key] = self.plot_data[key][drop:]
+        return drop * per_point
+
+    def ack_display(self):
+        """向发出信号的接收线程确认已处理（过载保护据此统计界面积压）"""
+        receiver = self.sender()
+        if isinstance(receiver, SerialReceiver):
+            receiver.ack_display()
+
+    def on_overload_changed(self, level: int, detail: str):
+        """界面过载保护级别变化：在串口行显示当前级别"""
+        if self.sender() is not self.serial_receiver:
+            return
+        self.set_shed_level(level, detail)
+
+    def set_shed_level(self, level: int, detail: str = ""):
+        self.shed_level = level
+        colors = ("", "#fb8c00", "#f4511e", "#e53935")
+        self.overload_label.setText(DisplayGovernor.LEVEL_NAMES[level] if level else "")
+        self.overload_label.setStyleSheet(f"color: {colors[level]};" if level else "")
+        self.overload_label.setToolTip(f"界面过载保护 - {detail}\n只减少显示，日志和定位分析完整" if level else "")
+
+    def on_fixes_received(self, results: list):
+        """处理全部定位解析结果（不受语句订阅和界面过载保护影响）：更新最新定位并交给各回调"""
+        if self.sender() is not self.serial_receiver:
+            return  # 断开后仍在队列中的旧信号
+        for _, result in results:
+            self.latest_rx_time = result['rx_time']
+            if result['valid']:
+                if result['type'] == 'GNGGA':
+                    self.latest_gga = result
+                else:
+                    self.latest_rmc = result
+                self.record_history(result)
+            for callback in self.fix_callbacks:
+                callback(self.port_index, result)
+
+    def record_history(self, result: dict):
+        """每个定位历元写一条磁盘历史（RMC提供位置/速度/航向，GGA提供卫星数/海拔），不受界面刷新频率影响"""
+        utc = result.get('utc')
+        if self.fix_history is None or not self.history_port or utc is None or utc == self.history_written_utc:
+            return
+        if self.history_epoch is not None and self.history_epoch[0] != utc:
+            self.flush_history_epoch()  # 上一历元只收到了一种语句
+        if self.history_epoch is None:
+            self.history_epoch = [utc, result['rx_time'], None, None]
+        self.history_epoch[3 if result['type'] == 'GNGGA' else 2] = result
+        if self.history_epoch[2] is not None and self.history_epoch[3] is not None:
+            self.flush_history_epoch()
+
+    def flush_history_epoch(self):
+        """把正在合并的历元写入磁盘历史（缺少的字段写NaN）"""
+        if self.history_epoch is None:
+            return
+        utc, rx_time, rmc, gga = self.history_epoch
+        self.history_epoch = None
+        self.history_written_utc = utc
+        position = rmc or gga
+        nan = float('nan')
+        self.fix_history.append(self.history_port, rx_time, position['latitude'], position['longitude'],
+                                rmc['speed'] if rmc else nan, rmc['course'] if rmc else nan,
+                                float(gga['satellites']) if gga else nan, gga['altitude'] if gga else nan)
+
+    def on_sentences_received(self, sentences: list):
+        """处理要显示的完整语句（已按订阅过滤），解析结果只用于详情窗口的解析列表"""
+        self.ack_display()
+        if not self.is_receiving:
+            return
+
+        # 直接保存接收线程已解析的结果，不重复解析，也不在接收路径上格式化文本
+        self.add_parsed_results([sentence.fix for sentence in sentences if sentence.fix is not None])
 
     def create_new_log_file(self, port_name: str):
-        """创建新的日志文件"""
-        if self.current_log_file and not self.current_log_file.closed:
-            self.current_log_file.close()
+        """创建新的日志写入器（文件IO、切分和压缩都在后台进行）"""
+        self.close_log()
 
-        clean_port_name = port_name.replace('/', '_').replace('\\', '_').replace(':', '')
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        clean_port_name = safe_port_name(port_name)
         baudrate = self.baudrate_combo.currentText()
-
-        filename = f"{self.log_dir}/{clean_port_name}_{baudrate}_{timestamp}.txt"
         try:
-            self.current_log_file = open(filename, 'a', encoding='utf-8')
-            self.bytes_written = 0
-            self.filename_label.setText(os.path.basename(filename))
-        except IOError as e:
+            self.log_writer = LogWriter(self.log_dir, f"{clean_port_name}_{baudrate}", self.log_rotation,
+                                        self.log_maintenance, timestamps=self.log_timestamps)
+        except OSError as e:
             print(f"无法创建日志文件: {str(e)}")
             QMessageBox.critical(self, "错误", f"无法创建日志文件: {str(e)}")
             self.auto_save_enabled = False
             self.filename_label.setText("未保存")
+            return
+        self.log_error_reported = None
+        if self.serial_receiver:
+            self.serial_receiver.chunk_sinks.append(self.log_writer.write_chunk)
+        self.update_log_status(self.log_writer)
+
+    def close_log(self):
+        """停止接收线程的日志入队，写完剩余数据后关闭（已关闭的分段交给后台压缩）"""
+        writer = self.log_writer
+        if writer is None:
+            return
+        self.log_writer = None
+        if self.serial_receiver and writer.write_chunk in self.serial_receiver.chunk_sinks:
+            self.serial_receiver.chunk_sinks.remove(writer.write_chunk)
+        if not writer.close():
+            print(f"串口{self.port_index}日志未能在超时前写完")
+        self.filename_label.setText("未保存")
+
+    def set_log_timestamps(self, enabled: bool):
+        self.log_timestamps = enabled
+        if self.log_writer is not None:
+            self.log_writer.timestamps = enabled
 
     def toggle_auto_save(self, state):
         """切换自动保存状态"""
         self.auto_save_enabled = (state == Qt.Checked)
         if self.auto_save_enabled and self.serial_receiver and self.serial_receiver.is_connected:
             self.create_new_log_file(self.serial_receiver.config.port)
-        elif not self.auto_save_enabled and self.current_log_file:
-            self.current_log_file.close()
-            self.current_log_file = None
-            self.filename_label.setText("未保存")
+        elif not self.auto_save_enabled:
+            self.close_log()
 
     def toggle_connection(self):
         """切换连接状态"""
@@ -384,37 +615,47 @@ class SerialPortWidget(QWidget):
 
     def connect_serial(self):
         """连接串口"""
-        port = self.port_combo.currentText()
+        port = self.port_combo.currentText().strip()
         if not port:
             QMessageBox.warning(self, "警告", "请选择串口")
             return
 
-        # 检查串口是否存在（修复关键）
-        available_ports = SerialReceiver.get_available_ports()
-        available_devices = [device for device, _ in available_ports]  # 提取所有可用设备名
-        if port not in available_devices:
+        # 检查串口是否存在（修复关键，使用注册表缓存，不阻塞界面）
+        available_devices = [device for device, _ in self.available_ports()]  # 提取所有可用设备名
+        if port not in available_devices and not source_exists(port):
             QMessageBox.critical(self, "错误", "所选串口不存在")
             return
 
         baudrate = self.baudrate_combo.currentText()
 
         try:
+            sentence_types, rate_hz = self.FILTER_PRESETS[self.filter_combo.currentText()]
             config = SerialConfig(
                 port=port,
-                baudrate=int(baudrate))
+                baudrate=int(baudrate),
+                sentence_filter=sentence_types,
+                display_rate_hz=rate_hz)
 
             # 断开现有连接
             if self.serial_receiver:
                 self.serial_receiver.disconnect()
 
-            # 创建新日志文件
+            # 创建接收器
+            self.serial_receiver = SerialReceiver(config, self.port_index, clock_anchor=self.clock_anchor)
+            self.history_port = port
+
+            # 创建新日志文件（在接收线程启动前接入）
             if self.auto_save_enabled:
                 self.create_new_log_file(port)
-
-            # 创建接收器
-            self.serial_receiver = SerialReceiver(config, self.port_index)
             self.serial_receiver.data_received.connect(self.on_data_received)
+            self.serial_receiver.sentences_received.connect(self.on_sentences_received)
+            self.serial_receiver.fixes_received.connect(self.on_fixes_received)
             self.serial_receiver.error_occurred.connect(self.on_serial_error)
+            self.serial_receiver.state_changed.connect(self.on_state_changed)
+            self.serial_receiver.read_warning.connect(self.on_read_warning)
+            self.serial_receiver.overload_changed.connect(self.on_overload_changed)
+            if self.fanout_server is not None:
+                self.attach_fanout(self.fanout_server)
             self.serial_receiver.connection_established.connect(lambda: self.connection_state_changed.emit())
             self.serial_receiver.start()
 
@@ -428,26 +669,74 @@ class SerialPortWidget(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "错误", f"连接错误: {str(e)}")
 
-    def disconnect_serial(self):
-        """断开串口连接"""
+    def change_sentence_filter(self, name: str):
+        """切换语句订阅规则（连接中立即生效）"""
+        sentence_types, rate_hz = self.FILTER_PRESETS[name]
         if self.serial_receiver:
-            self.serial_receiver.disconnect()
-            self.serial_receiver = None
+            self.serial_receiver.set_sentence_filter(sentence_types, rate_hz)
+
+    def attach_fanout(self, server: FanoutServer):
+        """把本串口的原始字节接入转发服务"""
+        self.fanout_server = server
+        if not self.serial_receiver:
+            return
+        port = self.fanout_base_port + self.port_index - 1
+        udp_target = ('127.0.0.1', port) if self.fanout_udp else None
+        try:
+            server.add_stream(self.port_index, port, udp_target)
+        except OSError as e:
+            print(f"串口{self.port_index}转发端口{port}启动失败: {str(e)}")
+            return
+        publish = self._fanout_publish = lambda data, key=self.port_index: server.publish(key, data)
+        self.serial_receiver.raw_sinks.append(publish)
+
+    def detach_fanout(self):
+        """停止本串口的转发"""
+        if self.fanout_server is not None:
+            self.fanout_server.remove_stream(self.port_index)
+        publish = getattr(self, '_fanout_publish', None)
+        if publish is not None and self.serial_receiver and publish in self.serial_receiver.raw_sinks:
+            self.serial_receiver.raw_sinks.remove(publish)
+        self._fanout_publish = None
+
+    def release_for_shutdown(self):
+        """交出接收线程和日志写入器，由ShutdownCoordinator统一关闭（本方法不等待）"""
+        receiver, writer = self.serial_receiver, self.log_writer
+        if receiver is not None:
+            self.detach_fanout()
+            receiver.blockSignals(True)  # 关闭过程中不再向界面发信号
+        self.serial_receiver = None
+        self.log_writer = None
+        return receiver, writer
+
+    def disconnect_serial(self):
+        """断开串口连接：接收线程结束后写完日志再关闭"""
+        receiver, writer = self.release_for_shutdown()
+        if receiver is not None or writer is not None:
+            coordinator = ShutdownCoordinator(deadline_s=2.0, force_after_deadline=False)
+            coordinator.add_port(self.port_index, receiver, writer)
+            if not coordinator.run():
+                print(coordinator.report())
+        self.filename_label.setText("未保存")
+        self.set_shed_level(0)
 
         self.connect_btn.setText("连接")
         self.port_combo.setEnabled(True)
+        self.refresh_ports()  # 同步连接期间发生的热插拔变化
         self.baudrate_combo.setEnabled(True)
         self.details_btn.setEnabled(False)
 
-        # 关闭日志文件
-        if self.current_log_file and not self.current_log_file.closed:
-            self.current_log_file.close()
-            self.current_log_file = None
-
-        # 清空解析数据和内存缓存数据
-        self.data_buffer = ""
-        self.parsed_data_buffer = ""
-        self.file_write_buffer = ""
+        # 清空解析数据和内存缓存数据（未凑齐的最后一个历元先写入历史）
+        self.flush_history_epoch()
+        self.history_written_utc = None
+        self.data_buffer.clear()
+        self.latest_rx_time = None
+        self.plotted_rx_time = None
+        self.clear_parsed_results()
+        self.latest_gga = {}
+        self.latest_rmc = {}
+        self.pending_display = {}
+        self.last_display_data = {}
 
         # 更新数据量显示
         self.data_size_label.setText("0KB")
@@ -459,14 +748,55 @@ class SerialPortWidget(QWidget):
         # 清空绘图数据存储
         for key in self.plot_data:
             self.plot_data[key].clear()
+        self.track.clear()
 
         # 关键新增：触发连接状态变化信号
         self.connection_state_changed.emit()
 
     def on_serial_error(self, error_msg: str):
-        """处理串口错误"""
-        QMessageBox.critical(self, "错误", error_msg)
-        self.disconnect_serial()
+        """处理串口错误（不弹模态框，在串口标识的提示中只保留最近一条；是否断开由状态机决定）"""
+        self.port_label.setToolTip(f"{self.state_tooltip}\n最近错误: {error_msg}".strip())
+
+    def on_read_warning(self, message: str):
+        """接收积压/溢出告警：记录在串口标识的提示中（只保留最近一条）"""
+        receiver = self.serial_receiver
+        tooltip = self.state_tooltip
+        if receiver is not None:
+            pacer = receiver.read_pacer
+            tooltip += (f"\n接收告警: {message}"
+                        f"\n积压告警 {pacer.overrun_warnings} 次，疑似溢出 {pacer.suspected_overruns} 次，"
+                        f"最大积压 {pacer.max_backlog} 字节")
+        self.port_label.setToolTip(tooltip)
+
+    def on_state_changed(self, state: str, detail: str):
+        """接收线程连接状态变化：更新串口标识颜色和提示，彻底失败时才断开"""
+        state_styles = {
+            SerialReceiver.STATE_CONNECTING: ("连接中", "#1e88e5"),
+            SerialReceiver.STATE_CONNECTED: ("已连接", "#43a047"),
+            SerialReceiver.STATE_RECONNECTING: ("重连中", "#fb8c00"),
+            SerialReceiver.STATE_FAILED: ("连接失败", "#e53935"),
+            SerialReceiver.STATE_STOPPED: ("未连接", ""),
+        }
+        name, color = state_styles.get(state, (state, ""))
+        self.port_label.setStyleSheet(f"color: {color};" if color else "")
+
+        tooltip = f"状态: {name}"
+        if detail:
+            tooltip += f"\n{detail}"
+        receiver = self.serial_receiver
+        if receiver and receiver.recovery_times:
+            times = list(receiver.recovery_times)
+            tooltip += (f"\n断线次数: {receiver.reconnect_count}"
+                        f"\n恢复耗时: 最近 {times[-1]:.2f}s / 平均 {sum(times) / len(times):.2f}s / 最长 {max(times):.2f}s")
+        self.state_tooltip = tooltip
+        self.port_label.setToolTip(tooltip)
+
+        if state == SerialReceiver.STATE_FAILED and receiver and self.sender() is receiver:
+            self.disconnect_serial()
+        elif state == SerialReceiver.STATE_STOPPED and receiver and self.sender() is receiver and detail:
+            # 数据源自然结束（如文件回放完毕）
+            self.disconnect_serial()
+            self.port_label.setToolTip(f"状态: 已结束\n{detail}")
 
     def update_port_tooltip(self):
         """更新串口选择框的工具提示更新（显示当前选中的完整设备信息）"""
@@ -487,13 +817,13 @@ class SerialPortWidget(QWidget):
 
         # 创建详情窗口
         self.detail_window = PortDataWindow(self.serial_receiver.config.port, self)
-        self.detail_window.set_data(self.data_buffer)
+        self.detail_window.set_data(self.display_text())
         self.detail_window.show()
 
     def closeEvent(self, event):
         """清理资源"""
         self.disconnect_serial()
-        if hasattr(self, 'detail_window'):
+        if getattr(self, 'detail_window', None) is not None:
             self.detail_window.close()
         event.accept()
 
@@ -505,8 +835,11 @@ class PortDataWindow(QMainWindow):
         super().__init__(parent)
         self.setWindowTitle(f"串口数据详情 - {port_name}")
         self.resize(800, 600)
+        self.setAttribute(Qt.WA_DeleteOnClose)  # 每次点击都新建窗口，关闭后释放，避免反复打开时累积
         self.parent_widget = parent
         self.is_paused = False
+        self.rendered_parsed = None  # 上次渲染的解析文本，未变化时不重设
+        self.ticks = 0
 
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -514,11 +847,20 @@ class PortDataWindow(QMainWindow):
         layout = QVBoxLayout(central_widget)
 
         # 数据显示区域（关键修改）
+        text_layout = QHBoxLayout()
         self.data_text = QTextEdit()
         self.data_text.setReadOnly(True)
         self.data_text.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)  # 允许双向扩展
         self.data_text.setSizeAdjustPolicy(QTextEdit.AdjustToContents)  # 根据内容调整大小
-        layout.addWidget(self.data_text)
+        text_layout.addWidget(self.data_text)
+
+        # 解析视图的滚动条：按解析结果条数滚动，只格式化可见的一页
+        self.parsed_scroll = QScrollBar(Qt.Vertical)
+        self.parsed_scroll.valueChanged.connect(self.render_parsed)
+        self.parsed_scroll.hide()
+        self.data_text.viewport().installEventFilter(self)
+        text_layout.addWidget(self.parsed_scroll)
+        layout.addLayout(text_layout)
 
         # 控制按钮
         btn_layout = QHBoxLayout()
@@ -532,6 +874,23 @@ class PortDataWindow(QMainWindow):
         self.pause_btn.clicked.connect(self.toggle_pause)
         btn_layout.addWidget(self.pause_btn)
 
+        self.save_btn = QPushButton("保存")
+        self.save_btn.setToolTip("保存内存中的全部原始数据（显示解析时保存当前页的解析报告）")
+        self.save_btn.clicked.connect(self.save_data)
+        btn_layout.addWidget(self.save_btn)
+
+        self.parsed_check = QCheckBox("显示解析")
+        self.parsed_check.setToolTip("显示解析报告（只格式化当前可见的语句）")
+        self.parsed_check.stateChanged.connect(self.toggle_parsed)
+        btn_layout.addWidget(self.parsed_check)
+
+        # 当前日志分段用日志查看器打开（不受界面缓冲区大小限制）
+        self.log_viewer = None
+        self.view_log_btn = QPushButton("查看日志")
+        self.view_log_btn.setToolTip("打开当前日志分段（内存映射，适合大文件）")
+        self.view_log_btn.clicked.connect(self.open_log_viewer)
+        btn_layout.addWidget(self.view_log_btn)
+
         layout.addLayout(btn_layout)
 
         # 设置定时器更新数据
@@ -550,15 +909,31 @@ class PortDataWindow(QMainWindow):
         """更新窗口内的数据"""
         if self.is_paused:
             return
+        # 界面过载时降低刷新频率（0.1/0.5/1/2秒）
+        self.ticks += 1
+        if self.parent_widget and self.ticks % (1, 5, 10, 20)[self.parent_widget.shed_level]:
+            return
 
         if self.parent_widget and self.parent_widget.serial_receiver and self.parent_widget.serial_receiver.is_connected:
+            # 数据源类型与吞吐量
+            source = self.parent_widget.serial_receiver.serial_port
+            if source is not None:
+                receiver = self.parent_widget.serial_receiver
+                self.statusBar().showMessage(
+                    f"数据源: {source.describe()}  {receiver.sentence_filter.describe()}  {receiver.read_pacer.describe()}"
+                    f"  {receiver.display_governor.describe()}")
+
+            if self.parsed_check.isChecked():
+                self.update_parsed_range()
+                return
+
             # 记录滚动条当前位置和是否在最底部
             scroll_bar = self.data_text.verticalScrollBar()
             at_bottom = scroll_bar.value() == scroll_bar.maximum()
             current_value = scroll_bar.value()
 
             # 更新数据
-            new_data = self.parent_widget.data_buffer
+            new_data = self.parent_widget.display_text()
             self.data_text.setPlainText(new_data)
 
             # 恢复滚动条位置
@@ -567,9 +942,61 @@ class PortDataWindow(QMainWindow):
             else:
                 scroll_bar.setValue(current_value)
 
+    def toggle_parsed(self, state):
+        """在原始数据和解析报告之间切换"""
+        parsed = state == Qt.Checked
+        self.parsed_scroll.setVisible(parsed)
+        self.data_text.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff if parsed else Qt.ScrollBarAsNeeded)
+        self.rendered_parsed = None
+        if parsed:
+            self.parsed_scroll.setValue(self.parsed_scroll.maximum())
+            self.update_parsed_range()
+        else:
+            self.set_data(self.parent_widget.display_text() if self.parent_widget else "")
+
+    def parsed_page_size(self) -> int:
+        """一页能显示的解析结果条数（每条报告约8行）"""
+        line_height = self.data_text.fontMetrics().lineSpacing()
+        return max(1, self.data_text.viewport().height() // (line_height * 8))
+
+    def update_parsed_range(self):
+        """按当前结果条数更新滚动范围（位于底部时跟随最新数据）"""
+        results = self.parent_widget.parsed_results
+        page = self.parsed_page_size()
+        at_bottom = self.parsed_scroll.value() == self.parsed_scroll.maximum()
+        self.parsed_scroll.blockSignals(True)
+        self.parsed_scroll.setRange(0, max(0, len(results) - page))
+        self.parsed_scroll.setPageStep(page)
+        if at_bottom:
+            self.parsed_scroll.setValue(self.parsed_scroll.maximum())
+        self.parsed_scroll.blockSignals(False)
+        self.render_parsed()
+
+    def render_parsed(self):
+        """只格式化可见范围内的解析结果"""
+        if not self.parsed_check.isChecked() or not self.parent_widget:
+            return
+        results = self.parent_widget.parsed_results
+        start = self.parsed_scroll.value()
+        # 按下标取（deque从较近的一端定位），不从头遍历整个历史
+        visible = [results[i] for i in range(start, min(start + self.parsed_page_size(), len(results)))]
+        text = SerialReceiver.format_nmea_results(visible) or ""
+        if text != self.rendered_parsed:
+            self.rendered_parsed = text
+            self.data_text.setPlainText(text)
+
+    def eventFilter(self, obj, event):
+        # 解析视图中滚轮按条滚动
+        if obj is self.data_text.viewport() and event.type() == QEvent.Wheel and self.parsed_check.isChecked():
+            steps = event.angleDelta().y() // 120
+            self.parsed_scroll.setValue(self.parsed_scroll.value() - steps)
+            return True
+        return super().eventFilter(obj, event)
+
     def clear_data(self):
         """清空数据"""
         self.data_text.clear()
+        self.rendered_parsed = None
 
     def toggle_pause(self):
         """切换暂停状态"""
@@ -579,6 +1006,30 @@ class PortDataWindow(QMainWindow):
         else:
             self.pause_btn.setText("暂停")
 
+    def open_log_viewer(self):
+        """用日志查看器打开该串口当前的日志分段"""
+        writer = self.parent_widget.log_writer if self.parent_widget else None
+        path = writer.current_path if writer is not None else None
+        if not path or not os.path.exists(path):
+            QMessageBox.information(self, "提示", "当前没有正在写入的日志")
+            return
+        if self.log_viewer is None:
+            self.log_viewer = LogViewerWindow(parent=self)
+        if self.log_viewer.log_file is None or self.log_viewer.log_file.path != path:
+            self.log_viewer.open_file(path)
+        else:
+            self.log_viewer.reload()  # 同一分段：加载新写入的内容
+        self.log_viewer.show()
+        self.log_viewer.raise_()
+
+    def closeEvent(self, event):
+        self.update_timer.stop()
+        if self.log_viewer is not None:
+            self.log_viewer.close()
+        if self.parent_widget and getattr(self.parent_widget, 'detail_window', None) is self:
+            self.parent_widget.detail_window = None
+        event.accept()
+
     def save_data(self):
         """保存数据到文件"""
         file_path, _ = QFileDialog.getSaveFileName(
@@ -591,18 +1042,431 @@ class PortDataWindow(QMainWindow):
         if file_path:
             try:
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(self.data_text.toPlainText())
+                    # 原始数据保存整个缓冲区（窗口只显示末尾一部分）
+                    if self.parent_widget and not self.parsed_check.isChecked():
+                        f.write(self.parent_widget.data_buffer.text())
+                    else:
+                        f.write(self.data_text.toPlainText())
                 QMessageBox.information(self, "成功", "数据保存成功")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"保存失败: {str(e)}")
 
 
+class TrackViewWindow(QMainWindow):
+    """经纬度轨迹视图窗口（每个串口一条抽稀后的轨迹）"""
+
+    def __init__(self, port_widgets, colors, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("轨迹视图")
+        self.resize(900, 700)
+        self.port_widgets = port_widgets
+        self.colors = colors
+        self.curves = {}  # 串口序号 -> 折线
+        self.scatters = {}  # 串口序号 -> 网格点
+        self.track_versions = {}
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.setBackground('w')
+        self.plot_widget.setLabel('left', '纬度（°）')
+        self.plot_widget.setLabel('bottom', '经度（°）')
+        self.plot_widget.setAspectLocked(True)
+        self.plot_widget.addLegend()
+        layout.addWidget(self.plot_widget)
+
+        btn_layout = QHBoxLayout()
+        self.grid_check = QCheckBox("显示网格点")
+        self.grid_check.stateChanged.connect(self.refresh_tracks)
+        btn_layout.addWidget(self.grid_check)
+
+        self.info_label = QLabel("")
+        btn_layout.addWidget(self.info_label, stretch=1)
+
+        self.export_btn = QPushButton("导出HTML")
+        self.export_btn.clicked.connect(self.export_html)
+        btn_layout.addWidget(self.export_btn)
+        layout.addLayout(btn_layout)
+
+        self.update_timer = QTimer()
+        self.update_timer.timeout.connect(self.refresh_tracks)
+        self.update_timer.start(1000)  # 每秒更新一次
+        self.refresh_tracks()
+
+    def refresh_tracks(self):
+        """仅重绘有变化的轨迹"""
+        if not self.isVisible():
+            return
+
+        show_grid = self.grid_check.isChecked()
+        info = []
+        for i, widget in enumerate(self.port_widgets):
+            port_num = i + 1
+            track = widget.track
+            key = (track.version, show_grid)
+            if self.track_versions.get(port_num) == key:
+                if track.total_points:
+                    info.append(f"串口{port_num}: {len(track.simplifier.points)}/{track.total_points}")
+                continue
+            self.track_versions[port_num] = key
+
+            lons, lats = track.polyline()
+            color = self.colors[i % len(self.colors)]
+            if port_num not in self.curves:
+                self.curves[port_num] = self.plot_widget.plot(
+                    [], [], name=f"串口{port_num}", pen=pg.mkPen(color=color, width=2))
+            self.curves[port_num].setData(lons, lats)
+
+            if show_grid:
+                grid_lats, grid_lons, _ = track.grid.points()
+                if port_num not in self.scatters:
+                    self.scatters[port_num] = pg.ScatterPlotItem(
+                        size=4, pen=None, brush=pg.mkBrush(color))
+                    self.plot_widget.addItem(self.scatters[port_num])
+                self.scatters[port_num].setData(grid_lons, grid_lats)
+            elif port_num in self.scatters:
+                self.plot_widget.removeItem(self.scatters.pop(port_num))
+
+            if track.total_points:
+                info.append(f"串口{port_num}: {len(track.simplifier.points)}/{track.total_points}")
+
+        self.info_label.setText("  ".join(info) if info else "无轨迹数据")
+
+    def export_html(self):
+        """导出抽稀后的轨迹为离线HTML地图"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "导出轨迹",
+            f"track_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html",
+            "HTML Files (*.html);;All Files (*)"
+        )
+        if not file_path:
+            return
+
+        tracks = {}
+        colors = {}
+        for i, widget in enumerate(self.port_widgets):
+            name = f"串口{i + 1}"
+            tracks[name] = widget.track
+            colors[name] = self.colors[i % len(self.colors)]
+        try:
+            count = export_tracks_html(tracks, file_path, colors)
+            QMessageBox.information(self, "成功", f"已导出{count}条轨迹")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导出失败: {str(e)}")
+
+    def closeEvent(self, event):
+        self.update_timer.stop()
+        event.accept()
+
+
+class FixStatsWindow(QMainWindow):
+    """定位质量统计窗口（每列一个串口）"""
+
+    # (显示名称, 统计键, 格式)
+    ROWS = [
+        ('定位样本数', 'count', '{}'),
+        ('定位可用率(%)', 'availability', '{:.1f}'),
+        ('首次定位时间(s)', 'ttff', '{:.2f}'),
+        ('平均纬度', 'mean_lat', '{:.7f}'),
+        ('平均经度', 'mean_lon', '{:.7f}'),
+        ('平均海拔(m)', 'mean_alt', '{:.2f}'),
+        ('海拔标准差(m)', 'std_alt', '{:.3f}'),
+        ('CEP50(m)', 'cep50', '{:.3f}'),
+        ('CEP95(m)', 'cep95', '{:.3f}'),
+        ('2DRMS(m)', 'drms2', '{:.3f}'),
+        ('平均HDOP', 'hdop_mean', '{:.2f}'),
+        ('HDOP常见区间', 'hdop_max_bin', '{}'),
+        ('平均卫星数', 'sat_mean', '{:.1f}'),
+        ('卫星数范围', 'sat_range', '{}'),
+        ('定位质量分布', 'quality', '{}'),
+        ('统计时长(s)', 'duration', '{:.0f}'),
+    ]
+
+    def __init__(self, fix_stats: FixStatistics, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("定位统计")
+        self.resize(1000, 520)
+        self.fix_stats = fix_stats
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+
+        ports = sorted(fix_stats.ports)
+        self.table = QTableWidget(len(self.ROWS), len(ports))
+        self.table.setVerticalHeaderLabels([name for name, _, _ in self.ROWS])
+        self.table.setHorizontalHeaderLabels([f"串口{i}" for i in ports])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        btn_layout = QHBoxLayout()
+        tip = QLabel("CEP相对平均位置统计；首次定位时间从复位后收到第一条语句算起")
+        btn_layout.addWidget(tip, stretch=1)
+        self.reset_btn = QPushButton("复位")
+        self.reset_btn.clicked.connect(self.reset_stats)
+        btn_layout.addWidget(self.reset_btn)
+        self.export_btn = QPushButton("导出CSV")
+        self.export_btn.clicked.connect(self.export_csv)
+        btn_layout.addWidget(self.export_btn)
+        layout.addLayout(btn_layout)
+
+        self.update_timer = QTimer()
+        self.update_timer.timeout.connect(self.refresh_stats)
+
+    def showEvent(self, event):
+        self.update_timer.start(1000)  # 可见时每秒刷新
+        self.refresh_stats()
+        super().showEvent(event)
+
+    def closeEvent(self, event):
+        self.update_timer.stop()
+        event.accept()
+
+    def cell_texts(self):
+        """各串口的统计文本 {串口: [每行文本]}"""
+        texts = {}
+        for port, stats in sorted(self.fix_stats.ports.items()):
+            summary = stats.summary()
+            if summary['sat_min'] is not None:
+                summary['sat_range'] = f"{summary['sat_min']}-{summary['sat_max']}"
+            else:
+                summary['sat_range'] = None
+            summary['quality'] = "，".join(f"{q}:{n}" for q, n in summary['quality'].items()) or None
+            column = []
+            for _, key, fmt in self.ROWS:
+                value = summary.get(key)
+                column.append("-" if value is None else fmt.format(value))
+            texts[port] = column
+        return texts
+
+    def refresh_stats(self):
+        for col, column in enumerate(self.cell_texts().values()):
+            for row, text in enumerate(column):
+                item = self.table.item(row, col)
+                if item is None:
+                    item = QTableWidgetItem(text)
+                    item.setTextAlignment(Qt.AlignCenter)
+                    self.table.setItem(row, col, item)
+                elif item.text() != text:
+                    item.setText(text)
+
+    def reset_stats(self):
+        self.fix_stats.reset()
+        self.refresh_stats()
+
+    def export_csv(self):
+        """导出当前统计表"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "导出统计",
+            f"fix_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            "CSV Files (*.csv);;All Files (*)"
+        )
+        if not file_path:
+            return
+        texts = self.cell_texts()
+        try:
+            with open(file_path, 'w', encoding='utf-8-sig') as f:
+                f.write(",".join(["指标"] + [f"串口{port}" for port in texts]) + "\n")
+                for row, (name, _, _) in enumerate(self.ROWS):
+                    f.write(",".join([name] + [f'"{column[row]}"' for column in texts.values()]) + "\n")
+            QMessageBox.information(self, "成功", "统计导出成功")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导出失败: {str(e)}")
+
+
+class GeofenceWindow(QMainWindow):
+    """电子围栏与告警规则设置、告警记录"""
+
+    def __init__(self, engine: AlertEngine, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("围栏告警")
+        self.resize(900, 560)
+        self.engine = engine
+        self.shown_count = 0  # 已显示到表格中的告警事件数
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+
+        # 围栏文件
+        fence_layout = QHBoxLayout()
+        self.fence_label = QLabel("未加载围栏")
+        fence_layout.addWidget(self.fence_label, stretch=1)
+        self.load_btn = QPushButton("加载GeoJSON")
+        self.load_btn.clicked.connect(self.load_fences)
+        fence_layout.addWidget(self.load_btn)
+        self.clear_btn = QPushButton("清除围栏")
+        self.clear_btn.clicked.connect(self.clear_fences)
+        fence_layout.addWidget(self.clear_btn)
+        layout.addLayout(fence_layout)
+
+        # 规则参数（修改立即生效）
+        config = engine.config
+        rule_layout = QHBoxLayout()
+        self.fix_lost_check = QCheckBox("失锁")
+        self.fix_lost_check.setChecked(config.fix_lost)
+        self.fix_lost_check.stateChanged.connect(self.apply_rules)
+        rule_layout.addWidget(self.fix_lost_check)
+        self.fence_check = QCheckBox("围栏")
+        self.fence_check.setChecked(config.fences)
+        self.fence_check.stateChanged.connect(self.apply_rules)
+        rule_layout.addWidget(self.fence_check)
+        rule_layout.addWidget(QLabel("限速(km/h):"))
+        self.speed_spin = QSpinBox()
+        self.speed_spin.setRange(0, 1000)
+        self.speed_spin.setSpecialValueText("不限")
+        self.speed_spin.setValue(int(config.speed_limit_kmh))
+        self.speed_spin.valueChanged.connect(self.apply_rules)
+        rule_layout.addWidget(self.speed_spin)
+        rule_layout.addWidget(QLabel("最少卫星数:"))
+        self.sat_spin = QSpinBox()
+        self.sat_spin.setRange(0, 64)
+        self.sat_spin.setSpecialValueText("不限")
+        self.sat_spin.setValue(config.min_satellites)
+        self.sat_spin.valueChanged.connect(self.apply_rules)
+        rule_layout.addWidget(self.sat_spin)
+        rule_layout.addWidget(QLabel("去抖(s):"))
+        self.debounce_spin = QSpinBox()
+        self.debounce_spin.setRange(0, 60)
+        self.debounce_spin.setValue(int(config.debounce_s))
+        self.debounce_spin.valueChanged.connect(self.apply_rules)
+        rule_layout.addWidget(self.debounce_spin)
+        rule_layout.addStretch()
+        layout.addLayout(rule_layout)
+
+        self.active_label = QLabel("")
+        layout.addWidget(self.active_label)
+
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["时间", "串口", "规则", "事件", "说明"])
+        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        btn_layout = QHBoxLayout()
+        self.stats_label = QLabel("")
+        btn_layout.addWidget(self.stats_label, stretch=1)
+        self.reset_btn = QPushButton("复位")
+        self.reset_btn.clicked.connect(self.reset_alerts)
+        btn_layout.addWidget(self.reset_btn)
+        layout.addLayout(btn_layout)
+
+        self.update_timer = QTimer()
+        self.update_timer.timeout.connect(self.refresh_alerts)
+
+    def showEvent(self, event):
+        self.update_timer.start(1000)  # 可见时每秒刷新
+        self.refresh_alerts()
+        super().showEvent(event)
+
+    def closeEvent(self, event):
+        self.update_timer.stop()
+        event.accept()
+
+    def apply_rules(self):
+        config = self.engine.config
+        config.fix_lost = self.fix_lost_check.isChecked()
+        config.fences = self.fence_check.isChecked()
+        config.speed_limit_kmh = self.speed_spin.value()
+        config.min_satellites = self.sat_spin.value()
+        config.debounce_s = config.clear_s = self.debounce_spin.value()
+
+    def load_fences(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "加载围栏", "", "GeoJSON Files (*.geojson *.json);;All Files (*)")
+        if not file_path:
+            return
+        try:
+            fences = load_geojson(file_path)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"围栏加载失败: {str(e)}")
+            return
+        self.engine.set_fences(fences)
+        self.fence_label.setText(f"{os.path.basename(file_path)}：{len(fences)} 个围栏")
+        self.refresh_alerts()
+
+    def clear_fences(self):
+        self.engine.set_fences([])
+        self.fence_label.setText("未加载围栏")
+
+    def refresh_alerts(self):
+        engine = self.engine
+        new = min(engine.alert_count - self.shown_count, len(engine.alerts))
+        self.shown_count = engine.alert_count
+        if new > 0:
+            for alert in list(engine.alerts)[-new:]:
+                row = self.table.rowCount()
+                self.table.insertRow(row)
+                values = [datetime.fromtimestamp(alert.time).strftime('%H:%M:%S.%f')[:-3], f"串口{alert.port}",
+                          alert.rule, "触发" if alert.raised else "恢复", alert.message]
+                for col, text in enumerate(values):
+                    self.table.setItem(row, col, QTableWidgetItem(text))
+            # 表格只保留最近的告警
+            while self.table.rowCount() > engine.alerts.maxlen:
+                self.table.removeRow(0)
+            self.table.scrollToBottom()
+        active = engine.active_alerts()
+        self.active_label.setText("当前告警: " + ("；".join(f"串口{port} {detail}" for port, _, detail in active)
+                                                  if active else "无"))
+        self.active_label.setStyleSheet("color: #e53935;" if active else "")
+        self.stats_label.setText(engine.stats_text())
+
+    def reset_alerts(self):
+        self.engine.reset()
+        self.table.setRowCount(0)
+        self.shown_count = self.engine.alert_count
+        self.refresh_alerts()
+
+
 class SerialReceiverApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("多串口数据接收器")
         self.resize(1600, 1200)  # 调整窗口大小
 
+        # 定义颜色列表（曲线图与轨迹视图共用）
+        self.colors = ['#FF0000', '#00FF00', '#0000FF', '#FFA500', '#800080', '#008080', '#FF00FF', '#00FFFF']
+        self.track_window = None
+        self.stats_window = None
+        self.geofence_window = None
+        self.log_viewer = None
+
+        # 全局串口注册表：后台枚举 + 热插拔推送
+        self.port_registry = PortRegistry()
+
+        # 本次会话的磁盘定位历史；所有接收线程共用一个时钟锚点，重连后写入历史的时间不会倒退
+        session = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.fix_history = FixHistory(os.path.join("serial_logs", "history", session))
+        self.clock_anchor = ClockAnchor()
+
+        # 日志目录维护：后台压缩已关闭的分段，总量超过20GB或超过30天的旧日志自动清理，
+        # 磁盘剩余不足1GB时暂停写入并优先清理最旧的日志
+        self.log_maintenance = LogMaintenance("serial_logs", RetentionPolicy(
+            max_total_bytes=20 * 1024 ** 3, max_age_days=30, min_free_bytes=1024 ** 3))
+        self.log_maintenance.start()
+
+        # 界面刷新调度器：合并所有串口的界面更新，每帧有时间预算
+        self.refresh_scheduler = RefreshScheduler(frame_interval_ms=50, frame_budget_ms=8.0, parent=self)
+
+        # 全局内存预算（所有串口缓冲区共享）
+        self.memory_budget = MemoryBudget(256 * 1024 * 1024)
+
+        # 多接收机对比：按NMEA UTC时间对齐各串口
+        self.aligner = EpochAligner(max_ports=8, reference=1)
+
+        # 定位质量增量统计（每个定位结果O(1)更新）
+        self.fix_stats = FixStatistics(max_ports=8)
+
+        # 电子围栏与告警规则（每个解析结果评估，告警记录到日志目录）
+        self.alert_engine = AlertEngine(log_path=os.path.join("serial_logs", "alerts.csv"))
+
+        # 输出延迟与主机时钟偏差测量（勾选"延迟测量"后才采样）
+        self.latency_monitor = LatencyMonitor(max_ports=8)
 
         # 创建界面
         self.init_ui()
@@ -636,6 +1500,59 @@ class SerialReceiverApp(QMainWindow):
         self.refresh_btn.clicked.connect(self.refresh_all)
         control_layout.addWidget(self.refresh_btn)
 
+        self.track_btn = QPushButton("轨迹视图")
+        self.track_btn.setFixedWidth(100)
+        self.track_btn.clicked.connect(self.show_track_view)
+        control_layout.addWidget(self.track_btn)
+
+        self.stats_btn = QPushButton("定位统计")
+        self.stats_btn.setFixedWidth(100)
+        self.stats_btn.clicked.connect(self.show_fix_stats)
+        control_layout.addWidget(self.stats_btn)
+
+        self.geofence_btn = QPushButton("围栏告警")
+        self.geofence_btn.setFixedWidth(100)
+        self.geofence_btn.clicked.connect(self.show_geofence)
+        control_layout.addWidget(self.geofence_btn)
+
+        self.log_viewer_btn = QPushButton("日志查看")
+        self.log_viewer_btn.setFixedWidth(100)
+        self.log_viewer_btn.clicked.connect(self.show_log_viewer)
+        control_layout.addWidget(self.log_viewer_btn)
+
+        # 日志每行前记录接收时间戳（对所有串口生效）
+        self.log_timestamp_check = QCheckBox("日志时间戳")
+        self.log_timestamp_check.setToolTip("在日志每行行首写入数据的实际到达时间")
+        self.log_timestamp_check.stateChanged.connect(self.toggle_log_timestamps)
+        control_layout.addWidget(self.log_timestamp_check)
+
+        # 本机转发服务：TCP 10110起（串口n用10110+n-1），可选同端口UDP
+        self.fanout_server = None
+        self.fanout_check = QCheckBox("转发服务")
+        self.fanout_check.setToolTip("通过本机TCP端口10110~10117转发各串口原始数据")
+        self.fanout_check.stateChanged.connect(self.toggle_fanout)
+        control_layout.addWidget(self.fanout_check)
+
+        self.fanout_udp_check = QCheckBox("UDP")
+        self.fanout_udp_check.setToolTip("同时以UDP发送到127.0.0.1的相同端口")
+        self.fanout_udp_check.stateChanged.connect(self.toggle_fanout_udp)
+        control_layout.addWidget(self.fanout_udp_check)
+
+        self.fanout_label = QLabel("")
+        control_layout.addWidget(self.fanout_label)
+
+        # 内存预算：总上限可调，显示当前占用（提示中按串口/缓冲区类型细分）
+        self.memory_cap_combo = QComboBox()
+        self.memory_cap_combo.setFixedWidth(80)
+        self.memory_cap_combo.addItems(['64MB', '128MB', '256MB', '512MB', '1024MB'])
+        self.memory_cap_combo.setCurrentText('256MB')
+        self.memory_cap_combo.setToolTip("所有串口缓冲区的内存上限")
+        self.memory_cap_combo.currentTextChanged.connect(self.change_memory_cap)
+        control_layout.addWidget(self.memory_cap_combo)
+
+        self.memory_label = QLabel("")
+        control_layout.addWidget(self.memory_label)
+
         first_row_layout.addWidget(control_group)
 
         # 标题区域 - 使用与数据行相同的布局
@@ -682,7 +1599,17 @@ class SerialReceiverApp(QMainWindow):
         # 创建8个串口控件（从1开始编号）
         self.port_widgets = []
         for i in range(1, 9):
-            port_widget = SerialPortWidget(i)
+            port_widget = SerialPortWidget(i, self.port_registry)
+            self.port_registry.ports_changed.connect(port_widget.on_ports_changed)
+            port_widget.fix_history = self.fix_history
+            port_widget.clock_anchor = self.clock_anchor
+            port_widget.log_maintenance = self.log_maintenance
+            port_widget.fix_callbacks.append(self.aligner.add)
+            port_widget.fix_callbacks.append(self.fix_stats.add)
+            port_widget.fix_callbacks.append(self.alert_engine.evaluate)
+            port_widget.fix_callbacks.append(self.latency_monitor.add)
+            port_widget.register_memory(self.memory_budget)
+            port_widget.attach_scheduler(self.refresh_scheduler)
             # 新增：监听串口状态变化信号
             port_widget.connection_state_changed.connect(self.update_port_select)
             self.port_widgets.append(port_widget)
@@ -716,10 +1643,35 @@ class SerialReceiverApp(QMainWindow):
         # 参数选择框
         self.param_combo = QComboBox()
         self.param_combo.setFixedWidth(150)
-        self.param_combo.addItems(['纬度', '经度', '速度(节)', '航向(°)', '卫星数', '海拔(m)'])
+        self.param_combo.addItems(['纬度', '经度', '速度(节)', '航向(°)', '卫星数', '海拔(m)',
+                                   '水平偏差(m)', '垂直偏差(m)', '输出延迟(ms)', '时钟偏差(ms)'])
         self.param_combo.currentIndexChanged.connect(self.update_plot)
         plot_control_layout.addWidget(self.param_combo)
 
+        # 对比基准串口（水平/垂直偏差相对该串口计算，按NMEA UTC时间对齐）
+        self.reference_combo = QComboBox()
+        self.reference_combo.setFixedWidth(90)
+        self.reference_combo.addItems([f"基准{i}" for i in range(1, 9)])
+        self.reference_combo.setToolTip("偏差计算的基准串口")
+        self.reference_combo.currentIndexChanged.connect(self.change_reference)
+        plot_control_layout.addWidget(self.reference_combo)
+
+        self.export_alignment_btn = QPushButton("导出对比")
+        self.export_alignment_btn.setFixedWidth(80)
+        self.export_alignment_btn.clicked.connect(self.export_alignment)
+        plot_control_layout.addWidget(self.export_alignment_btn)
+
+        # 延迟测量：NMEA UTC历元时间与主机接收时间配对
+        self.latency_check = QCheckBox("延迟测量")
+        self.latency_check.setToolTip("按历元UTC时间与主机接收时间估计输出延迟、抖动和主机时钟偏差")
+        self.latency_check.stateChanged.connect(self.toggle_latency)
+        plot_control_layout.addWidget(self.latency_check)
+
+        self.export_latency_btn = QPushButton("导出延迟")
+        self.export_latency_btn.setFixedWidth(80)
+        self.export_latency_btn.clicked.connect(self.export_latency)
+        plot_control_layout.addWidget(self.export_latency_btn)
+
         # 串口勾选框组 - 直接初始化8个勾选框
         self.port_checkbox_container = QWidget()
         self.port_checkbox_layout = QHBoxLayout(self.port_checkbox_container)
@@ -739,23 +1691,63 @@ class SerialReceiverApp(QMainWindow):
         
         plot_control_layout.addWidget(self.port_checkbox_container)
 
+        # 全程历史模式：按当前可视时间窗口从磁盘历史惰性读取
+        self.history_check = QCheckBox("全程历史")
+        self.history_check.setToolTip("从磁盘历史读取整个会话，可缩放/平移浏览")
+        self.history_check.stateChanged.connect(self.toggle_history_mode)
+        plot_control_layout.addWidget(self.history_check)
+        plot_control_layout.addStretch()
+
         main_layout.addWidget(plot_control_container)
         main_layout.addWidget(self.plot_widget)
 
 
         self.setCentralWidget(main_widget)
 
+        # 内存预算定时器：统计、裁剪并刷新显示
+        self.memory_timer = QTimer()
+        self.memory_timer.timeout.connect(self.update_memory)
+        self.memory_timer.start(1000)
+
+        # 转发统计定时器（开启转发服务时运行）
+        self.fanout_timer = QTimer()
+        self.fanout_timer.timeout.connect(self.update_fanout_stats)
+
         # 设置定时器更新绘图
+        # 绘图区隐藏（最小化等）时不重绘，重新可见后再刷新
+        self.refresh_scheduler.register('plot', self.update_plot, self.plot_widget)
+        self.plot_ticks = 0
         self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.update_plot)
+        self.update_timer.timeout.connect(self.request_plot_refresh)
         self.update_timer.start(1000)  # 每秒更新一次
 
+        # 刷新调度统计显示在状态栏
+        self.refresh_label = QLabel("")
+        self.statusBar().addPermanentWidget(self.refresh_label)
+
+        # 日志目录状态（总量、磁盘剩余、压缩与清理统计）
+        self.log_label = QLabel("")
+        self.statusBar().addPermanentWidget(self.log_label)
+        self.memory_timer.timeout.connect(self.update_log_status)
+
+        # 当前告警数（详情见围栏告警窗口）
+        self.alert_label = QLabel("")
+        self.statusBar().addPermanentWidget(self.alert_label)
+        self.memory_timer.timeout.connect(self.update_alert_status)
+
+        # 启动串口注册表（首次枚举结果到达后推送给所有控件）
+        self.port_registry.start()
+
         # 初始化串口选择框
         self.update_port_select()
         self.plot_widget.hide()
 
+    def has_history(self, widget) -> bool:
+        """该串口控件在本次会话中是否写过磁盘历史"""
+        return widget.history_port is not None and self.fix_history.time_range(widget.history_port) is not None
+
     def update_port_select(self):
-        """更新串口勾选框（保留已勾选状态，移除断开连接的串口勾选框）"""
+        """更新串口勾选框（保留已勾选状态；断开且没有会话历史的串口移除勾选框）"""
         # 记录当前已存在的勾选框索引和勾选状态
         existing_checkboxes = {index: checkbox.isChecked() for index, checkbox in self.port_checkboxes.items()}
     
@@ -766,22 +1758,29 @@ class SerialReceiverApp(QMainWindow):
         # 获取当前所有已连接的串口索引
         connected_ports = [i for i, widget in enumerate(self.port_widgets, start=1) 
                           if widget.serial_receiver and widget.serial_receiver.is_connected]
+        # 已断开但有会话历史的串口保留勾选框，可在全程历史模式下回看
+        history_ports = [i for i, widget in enumerate(self.port_widgets, start=1)
+                         if i not in connected_ports and self.has_history(widget)]
+        shown_ports = sorted(connected_ports + history_ports)
 
-        # 移除已断开连接的串口对应的勾选框
+        # 移除已断开连接且没有历史的串口对应的勾选框
         for index in list(self.port_checkboxes.keys()):
-            if index not in connected_ports:
+            if index not in shown_ports:
                 self.port_checkbox_layout.removeWidget(self.port_checkboxes[index])
                 self.port_checkboxes[index].setParent(None)
                 del self.port_checkboxes[index]
     
         # 添加新连接的串口勾选框（仅添加不存在的）
-        for port_index in connected_ports:
+        for port_index in shown_ports:
             if port_index not in self.port_checkboxes:
                 checkbox = QCheckBox(f"串口{port_index}")
                 checkbox.setChecked(False)  # 新添加默认未勾选
                 checkbox.stateChanged.connect(self.update_plot)
                 self.port_checkboxes[port_index] = checkbox
                 self.port_checkbox_layout.addWidget(checkbox)
+            checkbox = self.port_checkboxes[port_index]
+            checkbox.setText(f"串口{port_index}" + ("（历史）" if port_index in history_ports else ""))
+            checkbox.setToolTip("已断开，勾选“全程历史”可回看" if port_index in history_ports else "")
     
         # 恢复原有勾选框的勾选状态
         for index, checkbox in self.port_checkboxes.items():
@@ -789,22 +1788,245 @@ class SerialReceiverApp(QMainWindow):
                 checkbox.setChecked(existing_checkboxes[index])
     
         # 处理无连接串口的提示
-        if not connected_ports:
+        if not shown_ports:
             self.no_ports_label = QLabel("无连接的串口")
             self.port_checkbox_layout.addWidget(self.no_ports_label)
             
         self.update_plot()
 
     def refresh_all(self):
+        # 请求后台立即重新枚举，变化会通过ports_changed推送；这里先用缓存刷新
+        self.port_registry.refresh()
         for widget in self.port_widgets:
             widget.refresh_ports()
         self.update_port_select()
 
+    def toggle_history_mode(self, state):
+        """切换全程历史模式：开启时显示整个会话，之后保持用户的缩放/平移"""
+        view_box = self.plot_widget.getViewBox()
+        if state == Qt.Checked:
+            self.fix_history.flush()
+            ranges = []
+            for port_num, checkbox in self.port_checkboxes.items():
+                widget = self.port_widgets[port_num - 1]
+                if checkbox.isChecked() and widget.history_port:
+                    time_range = self.fix_history.time_range(widget.history_port)
+                    if time_range:
+                        ranges.append(time_range)
+            if ranges:
+                view_box.setXRange(min(r[0] for r in ranges), max(r[1] for r in ranges), padding=0.02)
+            view_box.disableAutoRange(axis=pg.ViewBox.XAxis)
+        else:
+            view_box.enableAutoRange(axis=pg.ViewBox.XAxis)
+        self.update_plot()
+
+    def query_history(self, port: str, t0: float, t1: float):
+        """按可视窗口读取历史，步长使点数不超过绘图上限"""
+        max_points = self.port_widgets[0].max_plot_points * 2
+        stride = max(1, self.fix_history.count(port, t0, t1) // max_points)
+        return self.fix_history.query(port, t0, t1, stride)
+
+    def change_reference(self, index: int):
+        """切换对比基准串口（清空已对齐结果）"""
+        self.aligner.set_reference(index + 1)
+        self.update_plot()
+
+    def export_alignment(self):
+        """导出按UTC时间对齐的各串口偏差"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "导出对比结果",
+            f"alignment_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            "CSV Files (*.csv);;All Files (*)"
+        )
+        if not file_path:
+            return
+        try:
+            count = self.aligner.export_csv(file_path)
+            QMessageBox.information(self, "成功", f"已导出{count}个历元")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导出失败: {str(e)}")
+
+    def toggle_latency(self, state):
+        """开启/关闭延迟测量（开启时清空旧样本）"""
+        self.latency_monitor.set_enabled(state == Qt.Checked)
+        if state == Qt.Checked and self.param_combo.currentText() not in ('输出延迟(ms)', '时钟偏差(ms)'):
+            self.param_combo.setCurrentText('输出延迟(ms)')
+        self.update_plot()
+
+    def export_latency(self):
+        """导出延迟样本和各串口估计结果"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "导出延迟测量",
+            f"latency_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            "CSV Files (*.csv);;All Files (*)"
+        )
+        if not file_path:
+            return
+        try:
+            count = self.latency_monitor.export_csv(file_path)
+            QMessageBox.information(self, "成功", f"已导出{count}个样本")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导出失败: {str(e)}")
+
+    def closeEvent(self, event):
+        """关闭：先停所有定时器，所有串口和后台服务同时停止、共用一个时限，最后落盘定位历史"""
+        for timer in (self.memory_timer, self.fanout_timer, self.update_timer, self.refresh_scheduler.timer):
+            timer.stop()
+        for window in (self.stats_window, self.geofence_window, self.track_window, self.log_viewer):
+            if window is not None:
+                window.close()
+
+        coordinator = ShutdownCoordinator(deadline_s=3.0)
+        for widget in self.port_widgets:
+            widget.update_timer.stop()
+            if getattr(widget, 'detail_window', None) is not None:
+                widget.detail_window.close()
+            receiver, writer = widget.release_for_shutdown()
+            coordinator.add_port(widget.port_index, receiver, writer)
+        coordinator.add_service("串口枚举", lambda timeout: self.port_registry.stop(int(timeout * 1000))
+                                or not self.port_registry.isRunning())
+        if self.fanout_server is not None:
+            coordinator.add_service("转发服务", self.fanout_server.stop)
+        coordinator.add_service("日志维护", self.log_maintenance.stop, after_ports=True)
+        coordinator.run()
+        self.fix_history.close()
+        print(coordinator.report())
+        event.accept()
+
+    def toggle_fanout(self, state):
+        """开启/关闭本机转发服务"""
+        if state == Qt.Checked:
+            self.fanout_server = FanoutServer()
+            self.fanout_server.start()
+            for widget in self.port_widgets:
+                widget.attach_fanout(self.fanout_server)
+            self.fanout_timer.start(1000)
+        else:
+            for widget in self.port_widgets:
+                widget.detach_fanout()
+                widget.fanout_server = None
+            if self.fanout_server is not None:
+                self.fanout_server.stop()
+                self.fanout_server = None
+            self.fanout_timer.stop()
+            self.fanout_label.setText("")
+        self.update_fanout_stats()
+
+    def toggle_fanout_udp(self, state):
+        """切换UDP转发（对已开启的转发流立即生效）"""
+        for widget in self.port_widgets:
+            widget.fanout_udp = (state == Qt.Checked)
+            if self.fanout_server is not None:
+                port = widget.fanout_base_port + widget.port_index - 1
+                self.fanout_server.set_udp_target(widget.port_index, ('127.0.0.1', port) if widget.fanout_udp else None)
+
+    def update_fanout_stats(self):
+        """刷新转发服务的客户端数和吞吐量"""
+        if self.fanout_server is None:
+            self.fanout_label.setToolTip("")
+            return
+        stats = self.fanout_server.stats()
+        total_clients = sum(len(s['clients']) for s in stats.values())
+        total_rate = sum(c['rate'] for s in stats.values() for c in s['clients'])
+        self.fanout_label.setText(f"{total_clients}客户端 {total_rate / 1024:.1f}KB/s")
+        lines = []
+        for key, stream in sorted(stats.items()):
+            lines.append(f"串口{key}: TCP {stream['tcp_port']}，已发布 {stream['bytes_published'] // 1024} KB")
+            for client in stream['clients']:
+                lines.append(
+                    f"    {client['address']}: {client['rate'] / 1024:.1f} KB/s，"
+                    f"已发送 {client['bytes_sent'] // 1024} KB，丢弃 {client['bytes_dropped'] // 1024} KB"
+                )
+        self.fanout_label.setToolTip("\n".join(lines) if lines else "无转发流")
+
+    def request_plot_refresh(self):
+        """请求重绘曲线，并更新刷新调度统计；有串口处于精简/最低级别时降低重绘频率"""
+        self.plot_ticks += 1
+        level = max(widget.shed_level for widget in self.port_widgets)
+        if self.plot_ticks % (1, 1, 3, 5)[level] == 0:
+            self.refresh_scheduler.mark_dirty('plot')
+        scheduler = self.refresh_scheduler
+        self.refresh_label.setText(f"刷新 {scheduler.last_frame_ms:.1f} ms / 超预算 {scheduler.missed_budgets}")
+        self.refresh_label.setToolTip(scheduler.stats_text())
+
+    def update_log_status(self):
+        """刷新日志目录状态"""
+        free = self.log_maintenance.free_bytes()
+        self.log_label.setText(f"磁盘剩余 {free / 1073741824:.1f} GB")
+        self.log_label.setToolTip(self.log_maintenance.stats_text())
+
+    def update_alert_status(self):
+        """刷新状态栏的告警数"""
+        active = self.alert_engine.active_alerts()
+        self.alert_label.setText(f"告警 {len(active)}" if active else "")
+        self.alert_label.setStyleSheet("color: #e53935;" if active else "")
+        self.alert_label.setToolTip("\n".join(f"串口{port}: {detail}" for port, _, detail in active))
+
+    def change_memory_cap(self, text: str):
+        """修改内存总上限（立即生效）"""
+        self.memory_budget.total_cap = int(text.replace('MB', '')) * 1024 * 1024
+        self.update_memory()
+
+    def update_memory(self):
+        """执行内存预算并刷新各串口的内存占用显示"""
+        budget = self.memory_budget
+        budget.enforce()
+        usage = budget.usage_by_port()
+        lines = []
+        for widget in self.port_widgets:
+            port_usage = usage.get(widget.port_index, {})
+            widget.memory_bytes = sum(port_usage.values())
+            widget.request_refresh('size')
+            if widget.memory_bytes:
+                detail = "，".join(f"{kind} {size // 1024} KB" for kind, size in port_usage.items() if size)
+                lines.append(f"串口{widget.port_index}: {widget.memory_bytes // 1024} KB（{detail}）")
+        trimmed = sum(a.trimmed_bytes for a in budget.accounts)
+        lines.append(f"累计裁剪: {trimmed // 1024} KB（{budget.trim_count}次）")
+        self.memory_label.setText(f"内存 {budget.total / 1048576:.1f}/{budget.total_cap // 1048576} MB")
+        self.memory_label.setToolTip("\n".join(lines))
+
+    def toggle_log_timestamps(self, state):
+        """切换所有串口日志的接收时间戳"""
+        for widget in self.port_widgets:
+            widget.set_log_timestamps(state == Qt.Checked)
+
+    def show_fix_stats(self):
+        """显示定位质量统计窗口"""
+        if self.stats_window is None:
+            self.stats_window = FixStatsWindow(self.fix_stats, self)
+        self.stats_window.show()
+        self.stats_window.raise_()
+
+    def show_geofence(self):
+        """显示围栏告警窗口"""
+        if self.geofence_window is None:
+            self.geofence_window = GeofenceWindow(self.alert_engine, self)
+        self.geofence_window.show()
+        self.geofence_window.raise_()
+
+    def show_log_viewer(self):
+        """显示日志查看窗口（未打开文件时先选择日志）"""
+        if self.log_viewer is None:
+            self.log_viewer = LogViewerWindow(parent=self)
+        self.log_viewer.show()
+        self.log_viewer.raise_()
+        if self.log_viewer.log_file is None:
+            self.log_viewer.choose_file()
+
+    def show_track_view(self):
+        """显示轨迹视图窗口"""
+        if self.track_window is None:
+            self.track_window = TrackViewWindow(self.port_widgets, self.colors, self)
+        self.track_window.show()
+        self.track_window.raise_()
+        self.track_window.refresh_tracks()
+
     def clear_all(self):
         for widget in self.port_widgets:
-            widget.data_buffer = ""
-            widget.parsed_data_buffer = ""
-            widget.file_write_buffer = ""
+            widget.data_buffer.clear()
+            widget.clear_parsed_results()
             widget.data_size_label.setText("0KB")
             for value in widget.data_values.values():
                 value.setText("-")
@@ -823,25 +2045,49 @@ class SerialReceiverApp(QMainWindow):
             '速度(节)': 'speed',
             '航向(°)': 'course',
             '卫星数': 'satellites',
-            '海拔(m)': 'altitude'
+            '海拔(m)': 'altitude',
+            '水平偏差(m)': 'h_offset',
+            '垂直偏差(m)': 'v_offset',
+            '输出延迟(ms)': 'delay',
+            '时钟偏差(ms)': 'offset'
         }
         
         param_key = param_map.get(selected_param)
+        aligned = param_key in ('h_offset', 'v_offset')  # 对齐偏差以NMEA UTC时间为横轴
+        latency = param_key in ('delay', 'offset')  # 延迟测量以主机接收时间为横轴
 
         
-        # 定义颜色列表
-        colors = ['#FF0000', '#00FF00', '#0000FF', '#FFA500', '#800080', '#008080', '#FF00FF', '#00FFFF']
+        colors = self.colors
+
+        # 全程历史模式下使用当前可视范围（在clear之后范围保持不变）
+        history_range = None
+        if self.history_check.isChecked():
+            x_range = self.plot_widget.getViewBox().viewRange()[0]
+            history_range = (x_range[0], x_range[1])
         
         # 绘制每个选中的串口数据
         for i, widget in enumerate(self.port_widgets):
             port_num = i + 1
             if port_num in self.port_checkboxes and self.port_checkboxes[port_num].isChecked():
-                if widget.serial_receiver and widget.serial_receiver.is_connected:
+                connected = widget.serial_receiver and widget.serial_receiver.is_connected
+                # 全程历史按串口名从磁盘读取，断开后仍可回看；其余数据只在连接期间存在
+                from_history = history_range is not None and not aligned and not latency
+                if connected or (from_history and widget.history_port):
                     # 获取该串口的绘图数据
-                    time_data = widget.plot_data['time']
-                    param_data = widget.plot_data[param_key]
+                    if aligned:
+                        time_data, h_offset, v_offset = self.aligner.series(port_num)
+                        param_data = h_offset if param_key == 'h_offset' else v_offset
+                    elif latency:
+                        time_data, param_data = self.latency_monitor.ports[port_num].series(param_key)
+                    elif from_history:
+                        history = self.query_history(widget.history_port, *history_range)
+                        time_data = history['time']
+                        param_data = history[param_key]
+                    else:
+                        time_data = widget.plot_data['time']
+                        param_data = widget.plot_data[param_key]
                     
-                    if time_data and param_data:
+                    if len(time_data) and len(param_data):
                         # 新增：检查并截断数据长度，确保X和Y数组长度一致
                         min_len = min(len(time_data), len(param_data))
                         time_data = time_data[:min_len]  # 截断时间数据
@@ -855,7 +2101,16 @@ class SerialReceiverApp(QMainWindow):
         
         # 更新坐标轴标签
         self.plot_widget.setLabel('left', selected_param)
-        self.plot_widget.setLabel('bottom', '时间（秒）')
+        # 延迟测量的各串口估计结果显示在标题
+        if latency:
+            checked = {n for n, box in self.port_checkboxes.items() if box.isChecked()}
+            summary = self.latency_monitor.summary_text(checked)
+            if not self.latency_monitor.enabled:
+                summary = "未开启延迟测量"
+            self.plot_widget.setTitle(summary or "等待样本")
+        else:
+            self.plot_widget.setTitle(None)
+        self.plot_widget.setLabel('bottom', 'UTC时间（秒）' if aligned else '时间（秒）')
 
         # 新增：根据勾选状态控制绘图区域显示/隐藏
         has_checked = any(checkbox.isChecked() for checkbox in self.port_checkboxes.values())
@@ -0,0 +1,156 @@
+# memory_budget.py
+# 全局内存预算：统计每个串口各类缓冲区的实际字节数，超出总上限时按优先级裁剪（先历史、后实时）
+import sys
+from collections import deque
+
+# 裁剪优先级：数值越小越先被裁剪
+PRIORITY_HISTORY = 0  # 历史/派生数据（解析文本、绘图点）
+PRIORITY_LIVE = 1  # 实时原始数据（详情窗口用的原始缓冲区）
+PRIORITY_PINNED = 2  # 不可裁剪（待写入日志的数据），只统计
+
+
+def str_bytes(s: str) -> int:
+    """字符串实际占用的字节数（CPython按最大码位选择1/2/4字节每字符）"""
+    return sys.getsizeof(s)
+
+
+def float_list_bytes(values: list) -> int:
+    """浮点数列表占用的字节数（列表本身 + 每个float对象）"""
+    return sys.getsizeof(values) + len(values) * sys.getsizeof(0.0)
+
+
+class TextBuffer:
+    """按数据块保存的文本缓冲区：追加不复制已有内容，字节数增量统计；不设固定上限，由内存预算从头部裁剪"""
+
+    def __init__(self, merge_chars: int = 4096):
+        self.chunks = deque()
+        self.merge_chars = merge_chars  # 小于该长度的末尾数据块与新数据合并，减少对象数
+        self.nbytes = 0
+        self.chars = 0
+
+    def append(self, text: str):
+        if not text:
+            return
+        self.chars += len(text)
+        if self.chunks and len(self.chunks[-1]) < self.merge_chars:
+            last = self.chunks.pop()
+            self.nbytes -= str_bytes(last)
+            text = last + text
+        self.chunks.append(text)
+        self.nbytes += str_bytes(text)
+
+    def tail(self, max_chars: int) -> str:
+        """最后max_chars个字符（只拼接需要的数据块）"""
+        parts = []
+        count = 0
+        for chunk in reversed(self.chunks):
+            parts.append(chunk)
+            count += len(chunk)
+            if count >= max_chars:
+                break
+        text = ''.join(reversed(parts))
+        return text[-max_chars:] if len(text) > max_chars else text
+
+    def text(self) -> str:
+        return ''.join(self.chunks)
+
+    def trim(self, nbytes: int) -> int:
+        """从头部整块丢弃约nbytes字节，返回实际释放的字节数"""
+        freed = 0
+        while self.chunks and freed < nbytes:
+            chunk = self.chunks.popleft()
+            freed += str_bytes(chunk)
+            self.chars -= len(chunk)
+        self.nbytes -= freed
+        return freed
+
+    def clear(self):
+        self.chunks.clear()
+        self.nbytes = 0
+        self.chars = 0
+
+    def __len__(self):
+        return self.chars
+
+
+class BufferAccount:
+    """一个被预算管理的缓冲区"""
+
+    def __init__(self, port, kind: str, size_fn, trim_fn=None, priority: int = PRIORITY_HISTORY):
+        self.port = port
+        self.kind = kind  # 缓冲区类型名（用于显示）
+        self.size_fn = size_fn  # () -> 当前字节数
+        self.trim_fn = trim_fn  # (需要释放的字节数) -> 实际释放的字节数
+        self.priority = priority if trim_fn is not None else PRIORITY_PINNED
+        self.size = 0
+        self.trimmed_bytes = 0  # 累计被裁剪的字节数
+
+
+class MemoryBudget:
+    """所有串口缓冲区共享的内存预算"""
+
+    def __init__(self, total_cap: int = 256 * 1024 * 1024):
+        self.total_cap = total_cap
+        self.accounts = []
+        self.total = 0
+        self.trim_count = 0
+
+    def register(self, port, kind: str, size_fn, trim_fn=None, priority: int = PRIORITY_HISTORY):
+        account = BufferAccount(port, kind, size_fn, trim_fn, priority)
+        self.accounts.append(account)
+        return account
+
+    def unregister(self, port):
+        self.accounts = [a for a in self.accounts if a.port != port]
+
+    def measure(self) -> int:
+        """重新统计所有缓冲区的字节数，返回总量"""
+        total = 0
+        for account in self.accounts:
+            try:
+                account.size = account.size_fn()
+            except Exception:
+                account.size = 0
+            total += account.size
+        self.total = total
+        return total
+
+    def enforce(self) -> int:
+        """统计并在超出上限时裁剪，返回本次释放的字节数
+
+        裁剪到上限的90%留出余量；同一优先级内先裁剪最大的缓冲区，
+        历史数据全部裁完仍超限时才动实时数据，不可裁剪的缓冲区只统计。
+        """
+        total = self.measure()
+        if total <= self.total_cap:
+            return 0
+
+        target = int(self.total_cap * 0.9)
+        freed = 0
+        for priority in (PRIORITY_HISTORY, PRIORITY_LIVE):
+            candidates = sorted((a for a in self.accounts if a.priority == priority and a.size > 0),
+                                key=lambda a: a.size, reverse=True)
+            for account in candidates:
+                excess = total - freed - target
+                if excess <= 0:
+                    break
+                released = account.trim_fn(min(excess, account.size))
+                account.trimmed_bytes += released
+                freed += released
+            if total - freed <= target:
+                break
+
+        if freed:
+            self.trim_count += 1
+            self.measure()
+        return freed
+
+    def usage_by_port(self) -> dict:
+        """{串口: {缓冲区类型: 字节数}}（使用最近一次统计结果）"""
+        usage = {}
+        for account in self.accounts:
+            usage.setdefault(account.port, {})[account.kind] = account.size
+        return usage
+
+    def port_total(self, port) -> int:
+        return sum(a.size for a in self.accounts if a.port == port)
@@ -0,0 +1,583 @@
+# nmea_simulator.py
+# 虚拟GNSS设备群：在伪终端上模拟多台接收机输出NMEA（运动轨迹、卫星数/HDOP变化，可配置输出频率和波特率），
+# 支持故障注入（校验和错误、分段写入、突发、设备消失），并可在进程内用SerialReceiver接收做端到端负载测试
+#   python nmea_simulator.py farm -n 8 --rate 10 --baud 115200
+#       只运行设备，程序界面中直接输入打印出的路径即可连接（路径是指向伪终端的符号链接，设备"消失"后会重新出现）
+#   python nmea_simulator.py load -n 8 --seconds 60 --checksum 0.01 --split 0.1 --burst 0.01 --dropout 30
+#       用SerialReceiver连接全部设备，输出端到端时延、语句丢失和CPU占用报告
+import argparse
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tty
+from collections import deque
+from dataclasses import dataclass
+from functools import partial
+
+from track_view import EARTH_RADIUS
+
+
+def nmea_checksum(body: str) -> str:
+    """$与*之间内容的异或校验和（两位大写十六进制）"""
+    checksum = 0
+    for ch in body.encode('ascii', 'replace'):
+        checksum ^= ch
+    return f"{checksum:02X}"
+
+
+def checksum_ok(sentence: str) -> bool:
+    """语句校验和是否正确（没有校验和的语句视为错误）"""
+    start = sentence.find('$')
+    star = sentence.rfind('*')
+    if start < 0 or star < start:
+        return False
+    return sentence[star + 1:star + 3].upper() == nmea_checksum(sentence[start + 1:star])
+
+
+def format_lat(lat: float):
+    value = abs(lat)
+    degrees = int(value)
+    return f"{degrees:02d}{(value - degrees) * 60:08.5f}", 'N' if lat >= 0 else 'S'
+
+
+def format_lon(lon: float):
+    value = abs(lon)
+    degrees = int(value)
+    return f"{degrees:03d}{(value - degrees) * 60:08.5f}", 'E' if lon >= 0 else 'W'
+
+
+@dataclass
+class FaultConfig:
+    """故障注入参数"""
+    checksum_rate: float = 0.0  # 每条语句校验和错误的概率
+    split_rate: float = 0.0  # 每条语句被拆成多次写入（中间有停顿）的概率
+    burst_rate: float = 0.0  # 每个历元开始一次突发的概率：随后burst_epochs个历元攒在一起一次写出
+    burst_epochs: int = 10
+    dropout_interval: float = 0.0  # 设备消失的平均间隔（秒），0表示不消失
+    dropout_duration: float = 2.0  # 每次消失的时长（秒）
+
+
+class TrackModel:
+    """接收机运动与观测质量模型：速度/航向缓慢变化的随机行驶，卫星数随机游走，偶尔失锁"""
+
+    def __init__(self, lat: float, lon: float, rng: random.Random):
+        self.rng = rng
+        self.lat = lat
+        self.lon = lon
+        self.alt = rng.uniform(10, 80)
+        self.speed = rng.uniform(0, 15)  # 米/秒
+        self.course = rng.uniform(0, 360)
+        self.satellites = rng.randint(10, 20)
+        self.hdop = 0.8
+        self.quality = 1
+        self.outage = 0.0  # 剩余失锁时间（秒）
+
+    def step(self, dt: float):
+        rng = self.rng
+        self.speed = min(30.0, max(0.0, self.speed + rng.gauss(0, 0.5) * math.sqrt(dt)))
+        self.course = (self.course + rng.gauss(0, 5) * math.sqrt(dt)) % 360
+        distance = self.speed * dt
+        self.lat += math.degrees(distance * math.cos(math.radians(self.course)) / EARTH_RADIUS)
+        self.lon += math.degrees(distance * math.sin(math.radians(self.course))
+                                 / (EARTH_RADIUS * math.cos(math.radians(self.lat))))
+        self.alt += rng.gauss(0, 0.05)
+
+        if rng.random() < dt * 0.2:
+            self.satellites = min(24, max(4, self.satellites + rng.choice((-1, 1))))
+        self.hdop = round(max(0.5, 12.0 / self.satellites + rng.gauss(0, 0.05)), 2)
+        if rng.random() < dt * 0.01:
+            # 偶尔切换差分/RTK状态
+            self.quality = rng.choice((1, 1, 2, 4, 5))
+        if self.outage > 0:
+            self.outage -= dt
+        elif rng.random() < dt / 600:
+            self.outage = rng.uniform(2, 5)  # 平均10分钟失锁一次
+
+    @property
+    def fixed(self) -> bool:
+        return self.outage <= 0
+
+    def sentences(self, utc: float, kinds) -> list:
+        """生成一个历元的语句（不含结尾换行）"""
+        tm = time.gmtime(utc)
+        hhmmss = f"{tm.tm_hour:02d}{tm.tm_min:02d}{tm.tm_sec:02d}.{int(utc * 100) % 100:02d}"
+        ddmmyy = f"{tm.tm_mday:02d}{tm.tm_mon:02d}{tm.tm_year % 100:02d}"
+        lat, ns = format_lat(self.lat)
+        lon, ew = format_lon(self.lon)
+        fixed = self.fixed
+        bodies = []
+        for kind in kinds:
+            if kind == 'RMC':
+                if fixed:
+                    bodies.append(f"GNRMC,{hhmmss},A,{lat},{ns},{lon},{ew},{self.speed / 0.514444:.3f},"
+                                  f"{self.course:.2f},{ddmmyy},,,A")
+                else:
+                    bodies.append(f"GNRMC,{hhmmss},V,,,,,,,{ddmmyy},,,N")
+            elif kind == 'GGA':
+                if fixed:
+                    bodies.append(f"GNGGA,{hhmmss},{lat},{ns},{lon},{ew},{self.quality},{self.satellites:02d},"
+                                  f"{self.hdop:.2f},{self.alt:.3f},M,8.500,M,,")
+                else:
+                    bodies.append(f"GNGGA,{hhmmss},,,,,0,00,99.99,,,,,,")
+            elif kind == 'GSA':
+                prns = [f"{prn:02d}" for prn in range(1, min(self.satellites, 12) + 1)] if fixed else []
+                prns += [''] * (12 - len(prns))
+                pdop = self.hdop * 1.6
+                bodies.append(f"GNGSA,A,{3 if fixed else 1},{','.join(prns)},{pdop:.2f},{self.hdop:.2f},"
+                              f"{pdop * 0.8:.2f},1")
+            elif kind == 'ZDA':
+                bodies.append(f"GNZDA,{hhmmss},{tm.tm_mday:02d},{tm.tm_mon:02d},{tm.tm_year},00,00")
+        return [f"${body}*{nmea_checksum(body)}" for body in bodies]
+
+
+class SentLedger:
+    """已发送语句台账：按内容匹配接收端收到的语句，统计时延和丢失（线程安全）"""
+
+    def __init__(self, max_age: float = 5.0, max_samples: int = 200000):
+        self.max_age_ns = int(max_age * 1e9)  # 超过该时间仍未收到即记为丢失
+        self.pending = {}  # 语句 -> deque[发送时刻ns]（同样内容的语句可能发送多次，如GSA）
+        self.order = deque()  # (发送时刻ns, 语句)，用于按时间判定丢失
+        self.read_latency = deque(maxlen=max_samples)  # 读取时延（毫秒）：发送完成 -> 接收线程读到
+        self.delivery_latency = deque(maxlen=max_samples)  # 送达时延（毫秒）：发送完成 -> 界面线程收到
+        self.sent = 0
+        self.received = 0  # 收到且校验正确
+        self.corrupted_received = 0  # 收到但校验和错误（注入的故障被识别）
+        self.unexpected = 0  # 收到但不在台账中（截断拼接的残行、超时后才到达）
+        self.lost = 0
+        self._lock = threading.Lock()
+
+    def record(self, sentence: str, send_ns: int):
+        with self._lock:
+            self.sent += 1
+            self.pending.setdefault(sentence, deque()).append(send_ns)
+            self.order.append((send_ns, sentence))
+
+    def match(self, line: str, read_ns: int, deliver_ns: int):
+        """接收端收到一行"""
+        start = line.rfind('$')  # 去掉前导残行
+        sentence = line[start:] if start > 0 else line
+        with self._lock:
+            queue = self.pending.get(sentence)
+            if not queue:
+                self.unexpected += 1
+                return
+            # 同样内容发送多次时取读到之前最近的一次（更早的那次多半已丢失，留给expire结算）
+            i = len(queue) - 1
+            while i > 0 and queue[i] > read_ns:
+                i -= 1
+            send_ns = queue[i]
+            del queue[i]
+            if not queue:
+                del self.pending[sentence]
+            if not checksum_ok(sentence):
+                self.corrupted_received += 1
+                return
+            self.received += 1
+            self.read_latency.append((read_ns - send_ns) / 1e6)
+            self.delivery_latency.append((deliver_ns - send_ns) / 1e6)
+
+    def expire(self, now_ns: int = None):
+        """把超时未收到的语句记为丢失；now_ns为None时全部结算"""
+        with self._lock:
+            limit = None if now_ns is None else now_ns - self.max_age_ns
+            while self.order and (limit is None or self.order[0][0] < limit):
+                send_ns, sentence = self.order.popleft()
+                queue = self.pending.get(sentence)
+                if queue and queue[0] == send_ns:
+                    queue.popleft()
+                    if not queue:
+                        del self.pending[sentence]
+                    self.lost += 1
+
+
+class SimDevice(threading.Thread):
+    """一台虚拟接收机：伪终端主端写入NMEA，从端通过固定的符号链接路径提供给接收程序"""
+
+    def __init__(self, index: int, link_dir: str, rate_hz: float = 10, baudrate: int = 115200,
+                 kinds=('RMC', 'GGA', 'GSA'), faults: FaultConfig = None, seed: int = 0,
+                 origin=(31.2304, 121.4737), measure: bool = True):
+        super().__init__(daemon=True, name=f"nmea-sim-{index}")
+        self.index = index
+        self.path = os.path.join(link_dir, f"gnss{index}")
+        self.rate_hz = rate_hz
+        self.baudrate = baudrate
+        self.kinds = tuple(kinds)
+        self.faults = faults or FaultConfig()
+        self.rng = random.Random(seed * 1000 + index)
+        self.track = TrackModel(origin[0] + self.rng.uniform(-0.05, 0.05),
+                                origin[1] + self.rng.uniform(-0.05, 0.05), self.rng)
+        self.ledger = SentLedger() if measure else None  # 只运行设备时不需要台账
+        self.master_fd = None
+        self.slave_fd = None
+        self._stop_event = threading.Event()
+        self._line_free = 0.0  # 串口线路空闲的时刻（按波特率模拟发送耗时）
+
+        # 统计
+        self.epochs = 0
+        self.sent = 0  # 完整写出的语句数
+        self.skipped_epochs = 0  # 波特率不足以发完一个历元，被跳过的历元
+        self.corrupted = 0
+        self.splits = 0
+        self.bursts = 0
+        self.dropouts = 0
+        self.dropped_bytes = 0  # 伪终端缓冲区满（没有程序在读）时丢弃的字节
+        self.cpu_time = 0.0  # 本线程CPU时间（秒），线程结束时记录
+        self._open()
+
+    def _open(self):
+        master_fd, slave_fd = os.openpty()
+        tty.setraw(slave_fd)
+        # 非阻塞写入：没有程序读取时像真实串口一样丢数据，而不是卡住模拟器
+        os.set_blocking(master_fd, False)
+        self.master_fd, self.slave_fd = master_fd, slave_fd
+        temp = f"{self.path}.tmp"
+        if os.path.lexists(temp):
+            os.remove(temp)
+        os.symlink(os.ttyname(slave_fd), temp)
+        os.replace(temp, self.path)
+
+    def _close(self):
+        if os.path.lexists(self.path):
+            os.remove(self.path)
+        for fd in (self.master_fd, self.slave_fd):
+            if fd is not None:
+                os.close(fd)
+        self.master_fd = self.slave_fd = None
+
+    def _write(self, data: bytes) -> bool:
+        """写入伪终端，返回是否完整写入"""
+        try:
+            written = os.write(self.master_fd, data)
+        except BlockingIOError:
+            written = 0
+        except OSError:
+            written = 0
+        if written < len(data):
+            self.dropped_bytes += len(data) - written
+            return False
+        return True
+
+    def _send(self, sentence: str, paced: bool = True) -> bool:
+        """按波特率发送一条语句，发送完成（最后一个字节上线）后记入台账；返回是否应停止"""
+        faults = self.faults
+        if faults.checksum_rate and self.rng.random() < faults.checksum_rate:
+            # 改错校验和的最后一位
+            last = sentence[-1]
+            sentence = sentence[:-1] + ('0' if last != '0' else '1')
+            self.corrupted += 1
+        data = (sentence + '\r\n').encode('ascii')
+
+        if paced:
+            done = max(time.monotonic(), self._line_free) + len(data) * 10.0 / self.baudrate
+            self._line_free = done
+            if self._stop_event.wait(max(0.0, done - time.monotonic())):
+                return True
+
+        complete = True
+        if faults.split_rate and self.rng.random() < faults.split_rate:
+            # 拆成2~4段写入，段间停顿1~20毫秒（模拟USB转串口的分包）
+            self.splits += 1
+            cuts = sorted(self.rng.sample(range(1, len(data)), min(len(data) - 1, self.rng.randint(1, 3))))
+            pieces = [data[a:b] for a, b in zip([0] + cuts, cuts + [len(data)])]
+            for n, piece in enumerate(pieces):
+                if n and self._stop_event.wait(self.rng.uniform(0.001, 0.02)):
+                    return True
+                complete = self._write(piece) and complete
+        else:
+            complete = self._write(data)
+        if complete:
+            self.sent += 1
+            if self.ledger is not None:
+                self.ledger.record(sentence, time.monotonic_ns())
+        return False
+
+    def _vanish(self) -> bool:
+        """设备消失一段时间后重新出现（新的伪终端，同一路径），返回是否应停止"""
+        self.dropouts += 1
+        self._close()
+        if self._stop_event.wait(self.faults.dropout_duration):
+            return True
+        self._open()
+        return False
+
+    def _next_dropout(self) -> float:
+        if not self.faults.dropout_interval:
+            return math.inf
+        return time.monotonic() + self.rng.expovariate(1.0 / self.faults.dropout_interval)
+
+    def run(self):
+        interval = 1.0 / self.rate_hz
+        faults = self.faults
+        next_epoch = time.monotonic()
+        next_dropout = self._next_dropout()
+        held = []  # 突发期间攒下的语句
+        burst_left = 0
+        try:
+            while not self._stop_event.is_set():
+                if time.monotonic() >= next_dropout:
+                    if self._vanish():
+                        break
+                    held, burst_left = [], 0
+                    next_epoch = self._line_free = time.monotonic()
+                    next_dropout = self._next_dropout()
+                    continue
+                if self._stop_event.wait(max(0.0, next_epoch - time.monotonic())):
+                    break
+
+                # 历元时刻取整到输出间隔，UTC与墙上时间一致
+                utc = math.floor(time.time() / interval + 0.5) * interval
+                self.track.step(interval)
+                sentences = self.track.sentences(utc, self.kinds)
+                self.epochs += 1
+
+                if burst_left:
+                    held.extend(sentences)
+                    burst_left -= 1
+                    if not burst_left:
+                        # 攒下的数据一次性写出（不按波特率节流）
+                        for sentence in held:
+                            if self._send(sentence, paced=False):
+                                break
+                        held = []
+                elif faults.burst_rate and self.rng.random() < faults.burst_rate:
+                    self.bursts += 1
+                    held = list(sentences)
+                    burst_left = max(1, faults.burst_epochs - 1)
+                else:
+                    for sentence in sentences:
+                        if self._send(sentence):
+                            break
+
+                next_epoch += interval
+                lag = time.monotonic() - next_epoch
+                if lag > interval:
+                    # 线路带宽不够，跳过落后的历元（真实接收机同样会丢弃输出）
+                    skipped = int(lag / interval)
+                    self.skipped_epochs += skipped
+                    next_epoch += skipped * interval
+        finally:
+            self.cpu_time = time.thread_time()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class DeviceFarm:
+    """一组虚拟设备，符号链接放在同一目录下（gnss1、gnss2 ...）"""
+
+    def __init__(self, count: int, link_dir: str = None, rate_hz: float = 10, baudrate: int = 115200,
+                 kinds=('RMC', 'GGA', 'GSA'), faults: FaultConfig = None, seed: int = 0, measure: bool = True):
+        self.own_dir = link_dir is None
+        self.link_dir = link_dir or tempfile.mkdtemp(prefix='nmea_sim_')
+        os.makedirs(self.link_dir, exist_ok=True)
+        self.rate_hz = rate_hz
+        self.baudrate = baudrate
+        self.devices = [SimDevice(i + 1, self.link_dir, rate_hz, baudrate, kinds, faults, seed, measure=measure)
+                        for i in range(count)]
+        self.started = None
+
+    @property
+    def paths(self) -> list:
+        return [device.path for device in self.devices]
+
+    def start(self):
+        self.started = time.monotonic()
+        for device in self.devices:
+            device.start()
+
+    def stop(self):
+        """停止发送（伪终端保留，接收端不会因此断线）"""
+        for device in self.devices:
+            device.stop()
+        for device in self.devices:
+            if device.is_alive():
+                device.join(2.0)
+
+    def close(self):
+        """停止并删除全部伪终端和符号链接"""
+        self.stop()
+        for device in self.devices:
+            device._close()
+        if self.own_dir:
+            shutil.rmtree(self.link_dir, ignore_errors=True)
+
+    def cpu_time(self) -> float:
+        return sum(device.cpu_time for device in self.devices)
+
+
+def percentile(values, p: float):
+    if not values:
+        return None
+    data = sorted(values)
+    return data[min(len(data) - 1, int(round(p / 100 * (len(data) - 1))))]
+
+
+def _on_sentences(ledger: SentLedger, sentences: list):
+    deliver_ns = time.monotonic_ns()
+    for sentence in sentences:
+        ledger.match(sentence.text, sentence.mono_ns, deliver_ns)
+
+
+def run_load_test(farm: DeviceFarm, seconds: float) -> dict:
+    """用SerialReceiver（与程序中完全相同的接收链路）连接全部设备运行seconds秒，返回报告数据"""
+    from PyQt5.QtCore import QCoreApplication, QTimer
+    from serial_receiver import ReconnectPolicy, SerialConfig, SerialReceiver
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    receivers = []
+    for device in farm.devices:
+        receiver = SerialReceiver(SerialConfig(device.path, farm.baudrate), device.index,
+                                  ReconnectPolicy(retry_initial=True))
+        receiver.sentences_received.connect(partial(_on_sentences, device.ledger))
+        receiver.start()
+        receivers.append(receiver)
+
+    # 接收端先打开设备再开始发送，启动前的积压不计入时延
+    deadline = time.monotonic() + 2.0
+    while time.monotonic() < deadline and any(r.state != SerialReceiver.STATE_CONNECTED for r in receivers):
+        app.processEvents()
+        time.sleep(0.01)
+
+    cpu_start = time.process_time()
+    wall_start = time.monotonic()
+    farm.start()
+    expire_timer = QTimer()
+    expire_timer.timeout.connect(lambda: [d.ledger.expire(time.monotonic_ns()) for d in farm.devices])
+    expire_timer.start(1000)
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec_()
+    expire_timer.stop()
+
+    farm.stop()
+    # 发送停止后再处理1秒，让在途数据送达
+    drain_until = time.monotonic() + 1.0
+    while time.monotonic() < drain_until:
+        app.processEvents()
+        time.sleep(0.01)
+    for receiver in receivers:
+        receiver.disconnect()
+    app.processEvents()
+    farm.close()
+    wall = time.monotonic() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    ports = []
+    for device, receiver in zip(farm.devices, receivers):
+        ledger = device.ledger
+        ledger.expire()
+        ports.append({
+            'index': device.index,
+            'epochs': device.epochs,
+            'skipped_epochs': device.skipped_epochs,
+            'sent': ledger.sent,
+            'received': ledger.received,
+            'corrupted_sent': device.corrupted,
+            'corrupted_received': ledger.corrupted_received,
+            'lost': ledger.lost,
+            'unexpected': ledger.unexpected,
+            'dropped_bytes': device.dropped_bytes,
+            'splits': device.splits,
+            'bursts': device.bursts,
+            'dropouts': device.dropouts,
+            'reconnects': receiver.reconnect_count,
+            'read_p50': percentile(ledger.read_latency, 50),
+            'read_p99': percentile(ledger.read_latency, 99),
+            'p50': percentile(ledger.delivery_latency, 50),
+            'p95': percentile(ledger.delivery_latency, 95),
+            'p99': percentile(ledger.delivery_latency, 99),
+            'max': max(ledger.delivery_latency) if ledger.delivery_latency else None,
+        })
+    simulator_cpu = farm.cpu_time()
+    return {
+        'ports': ports,
+        'seconds': wall,
+        'cpu_total': cpu / wall * 100,
+        'cpu_simulator': simulator_cpu / wall * 100,
+        'cpu_receiver': max(0.0, cpu - simulator_cpu) / wall * 100,
+    }
+
+
+def print_report(report: dict):
+    def ms(value):
+        return f"{value:.1f}" if value is not None else "-"
+
+    print(f"{'设备':>4} {'发送':>7} {'收到':>7} {'丢失':>5} {'丢失率':>7} {'坏校验':>9} {'多余':>4} "
+          f"{'读取p50':>7} {'p50':>6} {'p95':>6} {'p99':>6} {'最大':>7} {'分段':>4} {'突发':>4} "
+          f"{'消失':>4} {'重连':>4} {'跳过历元':>6}")
+    totals = {'sent': 0, 'received': 0, 'lost': 0}
+    for port in report['ports']:
+        for key in totals:
+            totals[key] += port[key]
+        loss = port['lost'] / port['sent'] * 100 if port['sent'] else 0.0
+        print(f"{port['index']:>6} {port['sent']:>7} {port['received']:>7} {port['lost']:>5} {loss:>6.2f}% "
+              f"{port['corrupted_received']:>4}/{port['corrupted_sent']:<4} {port['unexpected']:>4} "
+              f"{ms(port['read_p50']):>9} {ms(port['p50']):>6} {ms(port['p95']):>6} {ms(port['p99']):>6} "
+              f"{ms(port['max']):>7} {port['splits']:>6} {port['bursts']:>6} {port['dropouts']:>6} "
+              f"{port['reconnects']:>6} {port['skipped_epochs']:>8}")
+    loss = totals['lost'] / totals['sent'] * 100 if totals['sent'] else 0.0
+    print(f"合计: 发送 {totals['sent']}，收到 {totals['received']}，丢失 {totals['lost']}（{loss:.2f}%）；时延单位毫秒")
+    print(f"CPU（{report['seconds']:.1f}s）: 进程 {report['cpu_total']:.1f}%，其中模拟器 "
+          f"{report['cpu_simulator']:.1f}%，接收链路 {report['cpu_receiver']:.1f}%")
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(description="虚拟GNSS设备群（伪终端）")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('farm', "只运行虚拟设备"), ('load', "运行设备并在进程内接收，输出负载测试报告")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('-n', '--count', type=int, default=8, help="设备数量")
+        p.add_argument('--rate', type=float, default=10, help="输出频率（Hz）")
+        p.add_argument('--baud', type=int, default=115200, help="模拟的波特率")
+        p.add_argument('--sentences', default='RMC,GGA,GSA', help="每个历元输出的语句类型")
+        p.add_argument('--dir', default=None, help="符号链接目录（默认临时目录）")
+        p.add_argument('--seed', type=int, default=0)
+        p.add_argument('--checksum', type=float, default=0.0, help="校验和错误概率")
+        p.add_argument('--split', type=float, default=0.0, help="分段写入概率")
+        p.add_argument('--burst', type=float, default=0.0, help="每个历元开始突发的概率")
+        p.add_argument('--burst-epochs', type=int, default=10, help="一次突发攒下的历元数")
+        p.add_argument('--dropout', type=float, default=0.0, help="设备消失的平均间隔（秒）")
+        p.add_argument('--dropout-duration', type=float, default=2.0, help="每次消失的时长（秒）")
+        if name == 'load':
+            p.add_argument('--seconds', type=float, default=30, help="测试时长")
+    return parser
+
+
+def main(argv=None):
+    args = _build_parser().parse_args(argv)
+    if not hasattr(os, 'openpty'):
+        print("当前系统不支持伪终端")
+        return 2
+    faults = FaultConfig(args.checksum, args.split, args.burst, args.burst_epochs,
+                         args.dropout, args.dropout_duration)
+    farm = DeviceFarm(args.count, args.dir, args.rate, args.baud,
+                      [s.strip().upper() for s in args.sentences.split(',') if s.strip()], faults, args.seed,
+                      measure=args.command == 'load')
+
+    if args.command == 'load':
+        print_report(run_load_test(farm, args.seconds))
+        return 0
+
+    farm.start()
+    print(f"{len(farm.devices)} 台虚拟设备（{args.rate:g} Hz，{args.baud} 波特），按 Ctrl+C 停止：")
+    for path in farm.paths:
+        print(f"  {path}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        farm.close()
+    for device in farm.devices:
+        print(f"gnss{device.index}: 历元 {device.epochs}，语句 {device.sent}，"
+              f"无人读取丢弃 {device.dropped_bytes} 字节，消失 {device.dropouts} 次")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
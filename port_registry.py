@@ -0,0 +1,65 @@
+# port_registry.py
+# 全局串口注册表：后台线程枚举串口并缓存，变化时推送新增/移除事件，界面线程从不阻塞在枚举上
+import threading
+import time
+from PyQt5.QtCore import QThread, pyqtSignal
+from serial_receiver import SerialReceiver
+
+
+class PortRegistry(QThread):
+    """后台枚举串口（热插拔监视），所有串口控件共享同一份缓存"""
+    # (全部串口, 新增串口, 移除串口)，元素均为 (设备名, 描述)
+    ports_changed = pyqtSignal(list, list, list)
+
+    def __init__(self, interval: float = 1.0):
+        super().__init__()
+        self.interval = interval  # 轮询间隔（秒）
+        self._ports = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._should_stop = False
+        self.scan_count = 0
+        self.last_scan_duration = 0.0  # 最近一次枚举耗时（秒）
+
+    def ports(self) -> list:
+        """返回缓存的串口列表 [(设备名, 描述)]（不触发枚举）"""
+        with self._lock:
+            return list(self._ports)
+
+    def devices(self) -> set:
+        """返回缓存的设备名集合"""
+        with self._lock:
+            return {device for device, _ in self._ports}
+
+    def refresh(self):
+        """请求立即重新枚举（异步，结果通过ports_changed推送）"""
+        self._wakeup.set()
+
+    def run(self):
+        while not self._should_stop:
+            start = time.monotonic()
+            ports = SerialReceiver.get_available_ports()
+            self.last_scan_duration = time.monotonic() - start
+            self.scan_count += 1
+
+            with self._lock:
+                old = dict(self._ports)
+                new = dict(ports)
+                added = [(d, desc) for d, desc in ports if d not in old]
+                removed = [(d, desc) for d, desc in self._ports if d not in new]
+                changed = added or removed or any(old[d] != new[d] for d in new if d in old)
+                if changed:
+                    self._ports = list(ports)
+
+            if changed:
+                self.ports_changed.emit(list(ports), added, removed)
+
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def stop(self, timeout_ms: int = 2000):
+        """停止后台枚举线程"""
+        self._should_stop = True
+        self._wakeup.set()
+        if self.isRunning():
+            self.wait(timeout_ms)
@@ -0,0 +1,145 @@
+# read_loop_check.py
+# 接收循环正确性检查：用伪终端按各波特率的线速率喂入NMEA数据，核对逐字节一致、积压和告警统计
+#   python read_loop_check.py [--seconds 3] [--bauds 9600,115200,921600]
+# 另外模拟一次接收线程卡顿，检查恢复后立即发出溢出告警（仅Linux/macOS）
+# CPU%为整个进程（含喂数据线程）的占用
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import tty
+
+from PyQt5.QtCore import QCoreApplication
+from serial_receiver import SerialConfig, SerialReceiver
+
+BAUD_RATES = (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
+
+
+def nmea_payload(size: int) -> bytes:
+    """生成约size字节的NMEA语句（内容只用于逐字节核对）"""
+    lines = []
+    total = 0
+    n = 0
+    while total < size:
+        body = (f"GNGGA,{n % 86400:06d}.00,3114.{n % 10000:04d},N,12128.{n % 10000:04d},E,1,12,0.8,"
+                f"{random.uniform(0, 100):.1f},M,0.0,M,,")
+        checksum = 0
+        for ch in body:
+            checksum ^= ord(ch)
+        line = f"${body}*{checksum:02X}\r\n".encode()
+        lines.append(line)
+        total += len(line)
+        n += 1
+    return b''.join(lines)
+
+
+class PtyFeeder(threading.Thread):
+    """按线速率（波特率/10 字节每秒）往伪终端主端写数据，写入大小随机以模拟驱动的分块"""
+
+    def __init__(self, master_fd: int, data: bytes, baudrate: int):
+        super().__init__(daemon=True)
+        self.master_fd = master_fd
+        self.data = data
+        self.byte_rate = baudrate / 10.0
+
+    def run(self):
+        start = time.monotonic()
+        sent = 0
+        while sent < len(self.data):
+            due = int((time.monotonic() - start) * self.byte_rate)
+            if due > sent:
+                size = min(due - sent, random.randint(1, 512), len(self.data) - sent)
+                sent += os.write(self.master_fd, self.data[sent:sent + size])
+            else:
+                time.sleep(0.001)
+
+
+def run_case(app, baudrate: int, seconds: float, stall: float = 0.0) -> dict:
+    """以baudrate喂入seconds秒的数据；stall>0时在接收线程中卡顿一次（秒）"""
+    master_fd, slave_fd = os.openpty()
+    tty.setraw(slave_fd)
+    data = nmea_payload(int(baudrate / 10 * seconds))
+
+    received = bytearray()
+    warnings = []
+    receiver = SerialReceiver(SerialConfig(os.ttyname(slave_fd), baudrate), 1)
+    receiver.raw_sinks.append(received.extend)
+    receiver.read_warning.connect(warnings.append)
+    if stall:
+        stalled = []
+
+        def stall_once(chunk):
+            if not stalled and len(received) > len(data) // 3:
+                stalled.append(True)
+                time.sleep(stall)
+        receiver.chunk_sinks.append(stall_once)
+
+    cpu_start = time.process_time()
+    receiver.start()
+    feeder = PtyFeeder(master_fd, data, baudrate)
+    feeder.start()
+    feeder.join()
+    deadline = time.monotonic() + 2.0
+    while len(received) < len(data) and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    receiver.disconnect()
+    receiver.wait(2000)
+    app.processEvents()
+    cpu = time.process_time() - cpu_start
+    os.close(master_fd)
+    os.close(slave_fd)
+
+    pacer = receiver.read_pacer
+    return {
+        'baudrate': baudrate,
+        'ok': bytes(received) == data,
+        'sent': len(data),
+        'received': len(received),
+        'interval_ms': pacer.interval * 1000,
+        'max_backlog': pacer.max_backlog,
+        'max_gap_ms': pacer.max_gap * 1000,
+        'warnings': pacer.overrun_warnings,
+        'suspected': pacer.suspected_overruns,
+        'signals': warnings,
+        'cpu': cpu / seconds * 100,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="接收循环在各波特率下的正确性检查（伪终端）")
+    parser.add_argument('--seconds', type=float, default=3.0, help="每个波特率喂入的时长")
+    parser.add_argument('--bauds', default=','.join(map(str, BAUD_RATES)), help="逗号分隔的波特率")
+    args = parser.parse_args(argv)
+    if not hasattr(os, 'openpty'):
+        print("当前系统不支持伪终端")
+        return 2
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    failed = False
+    print(f"{'波特率':>8} {'结果':>4} {'字节':>9} {'间隔ms':>7} {'最大积压':>8} {'最长间隔ms':>10} "
+          f"{'告警':>4} {'疑似溢出':>8} {'CPU%':>6}")
+    for baudrate in (int(b) for b in args.bauds.split(',')):
+        r = run_case(app, baudrate, args.seconds)
+        # 正常速率下必须逐字节一致，且积压不应接近缓冲区上限
+        ok = r['ok'] and r['suspected'] == 0
+        failed |= not ok
+        print(f"{baudrate:>8} {'通过' if ok else '失败':>4} {r['received']:>9} {r['interval_ms']:>7.1f} "
+              f"{r['max_backlog']:>8} {r['max_gap_ms']:>10.1f} {r['warnings']:>4} {r['suspected']:>8} "
+              f"{r['cpu']:>6.1f}")
+
+    # 卡顿：921600下接收线程停顿0.2秒（约18KB到达，远超4KB缓冲区），应在恢复后立即告警
+    r = run_case(app, 921600, args.seconds, stall=0.2)
+    ok = r['ok'] and (r['warnings'] + r['suspected']) > 0 and r['signals']
+    failed |= not ok
+    print(f"卡顿检查: {'通过' if ok else '失败'}，告警 {r['warnings']}，疑似溢出 {r['suspected']}，"
+          f"最大积压 {r['max_backlog']}，逐字节一致: {r['ok']}")
+    for message in r['signals']:
+        print(f"  {message}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,21 +1,190 @@
 # serial_receiver.py 保持不变，使用原来的代码
+import codecs
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
 import serial
 import serial.tools.list_ports
 from PyQt5.QtCore import QThread, pyqtSignal, Qt
 from dataclasses import dataclass
+from input_sources import open_source, SourceEOF
 
 @dataclass
 class SerialConfig:
+    """串口配置；port除设备名外也可以是伪终端/文件/FIFO路径或URL（socket://、loop://、file://等）"""
     port: str
     baudrate: int = 9600
     bytesize: int = 8
     parity: str = 'N'
     stopbits: float = 1
     timeout: float = 1
+    # 订阅规则（在接收线程中执行，只限制显示；定位解析结果取自过滤前的全部语句）
+    sentence_filter: tuple = ()  # 转发给界面显示的语句类型，如 ('RMC', 'GGA')；空表示全部
+    display_rate_hz: float = 0  # 按定位历元抽稀到该频率，0表示不抽稀
+    log_raw: bool = True  # 日志/详情窗口接收全部原始数据；False时只接收过滤后的语句
+
+
+@dataclass
+class RxChunk:
+    """一次读取得到的数据块及其到达时间"""
+    text: str
+    mono_ns: int  # 读取时刻 time.monotonic_ns()
+    wall_time: float  # 由会话时钟锚点换算的墙上时间（秒）
+
+
+@dataclass
+class RxSentence:
+    """一条完整语句及其到达时间（取完成该语句的数据块的到达时间）"""
+    text: str
+    mono_ns: int
+    wall_time: float
+    fix: tuple = None  # 接收线程中的解析结果 (有效语句, 解析结果字典)，非定位语句为None
+
+
+class ClockAnchor:
+    """单调时钟与墙上时间的锚点：会话内时间戳只随单调时钟推进，不受系统校时跳变影响"""
+
+    def __init__(self):
+        self.wall_ns = time.time_ns()
+        self.mono_ns = time.monotonic_ns()
+
+    def wall_time(self, mono_ns: int) -> float:
+        return (self.wall_ns + (mono_ns - self.mono_ns)) / 1e9
+
+
+class NMEAFramer:
+    """按换行切分语句，处理跨数据块的半行"""
+
+    def __init__(self, max_partial: int = 4096):
+        self.partial = ""
+        self.max_partial = max_partial  # 长时间无换行（乱码）时丢弃，避免无限增长
+
+    def feed(self, chunk: RxChunk) -> list:
+        """输入数据块，返回其中完成的语句列表 [RxSentence]"""
+        data = self.partial + chunk.text
+        lines = data.split('\n')
+        self.partial = lines.pop()
+        if len(self.partial) > self.max_partial:
+            self.partial = self.partial[-self.max_partial:]
+
+        sentences = []
+        for line in lines:
+            line = line.strip()
+            if line:
+                sentences.append(RxSentence(line, chunk.mono_ns, chunk.wall_time))
+        return sentences
+
+    def reset(self):
+        self.partial = ""
+
+
+class SentenceFilter:
+    """语句过滤与抽稀：按语句类型订阅，并按UTC历元把显示频率降到display_rate_hz（不影响定位解析结果）"""
+
+    # 语句标识：$ + 2位发送方 + 3位类型（兼容前导乱码）
+    SENTENCE_ID = re.compile(r'\$([A-Z]{2})([A-Z]{3}),')
+    # 带UTC时间字段的语句类型及其字段序号
+    TIME_FIELDS = {'RMC': 1, 'GGA': 1, 'GNS': 1, 'GST': 1, 'ZDA': 1, 'GBS': 1, 'GLL': 5}
+
+    def __init__(self, types=(), rate_hz: float = 0):
+        # 类型可写 'RMC'（任意发送方）或 'GNRMC'（指定发送方）
+        self.types = {t.upper().lstrip('$') for t in types}
+        self.rate_hz = rate_hz
+        self.passed = 0
+        self.dropped = 0
+        self._epoch = None  # 当前历元的UTC时间字段
+        self._epoch_slot = None  # 最近一次放行的历元所在时间槽
+        self._epoch_pass = True  # 当前历元是否放行（无时间字段的语句跟随所在历元）
+        self._last_mono_ns = None  # 无UTC时退化为按到达时间抽稀
+
+    @property
+    def active(self) -> bool:
+        return bool(self.types) or self.rate_hz > 0
+
+    def _type_match(self, talker: str, kind: str) -> bool:
+        return not self.types or kind in self.types or talker + kind in self.types
+
+    def _epoch_allowed(self, sentence: RxSentence, kind: str, line: str, start: int) -> bool:
+        """按历元抽稀：历元切换时决定整个历元（含其后的无时间语句）是否放行"""
+        if self.rate_hz <= 0:
+            return True
+        field = self.TIME_FIELDS.get(kind)
+        if field is None:
+            return self._epoch_pass
+        parts = line[start:].split(',', field + 1)
+        time_str = parts[field] if len(parts) > field else ''
+        if time_str == self._epoch:
+            return self._epoch_pass
+        self._epoch = time_str
+
+        utc = NMEAParser.parse_utc(time_str)
+        if utc is not None:
+            slot = math.floor(utc * self.rate_hz + 1e-6)
+            # 跨天时时间回绕，同样视为新时间槽
+            self._epoch_pass = slot != self._epoch_slot
+            if self._epoch_pass:
+                self._epoch_slot = slot
+        else:
+            interval_ns = 1e9 / self.rate_hz
+            self._epoch_pass = (self._last_mono_ns is None or
+                                sentence.mono_ns - self._last_mono_ns >= interval_ns * 0.9)
+        if self._epoch_pass:
+            self._last_mono_ns = sentence.mono_ns
+        return self._epoch_pass
+
+    def apply(self, sentences: list) -> list:
+        """返回放行的语句"""
+        if not self.active:
+            self.passed += len(sentences)
+            return sentences
+        kept = []
+        for sentence in sentences:
+            match = self.SENTENCE_ID.search(sentence.text)
+            if match is None:
+                keep = not self.types
+            else:
+                talker, kind = match.groups()
+                # 先做历元判断（未订阅的语句也要推进历元状态）
+                in_epoch = self._epoch_allowed(sentence, kind, sentence.text, match.start())
+                keep = in_epoch and self._type_match(talker, kind)
+            if keep:
+                kept.append(sentence)
+        self.passed += len(kept)
+        self.dropped += len(sentences) - len(kept)
+        return kept
+
+    def describe(self) -> str:
+        total = self.passed + self.dropped
+        ratio = self.passed / total * 100 if total else 100.0
+        return f"语句过滤: 放行 {self.passed} / 丢弃 {self.dropped}（{ratio:.0f}%）"
+
 
 class NMEAParser:
     """NMEA协议解析器"""
 
+    @staticmethod
+    def parse_utc(time_str):
+        """将hhmmss.ss解析为当天UTC秒数（保留小数秒），无效时返回None"""
+        try:
+            if not time_str or len(time_str) < 6:
+                return None
+            return int(time_str[0:2]) * 3600 + int(time_str[2:4]) * 60 + float(time_str[4:])
+        except ValueError:
+            return None
+
+    @staticmethod
+    def parse_date(date_str):
+        """将ddmmyy解析为 (年, 月, 日)，无效时返回None"""
+        try:
+            if not date_str or len(date_str) < 6:
+                return None
+            return 2000 + int(date_str[4:6]), int(date_str[2:4]), int(date_str[0:2])
+        except ValueError:
+            return None
+
     @staticmethod
     def parse_gnrmc(parts):
         """解析GNRMC语句"""
@@ -23,6 +192,8 @@ class NMEAParser:
             # 时间解析
             time_str = parts[1] if len(parts) > 1 and parts[1] else None
             time = f"{time_str[0:2]}:{time_str[2:4]}:{time_str[4:6]}" if time_str and len(time_str) >= 6 else "无效时间"
+            utc = NMEAParser.parse_utc(time_str)
+            date_str = parts[9] if len(parts) > 9 and parts[9] else None
 
             # 状态检查
             status = parts[2] if len(parts) > 2 else 'V'
@@ -30,12 +201,13 @@ class NMEAParser:
                 return {
                     'type': 'GNRMC',
                     'time': time,
+                    'utc': utc,
+                    'utc_date': NMEAParser.parse_date(date_str),
                     'valid': False,
                     'status': '无效数据'
                 }
 
             # 日期解析
-            date_str = parts[9] if len(parts) > 9 and parts[9] else None
             date = f"20{date_str[4:6]}-{date_str[2:4]}-{date_str[0:2]}" if date_str and len(date_str) >= 6 else "无效日期"
 
             # 经纬度解析
@@ -53,6 +225,8 @@ class NMEAParser:
             return {
                 'type': 'GNRMC',
                 'time': time,
+                'utc': utc,
+                'utc_date': NMEAParser.parse_date(date_str),
                 'date': date,
                 'latitude': lat,
                 'longitude': lon,
@@ -74,6 +248,7 @@ class NMEAParser:
             # 时间解析
             time_str = parts[1] if len(parts) > 1 and parts[1] else None
             time = f"{time_str[0:2]}:{time_str[2:4]}:{time_str[4:6]}" if time_str and len(time_str) >= 6 else "无效时间"
+            utc = NMEAParser.parse_utc(time_str)
 
             # 定位质量
             quality = int(parts[6]) if len(parts) > 6 and parts[6] else 0
@@ -81,6 +256,8 @@ class NMEAParser:
                 return {
                     'type': 'GNGGA',
                     'time': time,
+                    'utc': utc,
+                    'quality': quality,
                     'valid': False,
                     'status': '无效定位'
                 }
@@ -101,6 +278,7 @@ class NMEAParser:
             return {
                 'type': 'GNGGA',
                 'time': time,
+                'utc': utc,
                 'latitude': lat,
                 'longitude': lon,
                 'quality': quality,
@@ -116,118 +294,516 @@ class NMEAParser:
                 'status': '解析错误'
             }
 
+class ReconnectPolicy:
+    """断线重连策略：指数退避 + 随机抖动"""
+
+    def __init__(self, initial_delay: float = 0.05, max_delay: float = 0.8, multiplier: float = 2.0,
+                 jitter: float = 0.2, max_attempts: int = 0, retry_initial: bool = False):
+        self.initial_delay = initial_delay  # 首次重试等待（秒）
+        self.max_delay = max_delay  # 最大等待（秒），保证设备重新出现后1秒内恢复
+        self.multiplier = multiplier
+        self.jitter = jitter  # 抖动比例（±）
+        self.max_attempts = max_attempts  # 0表示无限重试
+        self.retry_initial = retry_initial  # 首次打开失败是否也进入重连
+
+    def delay(self, attempt: int) -> float:
+        """第attempt次（从1开始）重试前的等待时间"""
+        base = min(self.max_delay, self.initial_delay * (self.multiplier ** (attempt - 1)))
+        return max(0.0, base * (1 + random.uniform(-self.jitter, self.jitter)))
+
+
+class ReadPacer:
+    """按波特率和实际积压决定轮询间隔与每次读取量，并在驱动缓冲区溢出之前给出告警
+
+    8N1下每字节约10位，字节速率≈波特率/10；轮询间隔取填满1/4缓冲区所需的时间，
+    每次把已积压的数据一次读完（不超过max_read）。
+    """
+
+    def __init__(self, baudrate: int, buffer_size: int = 4096, min_interval: float = 0.002,
+                 max_interval: float = 0.02, max_read: int = 65536, warn_ratio: float = 0.75,
+                 growth_polls: int = 5, warn_interval: float = 1.0):
+        self.byte_rate = max(baudrate, 1) / 10.0
+        self.buffer_size = buffer_size  # 驱动接收缓冲区大小（Linux n_tty为4096字节）
+        self.interval = min(max_interval, max(min_interval, buffer_size * 0.25 / self.byte_rate))
+        self.max_read = max_read
+        self.warn_level = int(buffer_size * warn_ratio)  # 积压告警线
+        self.growth_polls = growth_polls  # 积压连续增长多少次判定为读取跟不上
+        self.warn_interval = warn_interval  # 告警信号的最小间隔（秒），计数不受影响
+
+        # 统计
+        self.polls = 0  # 有数据的轮询次数
+        self.max_backlog = 0  # 观测到的最大积压（字节）
+        self.max_gap = 0.0  # 两次读取之间的最长间隔（秒）
+        self.overrun_warnings = 0  # 积压越过告警线或持续增长的次数（每次积压事件计一次）
+        self.suspected_overruns = 0  # 积压达到缓冲区上限的次数（可能已丢数据）
+        self.hw_overruns = 0  # 驱动报告的溢出次数（仅部分串口支持）
+        self._growth = 0
+        self._last_backlog = 0
+        self._last_read = None
+        self._in_event = False  # 当前处于积压事件中（回落到告警线一半以下才结束）
+        self._last_warning = -math.inf
+
+    def read_size(self, backlog: int) -> int:
+        """本次读取的字节数：读完已积压的数据"""
+        return max(1, min(backlog, self.max_read))
+
+    def observe(self, backlog: int, now: float):
+        """记录一次轮询看到的积压字节数，需要发出告警时返回说明，否则返回None"""
+        self.polls += 1
+        self.max_backlog = max(self.max_backlog, backlog)
+        gap = 0.0 if self._last_read is None else now - self._last_read
+        self.max_gap = max(self.max_gap, gap)
+        self._last_read = now
+        # 每次都读完积压，正常情况下积压只有一个轮询间隔的数据；连续增长说明读取一轮比一轮慢
+        expected = self.byte_rate * self.interval
+        self._growth = self._growth + 1 if backlog > self._last_backlog and backlog > expected else 0
+        self._last_backlog = backlog
+
+        message = None
+        if backlog >= self.buffer_size - 1:
+            self.suspected_overruns += 1
+            self._in_event = True
+            message = f"接收缓冲区已满（{backlog} 字节，距上次读取 {gap * 1000:.0f} ms），可能已丢失数据"
+        elif backlog >= self.warn_level or self._growth >= self.growth_polls:
+            if not self._in_event:
+                self._in_event = True
+                self.overrun_warnings += 1
+                message = (f"接收积压 {backlog} 字节（缓冲区 {self.buffer_size}，"
+                           f"距上次读取 {gap * 1000:.0f} ms），读取跟不上数据速率")
+        elif backlog < self.warn_level / 2:
+            self._in_event = False
+
+        if message is None or now - self._last_warning < self.warn_interval:
+            return None
+        self._last_warning = now
+        return message
+
+    def idle(self, now: float):
+        """记录一次没有数据的轮询（积压从此刻重新累积）"""
+        self._last_read = now
+        self._growth = 0
+        self._last_backlog = 0
+
+    def add_hw_overruns(self, count: int) -> str:
+        self.hw_overruns += count
+        return f"串口驱动报告接收溢出 {count} 次（累计 {self.hw_overruns}），已丢失数据"
+
+    def describe(self) -> str:
+        """读取统计（详情窗口状态栏用）"""
+        text = (f"读取: 间隔 {self.interval * 1000:.0f} ms，最大积压 {self.max_backlog} B，"
+                f"最长间隔 {self.max_gap * 1000:.0f} ms，积压告警 {self.overrun_warnings}，"
+                f"疑似溢出 {self.suspected_overruns}")
+        if self.hw_overruns:
+            text += f"，驱动溢出 {self.hw_overruns}"
+        return text
+
+
+class DisplayGovernor:
+    """界面过载保护：按界面线程尚未处理的信号数分级减少发给界面的数据
+
+    只影响界面显示（原始数据窗口、解析列表、绘图），日志和转发在接收线程中先于本类处理，不会丢字节；
+    定位解析结果经fixes_received完整送达（统计、告警、延迟等不受影响），不经过本类。
+    积压超过阈值立即升级；积压回落并保持recover_s秒后逐级恢复。
+    计数由接收线程（emitted）和界面线程（acked）分别单独写入，不需要加锁。
+    """
+
+    LEVEL_NAMES = ('正常', '合并', '精简', '最低')
+    POSITION_TYPES = ('RMC', 'GGA', 'GNS')  # 精简级别只保留的定位语句
+
+    def __init__(self, thresholds=(10, 50, 200), recover_s: float = 2.0,
+                 batch_intervals=(0.0, 0.1, 0.25, 1.0), raw_tail: int = 8192):
+        self.enabled = False  # 界面线程会逐个确认信号时才启用（没有确认的使用者不分级）
+        self.thresholds = thresholds  # 升到第1/2/3级的未处理信号数
+        self.recover_s = recover_s
+        self.batch_intervals = batch_intervals  # 各级别合并发送的间隔（秒）
+        self.raw_tail = raw_tail  # 精简级别每批原始数据只保留末尾这么多字符
+        self.emitted = 0  # 已发出的界面信号数（接收线程写）
+        self.acked = 0  # 界面线程已处理的信号数（界面线程写）
+        self.level = 0
+        self.max_level = 0
+        self.max_backlog = 0
+        self.level_changes = 0
+        self.shed_chars = 0  # 未发给界面的原始字符数（日志中完整保留）
+        self.shed_sentences = 0  # 未发给界面的语句数
+        self._raw = []
+        self._sentences = []
+        self._last_flush = 0.0
+        self._calm_since = None
+
+    @property
+    def backlog(self) -> int:
+        return self.emitted - self.acked
+
+    def ack(self):
+        """界面线程处理完一个信号"""
+        self.acked += 1
+
+    def update(self, now: float) -> bool:
+        """按当前积压调整级别，级别变化时返回True"""
+        if not self.enabled:
+            return False
+        backlog = self.backlog
+        self.max_backlog = max(self.max_backlog, backlog)
+        level = self.level
+        target = sum(1 for threshold in self.thresholds if backlog >= threshold)
+        if target > level:
+            level = target
+            self._calm_since = None
+        elif level > 0 and backlog <= self.thresholds[level - 1] // 2:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.recover_s:
+                level -= 1
+                self._calm_since = now
+        else:
+            self._calm_since = None
+        if level == self.level:
+            return False
+        self.level = level
+        self.max_level = max(self.max_level, level)
+        self.level_changes += 1
+        return True
+
+    def offer(self, chunk, sentences: list):
+        """收下本次读取要显示的数据块和语句，由take()按当前级别决定何时、发多少"""
+        if chunk is not None:
+            self._raw.append(chunk)
+        if self.level >= 2:
+            kept = [s for s in sentences if self._sentence_type(s.text) in self.POSITION_TYPES]
+            self.shed_sentences += len(sentences) - len(kept)
+            sentences = kept
+        self._sentences.extend(sentences)
+
+    @staticmethod
+    def _sentence_type(text: str):
+        match = SentenceFilter.SENTENCE_ID.search(text)
+        return match.group(2) if match else None
+
+    def take(self, now: float):
+        """到了本级别的发送时间时返回 (原始数据块或None, 语句列表)，否则返回 (None, [])"""
+        if not self._raw and not self._sentences:
+            return None, []
+        if now - self._last_flush < self.batch_intervals[self.level]:
+            return None, []
+        self._last_flush = now
+        raw, self._raw = self._raw, []
+        sentences, self._sentences = self._sentences, []
+
+        chunk = None
+        if raw:
+            last = raw[-1]
+            text = raw[0].text if len(raw) == 1 else ''.join(c.text for c in raw)
+            if self.level >= 3:
+                self.shed_chars += len(text)
+                text = ''
+            elif self.level >= 2 and len(text) > self.raw_tail:
+                dropped = len(text) - self.raw_tail
+                self.shed_chars += dropped
+                text = f"\n[界面过载，省略{dropped}字符，日志完整]\n" + text[-self.raw_tail:]
+            if text:
+                chunk = raw[0] if len(raw) == 1 and text is raw[0].text else RxChunk(text, last.mono_ns, last.wall_time)
+
+        if self.level >= 3 and sentences:
+            # 最低级别：每批只保留每种定位语句的最新一条
+            latest = {}
+            for sentence in sentences:
+                latest[self._sentence_type(sentence.text)] = sentence
+            kept = sorted(latest.values(), key=lambda s: s.mono_ns)
+            self.shed_sentences += len(sentences) - len(kept)
+            sentences = kept
+        return chunk, sentences
+
+    def describe(self) -> str:
+        return (f"界面: {self.LEVEL_NAMES[self.level]}（待处理 {self.backlog}，最高 {self.LEVEL_NAMES[self.max_level]}，"
+                f"未显示 {self.shed_chars} 字符/{self.shed_sentences} 条）")
+
+
 class SerialReceiver(QThread):
-    data_received = pyqtSignal(str)  # 数据接收信号
+    data_received = pyqtSignal(object)  # 数据接收信号（RxChunk，原始数据块 + 到达时间）
+    sentences_received = pyqtSignal(list)  # 完整语句信号（[RxSentence]，经过滤和过载保护，仅用于显示）
+    fixes_received = pyqtSignal(list)  # 全部定位解析结果（[(有效语句, 解析结果字典)]，不经过滤和过载保护）
     error_occurred = pyqtSignal(str)  # 错误发生信号
     connection_established = pyqtSignal()  # 新增：连接成功信号
-
-    def __init__(self, config: SerialConfig, port_index: int):
+    state_changed = pyqtSignal(str, str)  # 连接状态变化信号 (状态, 说明)
+    read_warning = pyqtSignal(str)  # 接收积压/溢出告警
+    overload_changed = pyqtSignal(int, str)  # 界面过载保护级别变化 (级别, 说明)
+
+    # 连接状态
+    STATE_CONNECTING = 'connecting'
+    STATE_CONNECTED = 'connected'
+    STATE_RECONNECTING = 'reconnecting'
+    STATE_FAILED = 'failed'
+    STATE_STOPPED = 'stopped'
+
+    def __init__(self, config: SerialConfig, port_index: int, reconnect_policy: ReconnectPolicy = None,
+                 clock_anchor: ClockAnchor = None):
         super().__init__()
         self.config = config
         self.port_index = port_index
+        self.reconnect_policy = reconnect_policy or ReconnectPolicy()
         self.serial_port = None
         self._is_connected = False
         self._should_stop = False
+        self._stop_event = threading.Event()  # 用于可随时中断的等待
+        self.state = self.STATE_STOPPED
+        self.reconnect_count = 0  # 断线次数
+        self.recovery_times = deque(maxlen=100)  # 最近的恢复耗时（秒）
+        self.last_recovery_time = None
+        # 时钟锚点可由调用方共享（同一会话内重连也不会出现时间倒退）
+        self.clock_anchor = clock_anchor or ClockAnchor()
+        self.raw_sinks = []  # 原始字节回调 sink(bytes)，在接收线程中调用（如转发服务）
+        self.chunk_sinks = []  # 日志数据块回调 sink(RxChunk)，在接收线程中调用（如日志写入）
+        self.framer = NMEAFramer()
+        self.read_pacer = ReadPacer(config.baudrate)
+        self.display_governor = DisplayGovernor()
+        self.sentence_filter = SentenceFilter(config.sentence_filter, config.display_rate_hz)
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def set_sentence_filter(self, types=(), rate_hz: float = 0):
+        """修改订阅规则（可在运行中调用，新规则从下一个数据块开始生效）"""
+        self.config.sentence_filter = tuple(types)
+        self.config.display_rate_hz = rate_hz
+        self.sentence_filter = SentenceFilter(types, rate_hz)
+
+    def ack_display(self):
+        """界面线程处理完一个data_received/sentences_received信号后调用（启用过载保护）"""
+        self.display_governor.enabled = True
+        self.display_governor.ack()
+
+    def _emit_display(self, chunk, sentences: list):
+        """把要显示的数据交给过载保护，按当前级别合并/精简后发给界面线程"""
+        governor = self.display_governor
+        now = time.monotonic()
+        if governor.update(now):
+            self.overload_changed.emit(governor.level, governor.describe())
+        if chunk is not None or sentences:
+            governor.offer(chunk, sentences)
+        chunk, sentences = governor.take(now)
+        # 先计数再发信号，界面线程的确认不会早于计数
+        if chunk is not None:
+            governor.emitted += 1
+            self.data_received.emit(chunk)
+        if sentences:
+            governor.emitted += 1
+            self.sentences_received.emit(sentences)
+
+    def _set_state(self, state: str, detail: str = ""):
+        self.state = state
+        self.state_changed.emit(state, detail)
+
+    def _wait(self, seconds: float) -> bool:
+        """可被disconnect()/cleanup()立即打断的等待，返回是否应停止"""
+        return self._stop_event.wait(seconds) or self._should_stop
+
+    def _open_port(self):
+        """按完整配置打开数据源（重连时同样应用全部参数）"""
+        return open_source(self.config)
+
+    def _close_port(self):
+        if self.serial_port:
+            try:
+                self.serial_port.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _describe_open_error(e: Exception) -> str:
+        error_msg = f"串口连接错误: {str(e)}"
+        if "PermissionError" in str(e):
+            error_msg = "串口已被占用"
+        elif "FileNotFoundError" in str(e):
+            error_msg = "串口不存在"
+        return error_msg
 
     def run(self):
-        """接收数据的线程循环（优化错误处理）"""
+        """接收线程：连接 → 读取 → 断线后按退避策略重连，任何等待都可立即取消"""
+        policy = self.reconnect_policy
+        attempt = 0
+        lost_at = None  # 断线时刻（monotonic），用于统计恢复耗时
+        first_open = True
+        self._set_state(self.STATE_CONNECTING)
+
         try:
-            self.serial_port = serial.Serial(
-                port=self.config.port,
-                baudrate=self.config.baudrate,
-                bytesize=self.config.bytesize,
-                parity=self.config.parity,
-                stopbits=self.config.stopbits,
-                timeout=self.config.timeout
-            )
-            self._is_connected = True
-            self.connection_established.emit()
-
-            # 增加：延长错误容忍次数（原5次→10次）
-            max_error_count = 10  # 关键修改
-            error_count = 0
-            read_chunk_size = 1024
-            max_read_per_loop = 8192
-
-            while not self._should_stop and self.serial_port and self.serial_port.is_open:
+            while not self._should_stop:
                 try:
-                    # 增加短暂延迟，减少资源占用
-                    self.msleep(10)
-
-                    bytes_available = self.serial_port.in_waiting
-                    if bytes_available > 0:
-                        # 限制单次读取量
-                        bytes_to_read = min(bytes_available, max_read_per_loop, read_chunk_size)
-                        data = self.serial_port.read(bytes_to_read)
-
-                        # 高效解码
-                        try:
-                            text_data = data.decode('utf-8', errors='replace')
-                        except UnicodeDecodeError:
-                            text_data = data.decode('latin1')  # 更宽松的解码方式
-
-                        self.data_received.emit(text_data)
-                        error_count = 0  # 重置错误计数器
-                    else:
-                        # 没有数据时短暂休眠
-                        self.msleep(50)
-
-                except serial.SerialException as e:
-                    error_count += 1
-                    if error_count >= max_error_count:
-                        # 关键修改：触发错误后尝试自动重连（30秒内）
-                        self.error_occurred.emit(f"串口读取错误: {str(e)}，尝试30秒后重连...")
-                        self.msleep(30000)  # 等待30秒
-                        error_count = 0  # 重置计数器
-                        # 重新初始化串口连接
-                        self.serial_port.close()
-                        self.serial_port = serial.Serial(
-                            port=self.config.port,
-                            baudrate=self.config.baudrate,
-                            timeout=self.config.timeout
-                        )
-                    else:
-                        self.msleep(100)  # 短暂延迟后重试
-
-                except OSError as e:
-                    # 处理系统资源错误
-                    if e.errno == 22:  # 系统资源不足
-                        self.error_occurred.emit("系统资源不足，正在尝试恢复...")
-                        self.msleep(500)  # 等待系统恢复
-                        error_count += 1
-                        if error_count >= max_error_count:
-                            break
-                    else:
-                        self.error_occurred.emit(f"系统错误: {str(e)}")
+                    self.serial_port = self._open_port()
+                except (serial.SerialException, OSError, ValueError) as e:
+                    if first_open and not policy.retry_initial:
+                        self._set_state(self.STATE_FAILED, self._describe_open_error(e))
+                        self.error_occurred.emit(self._describe_open_error(e))
+                        return
+                    attempt += 1
+                    if policy.max_attempts and attempt > policy.max_attempts:
+                        self._set_state(self.STATE_FAILED, f"重连{policy.max_attempts}次失败: {str(e)}")
+                        self.error_occurred.emit(f"重连失败: {str(e)}")
+                        return
+                    delay = policy.delay(attempt)
+                    self._set_state(self.STATE_RECONNECTING, f"第{attempt}次重连失败，{delay:.2f}秒后重试: {str(e)}")
+                    if self._wait(delay):
                         break
+                    continue
+
+                # 打开成功
+                self._is_connected = True
+                attempt = 0
+                if lost_at is not None:
+                    self.last_recovery_time = time.monotonic() - lost_at
+                    self.recovery_times.append(self.last_recovery_time)
+                    self._set_state(self.STATE_CONNECTED, f"已恢复，耗时{self.last_recovery_time:.2f}秒")
+                    lost_at = None
+                else:
+                    self._set_state(self.STATE_CONNECTED)
+                # 新连接不继承上一次连接残留的半行/半个字符
+                self.framer.reset()
+                self._decoder.reset()
+                if first_open:
+                    first_open = False
+                    self.connection_established.emit()
+
+                reason = self._read_loop()
+                self._close_port()
+                if reason is None:
+                    break
+                if not self.serial_port.reconnectable:
+                    # 文件回放结束、loop://等不可重连的数据源：正常结束会话
+                    self._set_state(self.STATE_STOPPED, reason)
+                    break
+
+                # 连接中断，进入重连（会话保持，is_connected不变）
+                lost_at = time.monotonic()
+                self.reconnect_count += 1
+                self._set_state(self.STATE_RECONNECTING, reason)
 
-                except Exception as e:
-                    error_count += 1
-                    if error_count >= max_error_count:
-                        self.error_occurred.emit(f"发生错误: {str(e)}")
-                        break
-                    self.msleep(100)  # 短暂延迟后重试
-
-        except serial.SerialException as e:
-            error_msg = f"串口连接错误: {str(e)}"
-            if "PermissionError" in str(e):
-                error_msg = "串口已被占用"
-            elif "FileNotFoundError" in str(e):
-                error_msg = "串口不存在"
-            self.error_occurred.emit(error_msg)
         except Exception as e:
+            self._set_state(self.STATE_FAILED, f"未知错误: {str(e)}")
             self.error_occurred.emit(f"未知错误: {str(e)}")
         finally:
-            if self.serial_port and self.serial_port.is_open:
-                self.serial_port.close()
+            self._close_port()
             self._is_connected = False
-
-    def parse_nmea_data(self, data: str):
-        """解析NMEA数据，按指定格式输出"""
-        lines = data.split('\n')
-        output = []
-
-        for line in lines:
+            if self.state not in (self.STATE_FAILED, self.STATE_STOPPED):
+                self._set_state(self.STATE_STOPPED)
+
+    def _read_loop(self):
+        """读取循环：正常停止返回None，连接中断返回原因"""
+        # 连续错误达到该次数即判定连接中断
+        max_error_count = 3
+        error_count = 0
+        pacer = self.read_pacer
+        # 只有串口（含伪终端）的积压反映驱动缓冲区；文件/网络数据源只用读取节奏
+        monitor = self.serial_port.kind == 'serial'
+        hw_overruns = self.serial_port.overrun_count() if monitor else None
+        next_hw_check = time.monotonic() + 1.0
+
+        while not self._should_stop and self.serial_port and self.serial_port.is_open:
+            try:
+                bytes_available = self.serial_port.in_waiting
+                if bytes_available > 0:
+                    if monitor:
+                        now = time.monotonic()
+                        warning = pacer.observe(bytes_available, now)
+                        if warning:
+                            self.read_warning.emit(warning)
+                        if hw_overruns is not None and now >= next_hw_check:
+                            next_hw_check = now + 1.0
+                            count = self.serial_port.overrun_count()
+                            if count is not None and count > hw_overruns:
+                                self.read_warning.emit(pacer.add_hw_overruns(count - hw_overruns))
+                            hw_overruns = count if count is not None else hw_overruns
+                    # 一次读完已积压的数据
+                    data = self.serial_port.read(pacer.read_size(bytes_available))
+                    # 读取完成即打时间戳（后续解码/分帧/跨线程都不影响到达时间）
+                    mono_ns = time.monotonic_ns()
+
+                    # 原始字节先交给旁路（转发等），其异常不影响采集
+                    for sink in self.raw_sinks:
+                        try:
+                            sink(data)
+                        except Exception as e:
+                            print(f"原始数据回调错误: {str(e)}")
+
+                    # 增量解码：跨数据块的多字节字符不会被截断成乱码
+                    text_data = self._decoder.decode(data)
+
+                    chunk = RxChunk(text_data, mono_ns, self.clock_anchor.wall_time(mono_ns))
+                    framed = self.framer.feed(chunk)
+                    # 定位解析取过滤前的全部语句（统计、告警、延迟等不受显示订阅影响）
+                    fixes = self.parse_sentences(framed)
+                    # 过滤/抽稀在本线程完成，只把需要显示的语句发给界面线程
+                    sentences = self.sentence_filter.apply(framed)
+                    if self.config.log_raw:
+                        log_chunk = chunk
+                    elif sentences:
+                        text = ''.join(sentence.text + '\r\n' for sentence in sentences)
+                        log_chunk = RxChunk(text, mono_ns, chunk.wall_time)
+                    else:
+                        log_chunk = None
+                    if log_chunk is not None:
+                        # 日志直接在本线程入队，不经过界面线程
+                        for sink in self.chunk_sinks:
+                            try:
+                                sink(log_chunk)
+                            except Exception as e:
+                                print(f"数据块回调错误: {str(e)}")
+                    if fixes:
+                        self.fixes_received.emit(fixes)
+                    # 界面显示排在日志之后，过载时只减少显示的数据
+                    self._emit_display(log_chunk, sentences)
+                    error_count = 0  # 重置错误计数器
+                    if monitor and bytes_available > pacer.max_read:
+                        continue  # 积压超过单次读取上限，立即继续读
+                else:
+                    if monitor:
+                        pacer.idle(time.monotonic())
+                    self._emit_display(None, [])  # 合并发送时，没有新数据也要按时发出已积攒的
+                # 按波特率决定的间隔等待下一次轮询（数据到达的速率不会让缓冲区在间隔内超过1/4）
+                if self._wait(pacer.interval):
+                    return None
+
+            except SourceEOF as e:
+                return str(e)
+
+            except serial.SerialException as e:
+                error_count += 1
+                if error_count >= max_error_count:
+                    return f"串口读取错误: {str(e)}"
+                if self._wait(0.05):
+                    return None
+
+            except OSError as e:
+                # 处理系统资源错误
+                error_count += 1
+                if e.errno == 22 and error_count < max_error_count:  # 系统资源不足
+                    self.error_occurred.emit("系统资源不足，正在尝试恢复...")
+                    if self._wait(0.5):  # 等待系统恢复
+                        return None
+                else:
+                    return f"系统错误: {str(e)}"
+
+            except Exception as e:
+                error_count += 1
+                if error_count >= max_error_count:
+                    return f"发生错误: {str(e)}"
+                if self._wait(0.1):  # 短暂延迟后重试
+                    return None
+
+        return None if self._should_stop else "串口已关闭"
+
+    def parse_sentences(self, sentences: list) -> list:
+        """解析语句中的定位结果，结果中附带到达时间（rx_mono_ns、rx_time），同时记在语句的fix上供显示复用"""
+        results = []
+        for sentence in sentences:
+            for valid_line, result in self.parse_nmea_results(sentence.text):
+                result['rx_mono_ns'] = sentence.mono_ns
+                result['rx_time'] = sentence.wall_time
+                sentence.fix = (valid_line, result)
+                results.append(sentence.fix)
+        return results
+
+    def parse_nmea_results(self, data: str):
+        """解析NMEA数据，返回 [(有效语句, 解析结果字典)] 列表"""
+        results = []
+
+        for line in data.split('\n'):
             line = line.strip()
             if not line:
                 continue
@@ -235,12 +811,27 @@ class SerialReceiver(QThread):
             # 查找GNRMC或GNGGA标识符的位置（处理前导乱码）
             gnrmc_pos = line.find('$GNRMC')
             gngga_pos = line.find('$GNGGA')
-            
+
             # 优先处理GNRMC（可根据实际协议优先级调整）
             if gnrmc_pos != -1:
                 valid_line = line[gnrmc_pos:]  # 提取从$GNRMC开始的有效部分
-                output.append(f"原始: {valid_line}")
-                result = NMEAParser.parse_gnrmc(valid_line.split(','))
+                results.append((valid_line, NMEAParser.parse_gnrmc(valid_line.split(','))))
+                continue  # 处理完当前标识符后跳过后续检查
+
+            if gngga_pos != -1:
+                valid_line = line[gngga_pos:]  # 提取从$GNGGA开始的有效部分
+                results.append((valid_line, NMEAParser.parse_gngga(valid_line.split(','))))
+
+        return results
+
+    @staticmethod
+    def format_nmea_results(results):
+        """将解析结果格式化为显示文本"""
+        output = []
+
+        for valid_line, result in results:
+            output.append(f"原始: {valid_line}")
+            if result['type'] == 'GNRMC':
                 if result['valid']:
                     output.append(
                         f"解析: [GNRMC]\n"
@@ -252,13 +843,7 @@ class SerialReceiver(QThread):
                     )
                 else:
                     output.append(f"解析: [GNRMC] {result.get('status', '无效数据')}\n")
-                output.append("")
-                continue  # 处理完当前标识符后跳过后续检查
-
-            if gngga_pos != -1:
-                valid_line = line[gngga_pos:]  # 提取从$GNGGA开始的有效部分
-                output.append(f"原始: {valid_line}")
-                result = NMEAParser.parse_gngga(valid_line.split(','))
+            else:
                 if result['valid']:
                     output.append(
                         f"解析: [GNGGA]\n"
@@ -271,46 +856,44 @@ class SerialReceiver(QThread):
                     )
                 else:
                     output.append(f"解析: [GNGGA] {result.get('status', '无效数据')}\n")
-                output.append("")
+            output.append("")
 
         return '\n'.join(output) if output else None
 
-    def cleanup(self):
-        """彻底清理串口资源"""
-        self._should_stop = True
+    def parse_nmea_data(self, data: str):
+        """解析NMEA数据，按指定格式输出"""
+        return self.format_nmea_results(self.parse_nmea_results(data))
 
-        # 断开所有信号连接
-        try:
-            self.data_received.disconnect()
-            self.error_occurred.disconnect()
-        except TypeError:
-            pass  # 信号未连接时忽略
+    def request_stop(self):
+        """发出停止信号后立即返回（唤醒所有等待），由调用方决定等多久"""
+        self._should_stop = True
+        self._stop_event.set()
 
-        # 更安全的线程终止方式
-        if self.isRunning():
-            self.wait(2000)  # 等待线程结束，最多2秒
-            if self.isRunning():
-                self.terminate()  # 强制终止线程
+    def cleanup(self, timeout: float = 2.0) -> bool:
+        """断开信号并停止线程，返回是否在超时前结束（不强制终止线程，以免打断正在进行的读写）"""
+        self.request_stop()
 
-        # 确保串口关闭
-        if self.serial_port:
+        # 断开所有信号连接
+        for signal in (self.data_received, self.sentences_received, self.fixes_received, self.error_occurred,
+                       self.state_changed, self.read_warning):
             try:
-                self.serial_port.close()
-            except:
-                pass
-            finally:
-                self.serial_port = None
-
-        # 强制释放资源
-        import gc
-        gc.collect()
-
-    def disconnect(self):
-        """断开串口连接"""
-        self._should_stop = True
+                signal.disconnect()
+            except TypeError:
+                pass  # 信号未连接时忽略
+
+        finished = self.disconnect(timeout)
+        # 线程已结束时串口已在run()中关闭；未结束时不从其他线程关闭，避免与读取竞争
+        if finished:
+            self.serial_port = None
+        return finished
+
+    def disconnect(self, timeout: float = 1.0) -> bool:
+        """断开串口连接，返回线程是否在超时前结束"""
+        self.request_stop()
         if self.isRunning():
-            self.wait(1000)  # 等待线程结束，最多1秒
+            self.wait(max(0, int(timeout * 1000)))
         self._is_connected = False
+        return not self.isRunning()
 
     @property
     def is_connected(self):
@@ -332,17 +915,18 @@ class SerialReceiver(QThread):
             return []
 
     def get_port_info(self):
-        """获取串口详细信息"""
+        """获取串口（数据源）详细信息"""
         if not self.serial_port or not self.serial_port.is_open:
             return "串口未连接"
 
         info = f"""
-        端口: {self.serial_port.port}
-        波特率: {self.serial_port.baudrate}
-        数据位: {self.serial_port.bytesize}
-        校验位: {self.serial_port.parity}
-        停止位: {self.serial_port.stopbits}
-        超时: {self.serial_port.timeout}
+        端口: {self.config.port}
+        数据源: {self.serial_port.describe()}
+        波特率: {self.config.baudrate}
+        数据位: {self.config.bytesize}
+        校验位: {self.config.parity}
+        停止位: {self.config.stopbits}
+        超时: {self.config.timeout}
         接收缓存: {self.serial_port.in_waiting} 字节
         """
-        return info
\ No newline at end of file
+        return info
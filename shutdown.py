@@ -0,0 +1,153 @@
+# shutdown.py
+# 统一关闭：先同时向所有接收线程和后台服务发出停止信号，再在同一个总截止时间内并行等待，
+# 每个串口按"接收线程结束 -> 日志写完"的顺序关闭，最后给出各串口的耗时报告
+import threading
+import time
+
+# 超时未结束又不强制终止的接收线程：保留引用直到其自行结束，避免QThread对象在运行中被销毁
+_lingering = set()
+
+
+class PortShutdown:
+    """一个串口的关闭过程"""
+
+    def __init__(self, port_index: int, receiver, writer):
+        self.port_index = port_index
+        self.receiver = receiver
+        self.writer = writer
+        self.receiver_time = None  # 接收线程结束耗时（秒，从发出停止信号算起），None表示未结束
+        self.log_time = None  # 日志写完耗时（秒，从发出停止信号算起）
+        self.receiver_stopped = receiver is None
+        self.log_flushed = writer is None
+        self.forced = False  # 超时后被强制终止
+
+    def run(self, started: float, deadline: float):
+        """在工作线程中执行：等接收线程结束，再关闭日志（写完队列中的数据）"""
+        receiver, writer = self.receiver, self.writer
+        if receiver is not None:
+            receiver.wait(max(0, int((deadline - time.monotonic()) * 1000)))
+            self.receiver_stopped = not receiver.isRunning()
+            if self.receiver_stopped:
+                self.receiver_time = time.monotonic() - started
+        if writer is not None:
+            # 先摘掉日志回调，接收线程即使超时未结束也不会再往已关闭的写入器里入队
+            if receiver is not None and writer.write_chunk in receiver.chunk_sinks:
+                receiver.chunk_sinks.remove(writer.write_chunk)
+            self.log_flushed = writer.close(max(0.0, deadline - time.monotonic()))
+            if self.log_flushed:
+                self.log_time = time.monotonic() - started
+
+    def text(self) -> str:
+        def seconds(value):
+            return f"{value * 1000:.0f} ms" if value is not None else "超时"
+
+        parts = []
+        if self.receiver is not None:
+            parts.append(f"接收线程 {seconds(self.receiver_time)}" + ("（强制终止）" if self.forced else ""))
+        if self.writer is not None:
+            parts.append(f"日志 {seconds(self.log_time)}")
+        return f"串口{self.port_index}: " + "，".join(parts)
+
+
+class ServiceShutdown:
+    """一个后台服务的关闭：stop_fn(剩余秒数) 返回是否在时限内结束（返回None视为结束）"""
+
+    def __init__(self, name: str, stop_fn, after_ports: bool = False):
+        self.name = name
+        self.stop_fn = stop_fn
+        self.after_ports = after_ports  # 需要等所有串口关闭后再停（如日志维护）
+        self.elapsed = None
+        self.finished = False
+        self.error = None
+
+    def run(self, deadline: float):
+        start = time.monotonic()
+        try:
+            result = self.stop_fn(max(0.0, deadline - start))
+            self.finished = result is None or bool(result)
+        except Exception as e:
+            self.error = str(e)
+        self.elapsed = time.monotonic() - start
+
+    def text(self) -> str:
+        if self.error:
+            return f"{self.name}: 出错 {self.error}"
+        status = f"{self.elapsed * 1000:.0f} ms" if self.finished else "超时"
+        return f"{self.name}: {status}"
+
+
+class ShutdownCoordinator:
+    """协调关闭所有串口和后台服务，所有等待共用一个总截止时间"""
+
+    def __init__(self, deadline_s: float = 3.0, force_after_deadline: bool = True):
+        self.deadline_s = deadline_s
+        # 超时仍未结束的接收线程在其日志关闭后强制终止（日志由写入线程负责，不会被打断）
+        self.force_after_deadline = force_after_deadline
+        self.ports = []
+        self.services = []
+        self.elapsed = 0.0
+
+    def add_port(self, port_index: int, receiver=None, writer=None):
+        if receiver is not None or writer is not None:
+            self.ports.append(PortShutdown(port_index, receiver, writer))
+
+    def add_service(self, name: str, stop_fn, after_ports: bool = False):
+        self.services.append(ServiceShutdown(name, stop_fn, after_ports))
+
+    def run(self) -> bool:
+        """执行关闭，返回是否全部在截止时间内完成"""
+        started = time.monotonic()
+        deadline = started + self.deadline_s
+
+        # 1. 同时发出停止信号（不等待）
+        for port in self.ports:
+            if port.receiver is not None:
+                port.receiver.request_stop()
+
+        # 2. 各串口、各服务并行等待
+        threads = []
+        for port in self.ports:
+            threads.append(self._spawn(f"shutdown-port{port.port_index}", port.run, started, deadline))
+        for service in self.services:
+            if not service.after_ports:
+                threads.append(self._spawn(f"shutdown-{service.name}", service.run, deadline))
+        self._join(threads, deadline)
+
+        # 3. 依赖串口的服务（日志维护要在所有分段关闭后停止）
+        threads = [self._spawn(f"shutdown-{service.name}", service.run, deadline)
+                   for service in self.services if service.after_ports]
+        self._join(threads, deadline)
+
+        for port in self.ports:
+            receiver = port.receiver
+            if receiver is None or not receiver.isRunning():
+                continue
+            if self.force_after_deadline:
+                receiver.terminate()
+                receiver.wait(100)
+                port.forced = True
+            else:
+                _lingering.add(receiver)
+                receiver.finished.connect(lambda r=receiver: _lingering.discard(r))
+
+        self.elapsed = time.monotonic() - started
+        return all(p.receiver_stopped and p.log_flushed for p in self.ports) and all(
+            s.finished for s in self.services)
+
+    @staticmethod
+    def _spawn(name: str, target, *args) -> threading.Thread:
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def _join(threads, deadline: float):
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def report(self) -> str:
+        """关闭耗时报告"""
+        lines = [f"关闭耗时 {self.elapsed * 1000:.0f} ms（时限 {self.deadline_s:g} s）"]
+        lines.extend(port.text() for port in self.ports)
+        lines.extend(service.text() for service in self.services)
+        return "\n".join(lines)
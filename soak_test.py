@@ -0,0 +1,260 @@
+# soak_test.py
+# 长时间运行（浸泡）测试：离屏运行主程序，用虚拟设备高速率反复连接/断开、快速切分日志（加速时间），
+# 每个周期记录RSS、tracemalloc、线程数、打开的文件描述符和存活的Qt控件数，任一指标的增长斜率超过上限即失败
+#   python soak_test.py [--cycles 30] [--ports 8] [--rate-hz 20] [--csv soak.csv]
+# 所有日志、历史、告警记录写在临时目录中（--keep 保留），不影响 serial_logs
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from PyQt5.QtCore import QEvent
+
+try:
+    import psutil
+except ImportError:  # 非Linux平台才需要
+    psutil = None
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def process_stats() -> dict:
+    """当前进程的RSS（字节）、线程数（含QThread等原生线程）、打开的文件描述符数；取不到的项为None"""
+    stats = {'rss': None, 'threads': None, 'fds': None}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    stats['rss'] = int(line.split()[1]) * 1024
+                elif line.startswith('Threads:'):
+                    stats['threads'] = int(line.split()[1])
+        stats['fds'] = len(os.listdir('/proc/self/fd'))
+        return stats
+    except OSError:
+        pass
+    if psutil is not None:
+        process = psutil.Process()
+        stats['rss'] = process.memory_info().rss
+        stats['threads'] = process.num_threads()
+        stats['fds'] = process.num_fds() if hasattr(process, 'num_fds') else process.num_handles()
+    return stats
+
+
+def robust_slope(x, y):
+    """Theil-Sen斜率（两两斜率的中位数），对偶发的内存波动不敏感；样本不足时返回None"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) < 3:
+        return None
+    i, j = np.triu_indices(len(x), k=1)
+    dx = x[j] - x[i]
+    mask = dx != 0
+    return float(np.median((y[j] - y[i])[mask] / dx[mask]))
+
+
+# 指标名 -> (显示名, 单位换算, 单位)
+METRICS = {
+    'rss': ("RSS", 1 / 1024, "KB"),
+    'traced': ("tracemalloc", 1 / 1024, "KB"),
+    'threads': ("线程数", 1, "个"),
+    'fds': ("文件描述符", 1, "个"),
+    'widgets': ("Qt控件", 1, "个"),
+}
+
+
+class SoakRunner:
+    """驱动主程序进行连接/断开周期并采样"""
+
+    def __init__(self, app, args):
+        from log_writer import RotationPolicy
+        from nmea_simulator import DeviceFarm
+        import main as main_module
+
+        self.app = app
+        self.args = args
+        self.farm = DeviceFarm(args.ports, rate_hz=args.rate_hz, baudrate=args.baudrate,
+                               kinds=('RMC', 'GGA', 'GSA', 'ZDA'), measure=False)
+        self.farm.start()
+        self.window = main_module.SerialReceiverApp()
+        self.window.show()
+        # 加速：日志按很小的大小/时长切分，内存预算缩小，使各缓冲区很快达到上限进入稳态
+        self.window.memory_budget.total_cap = args.memory_cap_mb * 1024 * 1024
+        for widget in self.window.port_widgets[:args.ports]:
+            widget.log_rotation = RotationPolicy(max_bytes=args.rotate_kb * 1024, interval_s=args.rotate_s)
+            widget.baudrate_combo.setCurrentText(str(args.baudrate))
+        self.samples = []
+        self.segments = 0
+
+    def spin(self, seconds: float):
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            self.app.processEvents()
+            # processEvents不处理deleteLater（真实程序的事件循环会处理），这里手动投递，否则关闭的窗口看起来像泄漏
+            self.app.sendPostedEvents(None, QEvent.DeferredDelete)
+            time.sleep(0.005)
+
+    def run_cycle(self, cycle: int):
+        """一个周期：全部连接 -> 打开/关闭一个详情窗口 -> 全部断开"""
+        widgets = self.window.port_widgets[:self.args.ports]
+        for widget, path in zip(widgets, self.farm.paths):
+            widget.port_combo.setEditText(path)
+            widget.connect_serial()
+        self.spin(self.args.connect_s / 2)
+        detail_owner = widgets[cycle % len(widgets)]
+        detail_owner.show_port_details()
+        self.spin(self.args.connect_s / 2)
+        if getattr(detail_owner, 'detail_window', None) is not None:
+            detail_owner.detail_window.close()
+        for widget in widgets:
+            if widget.log_writer is not None:
+                self.segments += widget.log_writer.segments
+            widget.disconnect_serial()
+        self.spin(self.args.settle_s)
+
+    def sample(self, cycle: int, started: float):
+        stats = process_stats()
+        stats['cycle'] = cycle
+        stats['elapsed'] = time.monotonic() - started
+        stats['traced'] = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        stats['widgets'] = len(self.app.allWidgets())  # 关闭后未销毁的窗口会一直留在这里
+        self.samples.append(stats)
+        return stats
+
+    def close(self):
+        self.farm.stop()
+        self.window.close()
+        self.farm.close()
+
+
+def print_sample(stats: dict, segments: int):
+    def mb(value):
+        return f"{value / 1048576:8.1f}" if value is not None else f"{'-':>8}"
+
+    def count(value):
+        return f"{value:6d}" if value is not None else f"{'-':>6}"
+
+    print(f"{stats['cycle']:>5} {stats['elapsed']:>7.1f} {mb(stats['rss'])} {mb(stats['traced'])} "
+          f"{count(stats['threads'])} {count(stats['fds'])} {count(stats['widgets'])} {segments:>6}")
+
+
+def check_slopes(samples: list, warmup: int, limits: dict):
+    """对预热之后的样本按周期拟合斜率，返回 [(指标, 斜率, 上限, 是否通过)]"""
+    steady = [s for s in samples if s['cycle'] > warmup]
+    results = []
+    for key, limit in limits.items():
+        points = [(s['cycle'], s[key]) for s in steady if s[key] is not None]
+        if len(points) < 3:
+            continue
+        slope = robust_slope(*zip(*points))
+        results.append((key, slope, limit, slope <= limit))
+    return results
+
+
+def top_growth(baseline, snapshot, limit: int = 10) -> list:
+    """tracemalloc：与预热后基线相比增长最多的分配位置"""
+    stats = snapshot.compare_to(baseline, 'lineno')
+    return [stat for stat in stats if stat.size_diff > 0][:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="长时间运行测试：连接/断开与日志切分循环中的内存、线程、句柄增长")
+    parser.add_argument('--cycles', type=int, default=30, help="连接/断开周期数")
+    parser.add_argument('--ports', type=int, default=8, help="虚拟串口数（1-8）")
+    parser.add_argument('--rate-hz', type=float, default=20, help="每个虚拟设备的输出频率")
+    parser.add_argument('--baudrate', type=int, default=921600)
+    parser.add_argument('--connect-s', type=float, default=3.0, help="每个周期保持连接的时长（秒）")
+    parser.add_argument('--settle-s', type=float, default=0.5, help="断开后等待后台清理的时长（秒）")
+    parser.add_argument('--rotate-kb', type=int, default=64, help="日志分段大小（KB），用于加速切分")
+    parser.add_argument('--rotate-s', type=float, default=1.0, help="日志分段时长（秒）")
+    parser.add_argument('--memory-cap-mb', type=int, default=16, help="界面缓冲区内存预算（MB）")
+    parser.add_argument('--warmup', type=int, default=3, help="不参与斜率拟合的前几个周期")
+    parser.add_argument('--max-rss-kb', type=float, default=256.0, help="RSS增长斜率上限（KB/周期）")
+    parser.add_argument('--max-traced-kb', type=float, default=64.0, help="tracemalloc增长斜率上限（KB/周期）")
+    parser.add_argument('--max-threads', type=float, default=0.05, help="线程数增长斜率上限（个/周期）")
+    parser.add_argument('--max-fds', type=float, default=0.05, help="文件描述符增长斜率上限（个/周期）")
+    parser.add_argument('--max-widgets', type=float, default=0.05, help="存活Qt控件数增长斜率上限（个/周期）")
+    parser.add_argument('--no-tracemalloc', action='store_true', help="不跟踪Python分配（开销较大）")
+    parser.add_argument('--csv', help="把每个周期的采样写入CSV")
+    parser.add_argument('--keep', action='store_true', help="保留临时目录中的日志")
+    parser.add_argument('--show', action='store_true', help="显示窗口（默认离屏运行）")
+    args = parser.parse_args(argv)
+    args.ports = max(1, min(8, args.ports))
+    if not hasattr(os, 'openpty'):
+        print("当前系统不支持伪终端，无法运行虚拟设备")
+        return 2
+
+    if not args.show:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    sys.path.insert(0, PROJECT_DIR)
+    from PyQt5.QtWidgets import QApplication
+
+    work_dir = tempfile.mkdtemp(prefix='soak_')
+    cwd = os.getcwd()
+    os.chdir(work_dir)  # 程序的相对路径（serial_logs等）都落在临时目录
+    app = QApplication.instance() or QApplication(sys.argv)
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+
+    runner = SoakRunner(app, args)
+    started = time.monotonic()
+    baseline = None
+    print(f"工作目录: {work_dir}")
+    print(f"{'周期':>5} {'时间s':>7} {'RSS MB':>8} {'追踪MB':>8} {'线程':>6} {'句柄':>6} {'控件':>6} {'分段':>6}")
+    try:
+        print_sample(runner.sample(0, started), 0)
+        for cycle in range(1, args.cycles + 1):
+            runner.run_cycle(cycle)
+            stats = runner.sample(cycle, started)
+            print_sample(stats, runner.segments)
+            if cycle == args.warmup and tracemalloc.is_tracing():
+                baseline = tracemalloc.take_snapshot()
+    finally:
+        runner.close()
+        os.chdir(cwd)
+
+    limits = {
+        'rss': args.max_rss_kb * 1024,
+        'traced': args.max_traced_kb * 1024,
+        'threads': args.max_threads,
+        'fds': args.max_fds,
+        'widgets': args.max_widgets,
+    }
+    results = check_slopes(runner.samples, args.warmup, limits)
+    failed = False
+    print(f"\n斜率（预热{args.warmup}个周期之后，每周期）:")
+    for key, slope, limit, ok in results:
+        name, scale, unit = METRICS[key]
+        failed |= not ok
+        print(f"  {name:<12} {slope * scale:+10.2f} {unit}  上限 {limit * scale:.2f}  {'通过' if ok else '失败'}")
+    if not results:
+        print("  样本不足，无法拟合")
+        failed = True
+
+    if baseline is not None and tracemalloc.is_tracing():
+        print("\n预热后增长最多的分配位置:")
+        for stat in top_growth(baseline, tracemalloc.take_snapshot()):
+            frame = stat.traceback[0]
+            print(f"  {stat.size_diff / 1024:+9.1f} KB {stat.count_diff:+7d} 块  "
+                  f"{os.path.relpath(frame.filename, PROJECT_DIR)}:{frame.lineno}")
+        tracemalloc.stop()
+
+    if args.csv:
+        with open(args.csv, 'w', encoding='utf-8') as f:
+            f.write("cycle,elapsed_s,rss_bytes,traced_bytes,threads,fds,widgets\n")
+            for s in runner.samples:
+                f.write(','.join('' if s[k] is None else (f"{s[k]:.3f}" if k == 'elapsed' else str(s[k]))
+                                 for k in ('cycle', 'elapsed', 'rss', 'traced', 'threads', 'fds', 'widgets')) + '\n')
+    if args.keep:
+        print(f"\n日志保留在 {work_dir}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("\n结果:", "失败" if failed else "通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,313 @@
+# track_view.py
+# 轨迹视图的数据层：增量抽稀折线 + 网格分桶点存储（不依赖Qt，便于在后台/脚本中复用）
+import math
+import html
+import itertools
+import json
+from datetime import datetime
+
+import numpy as np
+
+EARTH_RADIUS = 6378137.0  # WGS84长半轴（米）
+
+
+def local_distance_m(lat1, lon1, lat2, lon2):
+    """两点间的近似距离（米，局部等距投影，适用于短距离）"""
+    k = math.pi / 180.0
+    x = (lon2 - lon1) * k * math.cos((lat1 + lat2) * 0.5 * k)
+    y = (lat2 - lat1) * k
+    return math.hypot(x, y) * EARTH_RADIUS
+
+
+def douglas_peucker(points, tolerance_m):
+    """Douglas–Peucker折线抽稀（numpy向量化，逐层同时拆分所有待检查的线段，不逐点循环）"""
+    n = len(points)
+    if n <= 2:
+        return list(points)
+
+    k = math.pi / 180.0
+    width = len(points[0])  # 点为 (lat, lon, ...) 等长元组
+    coords = np.fromiter(itertools.chain.from_iterable(points), float, n * width).reshape(n, width)
+    lat, lon = coords[:, 0], coords[:, 1]
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    starts = np.array([0])
+    ends = np.array([n - 1])
+    while len(starts):
+        # 展开所有待检查线段的内部点：seg为所属线段，idx为点序号
+        lengths = ends - starts - 1
+        seg = np.repeat(np.arange(len(starts)), lengths)
+        first = np.cumsum(lengths) - lengths
+        idx = starts[seg] + 1 + np.arange(len(seg)) - first[seg]
+        a, b = starts[seg], ends[seg]
+
+        # 点到线段的距离（米，以线段起点纬度做经度缩放的局部等距投影）
+        cos_lat = np.cos(lat[a] * k)
+        ax, ay = lon[a] * cos_lat, lat[a]
+        dx, dy = lon[b] * cos_lat - ax, lat[b] - ay
+        px, py = lon[idx] * cos_lat - ax, lat[idx] - ay
+        seg_len2 = dx * dx + dy * dy
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.where(seg_len2 > 0, (px * dx + py * dy) / seg_len2, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        dist = np.hypot(px - t * dx, py - t * dy) * k * EARTH_RADIUS
+
+        # 每条线段的最远点（并列时取第一个）
+        seg_max = np.maximum.reduceat(dist, first)
+        farthest = np.flatnonzero(dist == seg_max[seg])
+        seg_ids, pos = np.unique(seg[farthest], return_index=True)
+        split = seg_max[seg_ids] > tolerance_m
+        seg_ids = seg_ids[split]
+        mid = idx[farthest[pos[split]]]
+        keep[mid] = True
+
+        # 超出容差的线段在最远点处一分为二，只保留还有内部点的子线段
+        starts = np.concatenate((starts[seg_ids], mid))
+        ends = np.concatenate((mid, ends[seg_ids]))
+        inner = ends - starts > 1
+        starts, ends = starts[inner], ends[inner]
+
+    return [points[i] for i in np.flatnonzero(keep)]
+
+
+class TrackSimplifier:
+    """增量折线抽稀：入口做径向距离过滤，超过上限时做Douglas–Peucker压缩并放宽容差"""
+
+    def __init__(self, tolerance_m: float = 1.0, max_points: int = 20000):
+        self.base_tolerance_m = tolerance_m
+        self.tolerance_m = tolerance_m
+        self.max_points = max_points
+        self.points = []  # 已保留的顶点 (lat, lon, t)
+        self.head = None  # 最新一个原始点（始终显示当前位置）
+        self.total_points = 0
+
+    def add(self, lat: float, lon: float, t: float):
+        """追加一个定位点"""
+        self.total_points += 1
+        self.head = (lat, lon, t)
+        if not self.points:
+            self.points.append(self.head)
+            return
+
+        last = self.points[-1]
+        # 径向距离过滤：与上一个保留点距离不足容差则丢弃
+        if local_distance_m(last[0], last[1], lat, lon) < self.tolerance_m:
+            return
+
+        self.points.append(self.head)
+        if len(self.points) > self.max_points:
+            self._compact()
+
+    def _compact(self):
+        """压缩已保留顶点，直到降到上限的一半（摊销后每点O(1)）"""
+        target = self.max_points // 2
+        while len(self.points) > target:
+            self.points = douglas_peucker(self.points, self.tolerance_m)
+            if len(self.points) > target:
+                self.tolerance_m *= 2
+
+    def polyline(self):
+        """返回抽稀后的折线（包含最新点）"""
+        if self.head is not None and (not self.points or self.points[-1] is not self.head):
+            return self.points + [self.head]
+        return list(self.points)
+
+    def clear(self):
+        self.points = []
+        self.head = None
+        self.total_points = 0
+        self.tolerance_m = self.base_tolerance_m
+
+
+class GridPointStore:
+    """网格分桶点存储：每个网格只保存质心和计数，格子数超限时自动加粗网格"""
+
+    def __init__(self, cell_size_m: float = 2.0, max_cells: int = 50000):
+        self.base_cell_size_m = cell_size_m
+        self.cell_size_m = cell_size_m
+        self.max_cells = max_cells
+        self.cells = {}  # (ix, iy) -> [lat_sum, lon_sum, count]
+        self._ref_lat = None
+
+    def _cell_key(self, lat, lon):
+        # 以首个点的纬度做经度缩放，网格在局部近似为正方形
+        deg = self.cell_size_m / (EARTH_RADIUS * math.pi / 180.0)
+        scale = math.cos(math.radians(self._ref_lat))
+        return int(math.floor(lat / deg)), int(math.floor(lon * scale / deg))
+
+    def add(self, lat: float, lon: float):
+        if self._ref_lat is None:
+            self._ref_lat = lat
+        key = self._cell_key(lat, lon)
+        cell = self.cells.get(key)
+        if cell is None:
+            self.cells[key] = [lat, lon, 1]
+            if len(self.cells) > self.max_cells:
+                self._coarsen()
+        else:
+            cell[0] += lat
+            cell[1] += lon
+            cell[2] += 1
+
+    def _coarsen(self):
+        """网格尺寸翻倍并合并格子，保证内存有界"""
+        while len(self.cells) > self.max_cells // 2:
+            self.cell_size_m *= 2
+            merged = {}
+            for lat_sum, lon_sum, count in self.cells.values():
+                key = self._cell_key(lat_sum / count, lon_sum / count)
+                cell = merged.get(key)
+                if cell is None:
+                    merged[key] = [lat_sum, lon_sum, count]
+                else:
+                    cell[0] += lat_sum
+                    cell[1] += lon_sum
+                    cell[2] += count
+            self.cells = merged
+
+    def points(self):
+        """返回 (lats, lons, counts) 三个列表"""
+        lats, lons, counts = [], [], []
+        for lat_sum, lon_sum, count in self.cells.values():
+            lats.append(lat_sum / count)
+            lons.append(lon_sum / count)
+            counts.append(count)
+        return lats, lons, counts
+
+    def clear(self):
+        self.cells = {}
+        self.cell_size_m = self.base_cell_size_m
+        self._ref_lat = None
+
+
+class PortTrack:
+    """单个串口的轨迹：抽稀折线 + 网格点存储"""
+
+    def __init__(self, tolerance_m: float = 1.0, max_points: int = 20000, cell_size_m: float = 2.0):
+        self.simplifier = TrackSimplifier(tolerance_m, max_points)
+        self.grid = GridPointStore(cell_size_m)
+        self.version = 0  # 每次更新递增，视图据此判断是否需要重绘
+
+    def add(self, lat: float, lon: float, t: float):
+        # 过滤无效坐标（解析失败时经纬度为0或NaN）
+        if lat != lat or lon != lon or (lat == 0.0 and lon == 0.0):
+            return
+        self.simplifier.add(lat, lon, t)
+        self.grid.add(lat, lon)
+        self.version += 1
+
+    def polyline(self):
+        """返回 (lons, lats) 用于绘图"""
+        points = self.simplifier.polyline()
+        return [p[1] for p in points], [p[0] for p in points]
+
+    @property
+    def total_points(self):
+        return self.simplifier.total_points
+
+    def clear(self):
+        self.simplifier.clear()
+        self.grid.clear()
+        self.version += 1
+
+
+_HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+html, body {{ margin: 0; height: 100%; background: #fafafa; font-family: sans-serif; }}
+#map {{ width: 100%; height: 100%; cursor: grab; }}
+#legend {{ position: absolute; top: 10px; right: 10px; background: #fff; padding: 6px 10px;
+           border: 1px solid #ccc; border-radius: 4px; font-size: 13px; }}
+</style>
+</head>
+<body>
+<canvas id="map"></canvas>
+<div id="legend">{legend}</div>
+<script>
+var tracks = {tracks};
+var canvas = document.getElementById('map');
+var ctx = canvas.getContext('2d');
+var minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity, refLat = 0, n = 0;
+tracks.forEach(function (t) {{ t.points.forEach(function (p) {{ refLat += p[0]; n += 1; }}); }});
+refLat = n ? refLat / n : 0;
+var kx = Math.cos(refLat * Math.PI / 180);
+tracks.forEach(function (t) {{
+  t.points.forEach(function (p) {{
+    var x = p[1] * kx, y = p[0];
+    minX = Math.min(minX, x); maxX = Math.max(maxX, x);
+    minY = Math.min(minY, y); maxY = Math.max(maxY, y);
+  }});
+}});
+var scale = 1, offX = 0, offY = 0;
+function fit() {{
+  canvas.width = window.innerWidth; canvas.height = window.innerHeight;
+  var w = Math.max(maxX - minX, 1e-9), h = Math.max(maxY - minY, 1e-9);
+  scale = 0.9 * Math.min(canvas.width / w, canvas.height / h);
+  offX = (canvas.width - w * scale) / 2 - minX * scale;
+  offY = (canvas.height + h * scale) / 2 + minY * scale;
+}}
+function draw() {{
+  ctx.clearRect(0, 0, canvas.width, canvas.height);
+  tracks.forEach(function (t) {{
+    ctx.strokeStyle = t.color; ctx.lineWidth = 2; ctx.beginPath();
+    t.points.forEach(function (p, i) {{
+      var x = p[1] * kx * scale + offX, y = offY - p[0] * scale;
+      if (i === 0) ctx.moveTo(x, y); else ctx.lineTo(x, y);
+    }});
+    ctx.stroke();
+  }});
+}}
+var dragging = null;
+canvas.onmousedown = function (e) {{ dragging = [e.clientX, e.clientY]; }};
+window.onmouseup = function () {{ dragging = null; }};
+window.onmousemove = function (e) {{
+  if (!dragging) return;
+  offX += e.clientX - dragging[0]; offY += e.clientY - dragging[1];
+  dragging = [e.clientX, e.clientY]; draw();
+}};
+canvas.onwheel = function (e) {{
+  e.preventDefault();
+  var f = e.deltaY < 0 ? 1.25 : 0.8;
+  offX = e.clientX - (e.clientX - offX) * f; offY = e.clientY - (e.clientY - offY) * f;
+  scale *= f; draw();
+}};
+window.onresize = function () {{ fit(); draw(); }};
+fit(); draw();
+</script>
+</body>
+</html>
+"""
+
+
+def export_tracks_html(tracks: dict, filename: str, colors: dict = None):
+    """导出抽稀后的轨迹为离线HTML地图（自包含，不依赖任何在线瓦片或脚本）
+
+    tracks: {名称: PortTrack}
+    colors: {名称: '#RRGGBB'}
+    """
+    colors = colors or {}
+    data = []
+    legend = []
+    for name, track in tracks.items():
+        points = [[round(p[0], 8), round(p[1], 8)] for p in track.simplifier.polyline()]
+        if not points:
+            continue
+        color = colors.get(name, '#FF0000')
+        data.append({'name': name, 'color': color, 'points': points})
+        legend.append(
+            f'<div><span style="color:{color}">&#9632;</span> {html.escape(str(name))} '
+            f'({len(points)}/{track.total_points} 点)</div>'
+        )
+
+    title = f"轨迹导出 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    content = _HTML_TEMPLATE.format(
+        title=html.escape(title),
+        legend=''.join(legend) or '无轨迹数据',
+        tracks=json.dumps(data, ensure_ascii=False)
+    )
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return len(data)
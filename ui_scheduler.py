@@ -0,0 +1,111 @@
+# ui_scheduler.py
+# 界面刷新调度器：各处只标记"脏"，由一个定时器按帧统一刷新，单帧有时间预算，不可见的控件不刷新
+import time
+from PyQt5.QtCore import QObject, QTimer
+
+
+class RefreshTask:
+    """一个可刷新的界面任务"""
+
+    def __init__(self, key, callback, widget=None):
+        self.key = key
+        self.callback = callback  # 无参刷新函数
+        self.widget = widget  # 用于判断可见性的控件（None表示总是刷新）
+        self.runs = 0
+        self.total_time = 0.0  # 累计耗时（秒）
+
+
+class RefreshScheduler(QObject):
+    """集中调度界面刷新：每帧最多刷新每个任务一次，超出时间预算的任务顺延到下一帧"""
+
+    def __init__(self, frame_interval_ms: int = 50, frame_budget_ms: float = 8.0, parent=None):
+        super().__init__(parent)
+        self.frame_budget_ms = frame_budget_ms
+        self.tasks = {}  # 键 -> RefreshTask
+        self.dirty = {}  # 按标记顺序保存的脏任务键（值无意义）
+
+        # 统计
+        self.frames = 0
+        self.missed_budgets = 0  # 超出帧预算的帧数
+        self.deferred = 0  # 因预算顺延的任务次数
+        self.skipped_hidden = 0  # 因不可见而跳过的任务次数
+        self.last_frame_ms = 0.0
+        self.max_frame_ms = 0.0
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.run_frame)
+        self.timer.start(frame_interval_ms)
+
+    def set_frame_interval(self, frame_interval_ms: int):
+        self.timer.setInterval(frame_interval_ms)
+
+    def register(self, key, callback, widget=None):
+        """登记刷新任务；widget不可见（隐藏、最小化或滚出视图）时暂缓刷新"""
+        self.tasks[key] = RefreshTask(key, callback, widget)
+
+    def unregister(self, key):
+        self.tasks.pop(key, None)
+        self.dirty.pop(key, None)
+
+    def mark_dirty(self, key):
+        """标记任务需要刷新（可在同一帧内多次调用，只刷新一次）"""
+        if key in self.tasks:
+            self.dirty[key] = None
+
+    @staticmethod
+    def is_visible(widget) -> bool:
+        """控件当前是否有可见区域（滚动区域外或被隐藏时返回False）"""
+        return widget.isVisible() and not widget.visibleRegion().isEmpty()
+
+    def run_frame(self):
+        """执行一帧：按标记顺序刷新脏任务，直到用完时间预算"""
+        if not self.dirty:
+            return
+        start = time.perf_counter()
+        budget = self.frame_budget_ms / 1000.0
+        pending = list(self.dirty)
+        self.dirty = {}
+
+        for n, key in enumerate(pending):
+            if time.perf_counter() - start > budget:
+                # 剩余任务顺延到下一帧，且排在新标记的任务之前
+                rest = dict.fromkeys(pending[n:])
+                rest.update(self.dirty)
+                self.dirty = rest
+                self.deferred += len(pending) - n
+                break
+            task = self.tasks.get(key)
+            if task is None:
+                continue
+            if task.widget is not None and not self.is_visible(task.widget):
+                # 不可见时保持脏标记，重新可见后再刷新
+                self.dirty[key] = None
+                self.skipped_hidden += 1
+                continue
+            task_start = time.perf_counter()
+            try:
+                task.callback()
+            except Exception as e:
+                print(f"界面刷新任务 {key} 出错: {str(e)}")
+            task.runs += 1
+            task.total_time += time.perf_counter() - task_start
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.frames += 1
+        self.last_frame_ms = elapsed_ms
+        self.max_frame_ms = max(self.max_frame_ms, elapsed_ms)
+        if elapsed_ms > self.frame_budget_ms:
+            self.missed_budgets += 1
+
+    def stats_text(self) -> str:
+        """统计信息（用于状态栏提示）"""
+        slowest = sorted(self.tasks.values(), key=lambda t: t.total_time, reverse=True)[:5]
+        lines = [
+            f"帧数: {self.frames}，超出预算: {self.missed_budgets}（预算 {self.frame_budget_ms:.0f} ms）",
+            f"最近一帧: {self.last_frame_ms:.1f} ms，最长: {self.max_frame_ms:.1f} ms",
+            f"顺延任务: {self.deferred}，不可见跳过: {self.skipped_hidden}",
+        ]
+        for task in slowest:
+            if task.runs:
+                lines.append(f"{task.key}: {task.runs}次，平均 {task.total_time / task.runs * 1000:.2f} ms")
+        return "\n".join(lines)